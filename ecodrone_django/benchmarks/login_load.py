@@ -0,0 +1,81 @@
+"""
+Login load test: sync LoginView vs async login_view under concurrent requests.
+
+Run against a running server with an existing user, e.g.
+
+    gunicorn -k uvicorn_worker.UvicornWorker ecodrone_django.asgi:application &
+    python benchmarks/login_load.py --url http://localhost:8000 --email a@b.com --password '...'
+
+Prints throughput, p50/p99 latency and status codes per endpoint (429 = shed by the async
+view's hashing pool). Standard library only, so it can run from any machine.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = {
+    'sync': '/user/login',
+    'async': '/user/async/login',
+}
+
+
+def _post(url, body):
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            code = response.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    except OSError:
+        code = 'error'
+    return code, time.perf_counter() - start
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(url, body, requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _post(url, body), range(requests)))
+    elapsed = time.perf_counter() - start
+    ok = [latency for code, latency in results if code == 200]
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'logins_per_s': round(len(ok) / elapsed, 2),
+        'p50_ms': round(statistics.median(ok) * 1000, 1) if ok else None,
+        'p99_ms': round(_percentile(ok, 99) * 1000, 1) if ok else None,
+        'status': dict(Counter(str(code) for code, _ in results)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    args = parser.parse_args()
+
+    body = json.dumps({'email': args.email, 'password': args.password}).encode()
+    report = {}
+    for name in args.endpoints:
+        report[name] = [run(args.url.rstrip('/') + ENDPOINTS[name], body, args.requests, c) for c in args.concurrency]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
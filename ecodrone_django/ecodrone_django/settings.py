@@ -24,11 +24,51 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'users',
+    'telemetry',
     'corsheaders',
     'rest_framework'
 ]
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRY_MINUTES = 150
+# Server worker processes (the Dockerfile passes WEB_CONCURRENCY to gunicorn, default 1). The
+# token and profile caches below live in each process and a save/delete only invalidates the
+# entries of the process that handled it, so with several workers both are turned off
+WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', '1'))
+# In-process cache of verified token -> user (users.authentication.JWTAuthentication; TTL 0 = off)
+JWT_AUTH_CACHE_SIZE = 1024
+JWT_AUTH_CACHE_TTL = 60 if WEB_WORKERS == 1 else 0
+# get-user payloads (users.profile_cache), dropped on User/Accounts save or delete. Local memory is
+# per process; with several workers USER_PROFILE_CACHE must name a shared cache (e.g. Redis), the
+# default then is 'none', which caches nothing
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ecodrone',
+    },
+    'none': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+USER_PROFILE_CACHE = 'default' if WEB_WORKERS == 1 else 'none'
+USER_PROFILE_CACHE_TIMEOUT = 300
+# Password hashing processes for the import_users command and the bulk register view (None = CPU
+# count), and the most users one bulk register request may carry (larger imports: import_users)
+BULK_IMPORT_WORKERS = None
+BULK_REGISTER_MAX_ROWS = 200
+# Password hashing threads for the async login/register views, and how many hashes may be
+# running or queued before they answer 429 (None = CPU count)
+AUTH_HASH_WORKERS = None
+AUTH_HASH_MAX_PENDING = 64
+# Live telemetry streams (telemetry.broker). Open streams beyond the limit get 503; idle streams
+# get a keepalive comment every N seconds. The relay carries rows between worker processes with
+# Postgres LISTEN/NOTIFY (False: in-process only, for a single worker)
+TELEMETRY_LIVE_MAX_SUBSCRIBERS = 1000
+TELEMETRY_LIVE_KEEPALIVE = 15
+TELEMETRY_LIVE_RELAY = True
+# Monthly telemetry partitions (telemetry.partitions): months created ahead, and how many months
+# `manage.py telemetry_partitions` keeps attached before archiving older ones (None = keep all)
+TELEMETRY_PARTITION_MONTHS_AHEAD = 3
+TELEMETRY_PARTITION_KEEP_MONTHS = None
 DEBUG = os.getenv("DEBUG", "False") == "True"
 SECRET_KEY = os.getenv('SECRET_KEY')
 # CORS_ALLOWED_ORIGINS = [
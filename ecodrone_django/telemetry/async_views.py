@@ -0,0 +1,127 @@
+# async_views.py – live telemetry: drones publish rows, dashboards follow them over Server-Sent Events
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+
+from users.authentication import JWTAuthentication, get_header_token
+from .broker import TooManySubscribers, broker, relay
+
+KEEPALIVE_S = getattr(settings, 'TELEMETRY_LIVE_KEEPALIVE', 15)
+RETRY_MS = 3000
+
+
+async def _authenticate(request):
+    """(user, None) for a valid JWT (header or access_token cookie), else (None, 401 response);
+    403 for a cookie on an unsafe request without a valid CSRF token."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except PermissionDenied as e:
+        return None, JsonResponse({"detail": str(e.detail)}, status=403)
+    except AuthenticationFailed as e:
+        result, detail = None, str(e.detail)
+    else:
+        detail = "Authentication credentials were not provided."
+    if result is None:
+        response = JsonResponse({"detail": detail}, status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return None, response
+    return result[0], None
+
+
+def _rows_from_body(body):
+    """Rows from a JSON object, a JSON list or NDJSON. None if the body is not valid JSON."""
+    try:
+        data = json.loads(body or b'[]')
+    except ValueError:
+        try:
+            data = [json.loads(line) for line in body.splitlines() if line.strip()]
+        except ValueError:
+            return None
+    return [data] if isinstance(data, dict) else data if isinstance(data, list) else None
+
+
+async def _events(subscription):
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            rows = await subscription.get(timeout=KEEPALIVE_S)
+            if rows:
+                yield "event: telemetry\ndata: [" + ",".join(rows) + "]\n\n"
+            else:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+
+@require_GET
+async def live_stream(request, run_id=None):
+    """
+    Server-Sent Events stream of live rows for `run_id`, the runs in ?run=...&run=...,
+    or every run. Each `telemetry` event carries a JSON list with the latest row per run
+    since the previous event; clients that fall behind skip rows instead of lagging.
+    EventSource cannot set headers, so browsers authenticate with the access_token cookie.
+    """
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    run_ids = [run_id] if run_id else request.GET.getlist('run')
+    try:
+        subscription = broker.subscribe(run_ids or None)
+    except TooManySubscribers:
+        response = JsonResponse({"error": "Too many live viewers, please retry shortly"}, status=503)
+        response['Retry-After'] = '5'
+        return response
+    if relay is not None:
+        relay.start()
+
+    response = StreamingHttpResponse(_events(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass events through unbuffered
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def live_publish(request):
+    """
+    Fans flight_log rows (JSON object, list or NDJSON; each with a run_id) out to the live
+    streams of every worker. Nothing is stored: the full log still goes through
+    /telemetry/upload. `delivered` (streams reached) is only known without the relay.
+    Publishers are drones, not browsers: only the Authorization header is accepted, never
+    the access_token cookie a site could make an admin's browser send.
+    """
+    if get_header_token(request) is None:
+        response = JsonResponse({"detail": "Publishing needs an 'Authorization: Bearer <token>' header."}, status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    rows = _rows_from_body(request.body)
+    if rows is None:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    rows = [row for row in rows if isinstance(row, dict) and row.get('run_id')]
+    if any(not isinstance(row['run_id'], str) for row in rows):
+        # Used as a dict key by the broker: a list / object run_id would fail there
+        return JsonResponse({"error": "run_id must be a string"}, status=400)
+    if relay is not None:
+        published = await sync_to_async(relay.publish)(rows)
+        return JsonResponse({"published": published, "delivered": None}, status=200)
+    delivered = broker.publish_many(rows)
+    return JsonResponse({"published": len(rows), "delivered": delivered}, status=200)
+
+
+@require_GET
+async def live_stats(request):
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    stats = broker.stats()
+    stats['relay'] = relay is not None
+    return JsonResponse(stats, status=200)
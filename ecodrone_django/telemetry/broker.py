@@ -0,0 +1,233 @@
+"""
+In-process fan-out of live telemetry rows to the dashboard streams (no Redis needed).
+
+Subscribers listen to one or more runs (or all of them). Each subscriber keeps at most one
+unread row per run: when a viewer reads slower than the drones publish, the newer row
+replaces the unread one instead of queueing behind it, so a slow client always sees the
+latest state and never holds memory for rows it will not read.
+
+publish() may be called from any thread; a subscriber is woken on its own event loop.
+The broker lives in one process. With several workers (the Dockerfile runs gunicorn with
+uvicorn workers) a publish reaches the streams of every worker through PostgresRelay:
+rows go out with pg_notify and each worker's listener hands them to its own broker.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+RELAY_CHANNEL = 'telemetry_live'
+NOTIFY_MAX_BYTES = 7900  # pg_notify payloads must stay under 8000 bytes
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+
+    def __init__(self, broker, run_ids, loop):
+        self.run_ids = frozenset(run_ids) if run_ids else None
+        self.delivered = 0
+        self.coalesced = 0
+        self._broker = broker
+        self._loop = loop
+        self._event = asyncio.Event()
+        self._pending = {}  # run_id -> latest unread row (JSON text)
+        self._lock = threading.Lock()
+        self._wake_scheduled = False
+
+    def _offer(self, run_id, payload):
+        """Stores the row and wakes the reader. False if the subscriber's loop is gone."""
+        with self._lock:
+            if run_id in self._pending:
+                self.coalesced += 1
+            self._pending[run_id] = payload
+            if self._wake_scheduled:
+                return True
+            self._wake_scheduled = True
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            return False
+        return True
+
+    async def get(self, timeout=None):
+        """Rows published since the last call (latest per run, JSON text); [] after `timeout` s."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        with self._lock:
+            self._event.clear()
+            self._wake_scheduled = False
+            rows, self._pending = list(self._pending.values()), {}
+        self.delivered += len(rows)
+        return rows
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class TelemetryBroker:
+
+    def __init__(self, max_subscribers=1000):
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self._lock = threading.Lock()
+        self._everything = set()  # subscriptions to every run
+        self._by_run = {}  # run_id -> subscriptions to that run
+        self._count = 0
+
+    def subscribe(self, run_ids=None):
+        """New Subscription to `run_ids` (None = every run). Call from the reader's event loop."""
+        subscription = Subscription(self, run_ids, asyncio.get_running_loop())
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._count += 1
+            if subscription.run_ids is None:
+                self._everything.add(subscription)
+            else:
+                for run_id in subscription.run_ids:
+                    self._by_run.setdefault(run_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription.run_ids is None:
+                if subscription not in self._everything:
+                    return
+                self._everything.discard(subscription)
+            else:
+                found = False
+                for run_id in subscription.run_ids:
+                    subscribers = self._by_run.get(run_id)
+                    if subscribers is not None and subscription in subscribers:
+                        found = True
+                        subscribers.discard(subscription)
+                        if not subscribers:
+                            del self._by_run[run_id]
+                if not found:
+                    return
+            self._count -= 1
+
+    def publish(self, row):
+        """Hands one flight_log row (dict with run_id) to its subscribers. Returns how many."""
+        run_id = row.get('run_id') if isinstance(row, dict) else None
+        if not run_id or not isinstance(run_id, str):
+            return 0
+        with self._lock:
+            self.published += 1
+            targets = list(self._everything)
+            targets.extend(self._by_run.get(run_id, ()))
+        if not targets:
+            return 0
+        # Encoded once, not once per viewer
+        payload = json.dumps(row, default=str)
+        delivered = 0
+        for subscription in targets:
+            if subscription._offer(run_id, payload):
+                delivered += 1
+            else:
+                self.unsubscribe(subscription)
+        return delivered
+
+    def publish_many(self, rows):
+        return sum(self.publish(row) for row in rows)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._count,
+                'runs': len(self._by_run),
+                'published': self.published,
+            }
+
+
+class PostgresRelay:
+    """
+    Carries published rows to the broker of every worker process over LISTEN/NOTIFY.
+
+    publish() sends the rows on the caller's database connection (sync: call it through
+    sync_to_async); the listener thread, started with the first stream in this process, hands
+    every notification to the local broker and reconnects with backoff if the link drops.
+    """
+
+    def __init__(self, broker, channel=RELAY_CHANNEL):
+        self.broker = broker
+        self.channel = channel
+        self.oversized = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def publish(self, rows):
+        """Notifies every worker of `rows`. Returns how many were sent (rows over the
+        pg_notify limit on their own are dropped)."""
+        sent = 0
+        with connection.cursor() as cursor:
+            for payload, count in self._payloads(rows):
+                cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+                sent += count
+        return sent
+
+    def _payloads(self, rows):
+        """JSON lists of rows, each under NOTIFY_MAX_BYTES, with their row counts."""
+        batch, size = [], 2
+        for row in rows:
+            encoded = json.dumps(row, default=str)
+            if len(encoded.encode()) + 2 > NOTIFY_MAX_BYTES:
+                self.oversized += 1
+                continue
+            if batch and size + len(encoded.encode()) + 1 > NOTIFY_MAX_BYTES:
+                yield "[" + ",".join(batch) + "]", len(batch)
+                batch, size = [], 2
+            batch.append(encoded)
+            size += len(encoded.encode()) + 1
+        if batch:
+            yield "[" + ",".join(batch) + "]", len(batch)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='telemetry-relay', daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        delay = 1
+        while True:
+            conn = None
+            try:
+                conn = connection.get_new_connection(connection.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                delay = 1
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.broker.publish_many(json.loads(notify.payload))
+            except Exception:
+                logger.warning("Live telemetry relay lost its connection, retrying in %s s", delay, exc_info=True)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+broker = TelemetryBroker(max_subscribers=getattr(settings, 'TELEMETRY_LIVE_MAX_SUBSCRIBERS', 1000))
+relay = PostgresRelay(broker) if getattr(settings, 'TELEMETRY_LIVE_RELAY', True) else None
@@ -0,0 +1,139 @@
+"""
+Downsampling of a run's telemetry to a fixed number of points for charting.
+
+- bucket: splits the run into N equal time buckets and returns min / max / avg per bucket.
+  Aggregated in PostgreSQL (width_bucket over the sample epoch), so only N rows leave the DB.
+- lttb:   Largest-Triangle-Three-Buckets, picks N real samples that keep the visual shape
+  of the line. The same width_bucket query first narrows the run to the lowest and highest
+  sample of each of LTTB_PRE_BUCKETS x N buckets, so at most 2 x LTTB_PRE_BUCKETS x N rows
+  leave the DB; the selection among those is done with NumPy.
+"""
+import datetime
+
+import numpy as np
+from django.db.models import Avg, F, FloatField, Func, IntegerField, Max, Min, Q, Value, Window
+from django.db.models.functions import Extract, RowNumber
+
+from .ingest import FLOAT_FIELDS, INT_FIELDS
+
+SERIES_FIELDS = FLOAT_FIELDS + INT_FIELDS
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+LTTB_PRE_BUCKETS = 10  # SQL buckets per output point before LTTB
+
+
+def _epoch_ms(dt):
+    return round(dt.timestamp() * 1000)
+
+
+def _bounds(run):
+    lo, hi = run.started_at, run.ended_at
+    if lo is None or hi is None:
+        agg = run.samples.aggregate(lo=Min('timestamp'), hi=Max('timestamp'))
+        lo, hi = agg['lo'], agg['hi']
+    return lo, hi
+
+
+def _bucket(lo, hi, buckets):
+    """width_bucket of the sample time: 1..buckets over [lo, hi]."""
+    # +1 ms so the last sample falls in bucket `buckets`, not buckets + 1
+    hi = hi + datetime.timedelta(milliseconds=1)
+    return Func(
+        Extract('timestamp', 'epoch', output_field=FloatField()),
+        Value(lo.timestamp()),
+        Value(hi.timestamp()),
+        Value(buckets),
+        function='width_bucket',
+        output_field=IntegerField(),
+    )
+
+
+def bucket_series(run, fields, points):
+    """{field: {t, min, max, avg}} with one entry per non-empty time bucket."""
+    lo, hi = _bounds(run)
+    if lo is None:
+        return {field: {'t': [], 'min': [], 'max': [], 'avg': []} for field in fields}
+    bucket = _bucket(lo, hi, points)
+    aggregates = {'t': Min('timestamp')}
+    for field in fields:
+        aggregates[f'{field}__min'] = Min(field)
+        aggregates[f'{field}__max'] = Max(field)
+        aggregates[f'{field}__avg'] = Avg(field)
+    rows = list(
+        run.samples.annotate(bucket=bucket).values('bucket').annotate(**aggregates).order_by('bucket')
+    )
+    t = [_epoch_ms(r['t']) for r in rows]
+    return {
+        field: {
+            't': t,
+            'min': [r[f'{field}__min'] for r in rows],
+            'max': [r[f'{field}__max'] for r in rows],
+            'avg': [r[f'{field}__avg'] for r in rows],
+        }
+        for field in fields
+    }
+
+
+def lttb_indices(x, y, points):
+    """Indices of the `points` samples chosen by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    # Bucket edges over the inner points; first and last sample are always kept
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    chosen = np.empty(points, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, stop = edges[i], max(edges[i + 1], edges[i] + 1)
+        nxt_start, nxt_stop = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        if nxt_stop <= nxt_start:
+            nxt_stop = nxt_start + 1
+        cx, cy = x[nxt_start:nxt_stop].mean(), y[nxt_start:nxt_stop].mean()
+        bx, by = x[start:stop], y[start:stop]
+        # Twice the triangle area (a, b, c) for every candidate b in the bucket
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        chosen[i + 1] = a
+    return chosen
+
+
+def _extremes(run, field, lo, hi, buckets):
+    """(timestamp, value) of the lowest and highest sample of `field` in each time bucket."""
+    bucket = _bucket(lo, hi, buckets)
+    return (
+        run.samples.filter(**{f'{field}__isnull': False})
+        .annotate(
+            low=Window(RowNumber(), partition_by=[bucket], order_by=[F(field).asc(), F('timestamp').asc()]),
+            high=Window(RowNumber(), partition_by=[bucket], order_by=[F(field).desc(), F('timestamp').asc()]),
+        )
+        .filter(Q(low=1) | Q(high=1))
+        .order_by('timestamp')
+        .values_list('timestamp', field)
+    )
+
+
+def lttb_series(run, fields, points):
+    """{field: {t, value}} with `points` real samples per field."""
+    series = {}
+    lo, hi = _bounds(run)
+    for field in fields:
+        rows = list(_extremes(run, field, lo, hi, points * LTTB_PRE_BUCKETS)) if lo is not None else []
+        if not rows:
+            series[field] = {'t': [], 'value': []}
+            continue
+        ts, values = zip(*rows)
+        x = np.fromiter((t.timestamp() for t in ts), dtype=np.float64, count=len(ts))
+        y = np.asarray(values, dtype=np.float64)
+        idx = lttb_indices(x, y, points)
+        series[field] = {
+            't': np.rint(x[idx] * 1000).astype(np.int64).tolist(),
+            'value': y[idx].tolist(),
+        }
+    return series
+
+
+METHODS = {
+    'bucket': bucket_series,
+    'lttb': lttb_series,
+}
@@ -0,0 +1,267 @@
+"""
+Bulk loading of flight_log rows (gzip or plain NDJSON / CSV) into FlightRun / TelemetrySample.
+
+The upload is parsed as a stream and inserted in batches (one INSERT ... SELECT FROM unnest
+per batch), so a whole flight's log goes in with a handful of INSERTs instead of one per row.
+Rows that already exist (same run, timestamp and phase) are skipped by the unique constraint,
+which makes re-sending the same batch safe; the INSERT's rowcount says how many were new.
+
+Rows of a month that has no partition yet are held back: the partition is created after
+the upload's transaction (creating one locks the whole table) and those rows are inserted
+in a second transaction.
+"""
+import csv
+import datetime
+import gzip
+import io
+import json
+import math
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import FlightRun, TelemetrySample
+from .partitions import ensure_partitions, forget, is_missing_partition, missing_months, month_of
+from .spatial import index_samples
+
+BATCH_SIZE = 5000
+
+FLOAT_FIELDS = ('latitude', 'longitude', 'altitude_m', 'altitude_above_takeoff_m', 'battery_pct')
+INT_FIELDS = ('battery_remaining_mah', 'battery_full_mah')
+INT_RANGE = (-2 ** 31, 2 ** 31 - 1)  # IntegerField
+RUN_ID_MAX_LENGTH = FlightRun._meta.get_field('run_id').max_length
+PHASE_MAX_LENGTH = TelemetrySample._meta.get_field('phase').max_length
+
+
+def parse_timestamp(value):
+    """flight_logger timestamp ('YYYY-MM-DD HH:MM:SS[.mmm]', UTC) -> aware datetime."""
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+        except (OverflowError, OSError) as e:
+            raise ValueError(f"{value} is not a valid timestamp") from e
+    fmt = '%Y-%m-%d %H:%M:%S.%f' if '.' in value else '%Y-%m-%d %H:%M:%S'
+    return datetime.datetime.strptime(value, fmt).replace(tzinfo=datetime.timezone.utc)
+
+
+def _number(value, cast):
+    if value is None or value == '':
+        return None
+    number = float(value)
+    if cast is int:
+        # int() of inf raises OverflowError; refuse it (and NaN) as a bad value like any other
+        if not math.isfinite(number) or not INT_RANGE[0] <= number <= INT_RANGE[1]:
+            raise ValueError(f"{value} is out of range")
+        return int(number)
+    return number
+
+
+class _RequestReader(io.RawIOBase):
+    """Adapts a request stream (only .read()) to the io interface TextIOWrapper/GzipFile expect."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def iter_upload_rows(stream, content_type='', gzipped=False):
+    """
+    Yields (line_number, row_dict) from an NDJSON or CSV body, decompressing on the fly.
+    Lines that are not valid JSON are yielded as (line_number, None).
+    """
+    stream = io.BufferedReader(_RequestReader(stream), buffer_size=1 << 16)
+    if gzipped:
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if 'csv' in content_type:
+        # Line 1 is the header
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def build_sample(row, run):
+    """TelemetrySample (unsaved) from one flight_log row. Raises ValueError/KeyError on bad rows."""
+    phase = row.get('phase') or ''
+    if not isinstance(phase, str):
+        raise ValueError("phase is not a string")
+    if len(phase) > PHASE_MAX_LENGTH:
+        raise ValueError(f"phase longer than {PHASE_MAX_LENGTH} characters")
+    sample = TelemetrySample(
+        run=run,
+        timestamp=parse_timestamp(row['timestamp']),
+        phase=phase,
+    )
+    for field in FLOAT_FIELDS:
+        setattr(sample, field, _number(row.get(field), float))
+    for field in INT_FIELDS:
+        setattr(sample, field, _number(row.get(field), int))
+    return sample
+
+
+SAMPLE_COLUMNS = ('run_id', 'timestamp', 'phase', *FLOAT_FIELDS, *INT_FIELDS)
+SAMPLE_TYPES = ('bigint', 'timestamptz', 'varchar') + ('double precision',) * len(FLOAT_FIELDS) + ('integer',) * len(INT_FIELDS)
+
+
+def insert_samples(samples, batch_size=BATCH_SIZE):
+    """
+    Inserts unsaved TelemetrySamples, skipping those that are already stored. Returns how many
+    rows were actually inserted (the rowcount of INSERT ... ON CONFLICT DO NOTHING), so uploads
+    never need to count a run's samples.
+    """
+    table = TelemetrySample._meta.db_table
+    columns = ', '.join(f'"{column}"' for column in SAMPLE_COLUMNS)
+    arrays = ', '.join(f'%s::{kind}[]' for kind in SAMPLE_TYPES)
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(samples), batch_size):
+            chunk = samples[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) SELECT * FROM unnest({arrays}) ON CONFLICT DO NOTHING',
+                [[getattr(sample, column) for sample in chunk] for column in SAMPLE_COLUMNS],
+            )
+            inserted += cursor.rowcount
+    return inserted
+
+
+class _RunCache:
+    """run_id -> FlightRun for one upload, creating missing runs in bulk."""
+
+    def __init__(self):
+        self.runs = {}
+        self.bounds = {}
+        self.areas = {}
+
+    def resolve(self, run_ids):
+        missing = set(run_ids) - set(self.runs)
+        if not missing:
+            return
+        FlightRun.objects.bulk_create([FlightRun(run_id=r) for r in missing], ignore_conflicts=True)
+        for run in FlightRun.objects.filter(run_id__in=missing):
+            self.runs[run.run_id] = run
+
+    def extend(self, run, timestamp):
+        lo, hi = self.bounds.get(run.pk, (timestamp, timestamp))
+        self.bounds[run.pk] = (min(lo, timestamp), max(hi, timestamp))
+
+    def extend_area(self, run, latitude, longitude):
+        if latitude is None or longitude is None:
+            return
+        area = self.areas.get(run.pk)
+        if area is None:
+            self.areas[run.pk] = [latitude, latitude, longitude, longitude]
+        else:
+            area[0], area[1] = min(area[0], latitude), max(area[1], latitude)
+            area[2], area[3] = min(area[2], longitude), max(area[3], longitude)
+
+    def save_bounds(self):
+        for pk, (lo, hi) in self.bounds.items():
+            fields = {
+                'started_at': Least(Coalesce('started_at', Value(lo)), Value(lo)),
+                'ended_at': Greatest(Coalesce('ended_at', Value(hi)), Value(hi)),
+            }
+            if pk in self.areas:
+                for field, value in zip(('min_latitude', 'max_latitude', 'min_longitude', 'max_longitude'), self.areas[pk]):
+                    pick = Least if field.startswith('min') else Greatest
+                    fields[field] = pick(Coalesce(field, Value(value)), Value(value))
+            FlightRun.objects.filter(pk=pk).update(**fields)
+
+
+def ingest_rows(rows, batch_size=BATCH_SIZE):
+    """
+    Inserts (line_number, row_dict) pairs. Returns a summary dict:
+    received, inserted, duplicates, runs (run_ids touched), errors ([{line, error}]).
+    """
+    cache = _RunCache()
+    errors = []
+    received = 0
+    inserted = 0
+    deferred = []  # samples of months without a partition, inserted after the main transaction
+
+    def insert(samples):
+        for sample in samples:
+            cache.extend(sample.run, sample.timestamp)
+            cache.extend_area(sample.run, sample.latitude, sample.longitude)
+        count = insert_samples(samples, batch_size)
+        index_samples(samples)
+        return count
+
+    def hold_back(samples):
+        """Defers the samples of months without a partition; returns the others."""
+        missing = missing_months({month_of(sample.timestamp) for sample in samples})
+        if not missing:
+            return samples
+        deferred.extend(s for s in samples if month_of(s.timestamp) in missing)
+        return [s for s in samples if month_of(s.timestamp) not in missing]
+
+    def flush(batch):
+        nonlocal inserted
+        cache.resolve({row['run_id'] for _, row in batch})
+        samples = []
+        for line_number, row in batch:
+            try:
+                sample = build_sample(row, cache.runs[row['run_id']])
+            except (KeyError, TypeError, ValueError) as e:
+                errors.append({'line': line_number, 'error': f"{type(e).__name__}: {e}"})
+                continue
+            samples.append(sample)
+        samples = hold_back(samples)
+        try:
+            with transaction.atomic():
+                inserted += insert(samples)
+        except IntegrityError as e:
+            # A month this process saw was detached meanwhile (e.g. by cron): look again
+            if not is_missing_partition(e):
+                raise
+            forget({month_of(sample.timestamp) for sample in samples})
+            inserted += insert(hold_back(samples))
+
+    with transaction.atomic():
+        batch = []
+        for line_number, row in rows:
+            received += 1
+            if row is None or not row.get('run_id'):
+                errors.append({'line': line_number, 'error': 'Row is not an object with a run_id'})
+                continue
+            if not isinstance(row['run_id'], str) or len(row['run_id']) > RUN_ID_MAX_LENGTH:
+                errors.append({'line': line_number, 'error': f'run_id is not a string of at most {RUN_ID_MAX_LENGTH} characters'})
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        cache.save_bounds()
+
+    if deferred:
+        # Normally created ahead by `manage.py telemetry_partitions`; old flights may need one
+        ensure_partitions({month_of(sample.timestamp) for sample in deferred})
+        with transaction.atomic():
+            inserted += insert(deferred)
+            cache.save_bounds()
+
+    return {
+        'received': received,
+        'inserted': inserted,
+        'duplicates': received - len(errors) - inserted,
+        'runs': sorted(cache.runs),
+        'errors': errors,
+    }
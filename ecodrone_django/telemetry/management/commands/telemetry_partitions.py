@@ -0,0 +1,46 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from telemetry.partitions import (
+    ARCHIVE_SCHEMA,
+    MONTHS_AHEAD,
+    add_months,
+    detach_before,
+    ensure_ahead,
+    is_partitioned,
+    list_partitions,
+    month_of,
+    partition_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly telemetry partitions ahead of time and archive old ones "
+        "(run daily from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=MONTHS_AHEAD, help='Months to create after the current one')
+        parser.add_argument(
+            '--keep', type=int, default=getattr(settings, 'TELEMETRY_PARTITION_KEEP_MONTHS', None),
+            help=f'Months to keep attached, current one included; older ones move to the {ARCHIVE_SCHEMA} schema',
+        )
+        parser.add_argument('--drop', action='store_true', help='Drop old partitions instead of archiving them')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("Telemetry partitioning needs PostgreSQL")
+        if options['keep'] is not None and options['keep'] < 1:
+            raise CommandError("--keep must be at least 1")
+
+        for month in ensure_ahead(options['ahead']):
+            self.stdout.write(f"created {partition_name(month)}")
+        if options['keep'] is not None:
+            current = month_of(datetime.datetime.now(datetime.timezone.utc))
+            action = "dropped" if options['drop'] else f"archived to {ARCHIVE_SCHEMA}:"
+            for name in detach_before(add_months(current, 1 - options['keep']), drop=options['drop']):
+                self.stdout.write(f"{action} {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(list_partitions())} partitions attached"))
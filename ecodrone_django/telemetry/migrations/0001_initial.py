@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=64, unique=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TelemetrySample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('phase', models.CharField(max_length=32)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('altitude_m', models.FloatField(blank=True, null=True)),
+                ('altitude_above_takeoff_m', models.FloatField(blank=True, null=True)),
+                ('battery_pct', models.FloatField(blank=True, null=True)),
+                ('battery_remaining_mah', models.IntegerField(blank=True, null=True)),
+                ('battery_full_mah', models.IntegerField(blank=True, null=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='telemetry.flightrun')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('run', 'timestamp', 'phase'), name='unique_sample_run_timestamp_phase')],
+            },
+        ),
+    ]
@@ -0,0 +1,114 @@
+import datetime
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+# Inlined from telemetry.partitions as of this migration, so later changes there cannot change it
+TABLE = 'telemetry_telemetrysample'
+MONTHS_AHEAD = 3
+OLD = f'{TABLE}_unpartitioned'
+COLUMNS = (
+    'id, "timestamp", phase, latitude, longitude, altitude_m, altitude_above_takeoff_m, '
+    'battery_pct, battery_remaining_mah, battery_full_mah, run_id'
+)
+COLUMN_TYPES = """
+    "timestamp" timestamp with time zone NOT NULL,
+    phase varchar(32) NOT NULL,
+    latitude double precision NULL,
+    longitude double precision NULL,
+    altitude_m double precision NULL,
+    altitude_above_takeoff_m double precision NULL,
+    battery_pct double precision NULL,
+    battery_remaining_mah integer NULL,
+    battery_full_mah integer NULL,
+    run_id bigint NOT NULL
+"""
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partitions(execute, months):
+    for month in sorted(set(months)):
+        end = _add_months(month, 1)
+        execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+        )
+
+
+def _add_constraints(execute, primary_key):
+    # Added after the copy: building indexes once is much faster than maintaining them per row
+    execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY ({primary_key})')
+    execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT unique_sample_run_timestamp_phase UNIQUE (run_id, "timestamp", phase)')
+    execute(
+        f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_run_id_fk FOREIGN KEY (run_id) '
+        f'REFERENCES telemetry_flightrun (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    execute(f'CREATE INDEX {TABLE}_run_id_idx ON {TABLE} (run_id)')
+
+
+def partition_samples(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    connection, execute = schema_editor.connection, schema_editor.execute
+    execute(f'ALTER TABLE {TABLE} RENAME TO {OLD}')
+    execute(f'CREATE TABLE {TABLE} (id bigint NOT NULL, {COLUMN_TYPES}) PARTITION BY RANGE ("timestamp")')
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') FROM {OLD}")
+        months = [row[0].date() for row in cursor.fetchall()]
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    current = datetime.date(today.year, today.month, 1)
+    _create_partitions(execute, months + [_add_months(current, i) for i in range(MONTHS_AHEAD + 1)])
+
+    execute(f'INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {OLD}')
+    execute(f'DROP TABLE {OLD}')
+    _add_constraints(execute, 'id, "timestamp"')
+    execute(
+        f'CREATE INDEX telemetry_sample_ts_brin ON {TABLE} USING brin ("timestamp") WITH (pages_per_range = 32)'
+    )
+
+    # Identity columns on partitioned tables need PostgreSQL 17, a plain owned sequence works everywhere
+    execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+    execute(f"SELECT setval('{TABLE}_id_seq', COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)")
+    execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+
+
+def unpartition_samples(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+    execute(f'ALTER TABLE {TABLE} RENAME TO {OLD}')
+    execute(f'ALTER TABLE {OLD} ALTER COLUMN id DROP DEFAULT')
+    execute(f'DROP SEQUENCE {TABLE}_id_seq')
+    execute(f'CREATE TABLE {TABLE} (id bigint GENERATED BY DEFAULT AS IDENTITY, {COLUMN_TYPES})')
+    execute(f'INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {OLD}')
+    execute(f'DROP TABLE {OLD}')
+    _add_constraints(execute, 'id')
+    execute(f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_samples, unpartition_samples),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='telemetrysample',
+                    index=django.contrib.postgres.indexes.BrinIndex(
+                        fields=['timestamp'], name='telemetry_sample_ts_brin', pages_per_range=32
+                    ),
+                ),
+            ],
+        ),
+    ]
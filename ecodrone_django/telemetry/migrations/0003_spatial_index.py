@@ -0,0 +1,98 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+# Geohash cells as telemetry.spatial computed them for this migration, inlined so later
+# changes there cannot change it
+CELL_PRECISION = 7
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def _geohash(latitude, longitude, precision=CELL_PRECISION):
+    total = 5 * precision
+    lat_bits, lon_bits = total // 2, total - total // 2
+    lat_index = min(max(int((latitude + 90.0) / 180.0 * (1 << lat_bits)), 0), (1 << lat_bits) - 1)
+    lon_index = min(max(int((longitude + 180.0) / 360.0 * (1 << lon_bits)), 0), (1 << lon_bits) - 1)
+    code = 0
+    for k in range(total):
+        if k % 2 == 0:
+            bit = (lon_index >> (lon_bits - 1 - k // 2)) & 1
+        else:
+            bit = (lat_index >> (lat_bits - 1 - k // 2)) & 1
+        code = (code << 1) | bit
+    return ''.join(_BASE32[(code >> 5 * (precision - 1 - i)) & 31] for i in range(precision))
+
+
+def cell_windows(points):
+    """{(run pk, geohash): [first_at, last_at]} from (run pk, timestamp, latitude, longitude) tuples."""
+    windows = {}
+    for run, timestamp, latitude, longitude in points:
+        if latitude is None or longitude is None:
+            continue
+        window = windows.setdefault((run, _geohash(latitude, longitude)), [timestamp, timestamp])
+        window[0], window[1] = min(window[0], timestamp), max(window[1], timestamp)
+    return windows
+
+
+def index_existing_runs(apps, schema_editor):
+    FlightRun = apps.get_model('telemetry', 'FlightRun')
+    RunCell = apps.get_model('telemetry', 'RunCell')
+    TelemetrySample = apps.get_model('telemetry', 'TelemetrySample')
+    for run in FlightRun.objects.all().iterator():
+        located = TelemetrySample.objects.filter(run=run, latitude__isnull=False, longitude__isnull=False)
+        area = located.aggregate(
+            min_latitude=Min('latitude'), max_latitude=Max('latitude'),
+            min_longitude=Min('longitude'), max_longitude=Max('longitude'),
+        )
+        if area['min_latitude'] is None:
+            continue
+        FlightRun.objects.filter(pk=run.pk).update(**area)
+        windows = cell_windows(located.values_list('run', 'timestamp', 'latitude', 'longitude').iterator())
+        RunCell.objects.bulk_create(
+            [RunCell(run_id=pk, cell=cell, first_at=lo, last_at=hi) for (pk, cell), (lo, hi) in windows.items()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0002_partition_telemetrysample'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightrun',
+            name='max_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightrun',
+            name='max_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightrun',
+            name='min_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightrun',
+            name='min_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RunCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(db_index=True, max_length=12)),
+                ('first_at', models.DateTimeField()),
+                ('last_at', models.DateTimeField()),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='telemetry.flightrun')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('run', 'cell'), name='unique_runcell_run_cell')],
+            },
+        ),
+        migrations.RunPython(index_existing_runs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import models
+
+
+class FlightRun(models.Model):
+    """One flight, identified by the run_id the drone-side flight_logger writes on every row."""
+    run_id = models.CharField(max_length=64, unique=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    # Bounding box of the run's GPS fixes (NULL until a row with a position arrives)
+    min_latitude = models.FloatField(null=True, blank=True)
+    max_latitude = models.FloatField(null=True, blank=True)
+    min_longitude = models.FloatField(null=True, blank=True)
+    max_longitude = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.run_id
+
+
+class TelemetrySample(models.Model):
+    """
+    One flight_log.csv row. Empty CSV cells are stored as NULL.
+
+    On PostgreSQL the table is partitioned by month on `timestamp` (see partitions.py);
+    its primary key there is (id, timestamp), ids stay unique through one sequence.
+    """
+    run = models.ForeignKey(FlightRun, on_delete=models.CASCADE, related_name='samples')
+    timestamp = models.DateTimeField()
+    phase = models.CharField(max_length=32)
+
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    altitude_m = models.FloatField(null=True, blank=True)
+    altitude_above_takeoff_m = models.FloatField(null=True, blank=True)
+    battery_pct = models.FloatField(null=True, blank=True)
+    battery_remaining_mah = models.IntegerField(null=True, blank=True)
+    battery_full_mah = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Makes uploads idempotent: re-sent rows hit this and are skipped
+            models.UniqueConstraint(fields=['run', 'timestamp', 'phase'], name='unique_sample_run_timestamp_phase'),
+        ]
+        indexes = [
+            # Rows arrive roughly in time order, so a BRIN index stays tiny and cheap to maintain
+            BrinIndex(fields=['timestamp'], name='telemetry_sample_ts_brin', pages_per_range=32),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} {self.timestamp} {self.phase}"
+
+
+class RunCell(models.Model):
+    """
+    A geohash cell (precision spatial.CELL_PRECISION, ~150 m) the run's track passes through,
+    with when the run was first and last in it. The spatial index of spatial.py.
+    """
+    run = models.ForeignKey(FlightRun, on_delete=models.CASCADE, related_name='cells')
+    cell = models.CharField(max_length=12, db_index=True)
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'cell'], name='unique_runcell_run_cell'),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} {self.cell}"
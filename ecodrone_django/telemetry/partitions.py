@@ -0,0 +1,160 @@
+"""
+Monthly range partitions of the telemetry samples table (PostgreSQL only).
+
+telemetry_telemetrysample is partitioned by `timestamp`, one partition per calendar month
+(UTC), named telemetry_telemetrysample_pYYYY_MM (migration 0002). A time range query only
+scans the months it covers, and a month that no longer gets rows is never vacuumed again.
+Each partition carries its own indexes: BRIN on timestamp (a few pages per month instead
+of a B-tree the size of the data), B-tree on run_id, and the (run, timestamp, phase) unique
+constraint that keeps uploads idempotent.
+
+Partitions are created ahead of time by `manage.py telemetry_partitions` (run it from cron)
+and, as a fallback, by ingest_rows() for months of uploaded rows that have no partition
+yet. Creating a partition locks the whole table, so each one is created in its own short
+transaction, never inside an upload's. Old months are detached into the telemetry_archive
+schema (or dropped): the rows leave every query and ORM delete, but stay in the database
+until someone dumps them.
+"""
+import datetime
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+TABLE = 'telemetry_telemetrysample'
+ARCHIVE_SCHEMA = 'telemetry_archive'
+MONTHS_AHEAD = getattr(settings, 'TELEMETRY_PARTITION_MONTHS_AHEAD', 3)
+
+# Committed partitions this process has seen, so ingest checks the catalog only once per month.
+# Another process may detach a month: ingest then forget()s it and looks again.
+_known = set()
+_lock = threading.Lock()
+
+
+def month_of(value):
+    """First day of the (UTC) month containing a date or aware datetime."""
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn=None):
+    return (conn or connection).vendor == 'postgresql'
+
+
+def list_partitions(conn=None):
+    """{month: partition name} of the partitions currently attached."""
+    with (conn or connection).cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        try:
+            month = datetime.datetime.strptime(name[-7:], '%Y_%m').date()
+        except ValueError:
+            continue
+        partitions[month] = name
+    return partitions
+
+
+def create_partition(month, conn=None):
+    start, end = month, add_months(month, 1)
+    with (conn or connection).cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+        )
+
+
+def _remember(months):
+    with _lock:
+        _known.update(months)
+
+
+def forget(months):
+    """Drops months from the cache (e.g. after an insert found no partition for them)."""
+    with _lock:
+        _known.difference_update(months)
+
+
+def missing_months(months, conn=None):
+    """The months of `months` without a partition. Reads only the catalog, takes no table lock."""
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return set()
+    months = {month_of(m) for m in months}
+    with _lock:
+        unknown = months - _known
+    if not unknown:
+        return set()
+    existing = set(list_partitions(conn))
+    _remember(existing)
+    return unknown - existing
+
+
+def is_missing_partition(error):
+    """True for the database error of an insert that found no partition for its row."""
+    cause = getattr(error, '__cause__', None)
+    return getattr(cause, 'pgcode', None) == '23514' and 'no partition of relation' in str(cause)
+
+
+def ensure_partitions(months, conn=None):
+    """
+    Creates the partitions for `months` that do not exist yet, each in its own transaction
+    (call it outside any other, or the table stays locked until that one ends). Months are
+    only cached once their partition is committed. Returns the months created.
+    """
+    conn = conn or connection
+    created = sorted(missing_months(months, conn))
+    for month in created:
+        with transaction.atomic(using=conn.alias):
+            create_partition(month, conn)
+            transaction.on_commit(lambda month=month: _remember([month]), using=conn.alias)
+    return created
+
+
+def ensure_ahead(months_ahead=MONTHS_AHEAD, today=None, conn=None):
+    """Partitions for the current month and the next `months_ahead`."""
+    current = month_of(today or datetime.datetime.now(datetime.timezone.utc))
+    return ensure_partitions([add_months(current, i) for i in range(months_ahead + 1)], conn)
+
+
+def detach_before(month, drop=False, conn=None):
+    """
+    Detaches every partition older than `month` and moves it to ARCHIVE_SCHEMA (or drops it).
+    The archived copy loses its foreign key, so its runs can still be deleted.
+    Returns the partition names.
+    """
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return []
+    old = [(m, name) for m, name in sorted(list_partitions(conn).items()) if m < month_of(month)]
+    with conn.cursor() as cursor:
+        if old and not drop:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        for m, name in old:
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+            else:
+                cursor.execute(
+                    "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name]
+                )
+                for (constraint,) in cursor.fetchall():
+                    cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"')
+                cursor.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+            forget([m])
+    return [name for _, name in old]
@@ -0,0 +1,253 @@
+"""
+Spatial index over flight telemetry: which runs passed over an area, and when.
+
+Two levels, both kept up to date by ingest_rows():
+- FlightRun.min/max_latitude/longitude: each run's bounding box, a cheap first filter.
+- RunCell: the geohash cells (CELL_PRECISION = 7, about 150 x 150 m) each run's track touched,
+  with the first and last time the run was in each one.
+
+A query box is covered by at most MAX_COVER_CELLS geohash prefixes (coarser for larger
+areas). A prefix LIKE on the cell index then gives the matching runs and the time window
+each spent there. Only then are samples read: the matching runs' rows inside those windows
+and the box, through the (run, timestamp) unique index. Those rows are grouped into
+segments. A query reads a few hundred rows however many years of telemetry are stored, and
+needs no PostGIS.
+"""
+import math
+
+import numpy as np
+from django.db import connection
+from django.db.models import Max, Min, Q
+
+from .models import FlightRun, RunCell, TelemetrySample
+
+CELL_PRECISION = 7
+MAX_COVER_CELLS = 32
+SEGMENT_GAP_S = 10.0  # a longer gap between matching fixes starts a new segment
+EARTH_RADIUS_M = 6371008.8
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def _bits(precision):
+    """(latitude bits, longitude bits) of a geohash with `precision` characters."""
+    total = 5 * precision
+    return total // 2, total - total // 2
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell in degrees."""
+    lat_bits, lon_bits = _bits(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _grid_index(values, offset, span, bits):
+    index = ((np.asarray(values, dtype=float) + offset) / span * (1 << bits)).astype(np.int64)
+    return np.clip(index, 0, (1 << bits) - 1)
+
+
+def _interleave(lat_index, lon_index, precision):
+    """Geohash codes as integers: bits alternate longitude / latitude, longitude first."""
+    lat_bits, lon_bits = _bits(precision)
+    code = np.zeros(len(lat_index), dtype=np.int64)
+    for k in range(5 * precision):
+        if k % 2 == 0:
+            bit = (lon_index >> (lon_bits - 1 - k // 2)) & 1
+        else:
+            bit = (lat_index >> (lat_bits - 1 - k // 2)) & 1
+        code = (code << 1) | bit
+    return code
+
+
+def _to_string(code, precision):
+    chars = []
+    for _ in range(precision):
+        chars.append(_BASE32[code & 31])
+        code >>= 5
+    return ''.join(reversed(chars))
+
+
+def encode_many(latitudes, longitudes, precision=CELL_PRECISION):
+    """Geohash strings for arrays of positions."""
+    lat_bits, lon_bits = _bits(precision)
+    codes = _interleave(
+        _grid_index(latitudes, 90.0, 180.0, lat_bits), _grid_index(longitudes, 180.0, 360.0, lon_bits), precision
+    )
+    names = {code: _to_string(code, precision) for code in set(codes.tolist())}
+    return [names[code] for code in codes.tolist()]
+
+
+def encode(latitude, longitude, precision=CELL_PRECISION):
+    return encode_many([latitude], [longitude], precision)[0]
+
+
+def covering(min_lat, min_lon, max_lat, max_lon, max_cells=MAX_COVER_CELLS):
+    """
+    (precision, geohashes) of the finest precision (up to CELL_PRECISION) whose cells cover
+    the box in at most `max_cells` cells; (0, []) for boxes too large to cover usefully.
+    """
+    for precision in range(CELL_PRECISION, 0, -1):
+        lat_bits, lon_bits = _bits(precision)
+        lat_lo, lat_hi = _grid_index([min_lat, max_lat], 90.0, 180.0, lat_bits).tolist()
+        lon_lo, lon_hi = _grid_index([min_lon, max_lon], 180.0, 360.0, lon_bits).tolist()
+        if (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1) > max_cells:
+            continue
+        lat_index, lon_index = np.meshgrid(np.arange(lat_lo, lat_hi + 1), np.arange(lon_lo, lon_hi + 1))
+        codes = _interleave(lat_index.ravel(), lon_index.ravel(), precision)
+        return precision, sorted(_to_string(code, precision) for code in codes.tolist())
+    return 0, []
+
+
+def cell_windows(points, precision=CELL_PRECISION):
+    """{(run pk, geohash): [first_at, last_at]} from (run pk, timestamp, latitude, longitude) tuples."""
+    points = [p for p in points if p[2] is not None and p[3] is not None]
+    if not points:
+        return {}
+    cells = encode_many([p[2] for p in points], [p[3] for p in points], precision)
+    windows = {}
+    for (run, timestamp, _, _), cell in zip(points, cells):
+        window = windows.get((run, cell))
+        if window is None:
+            windows[(run, cell)] = [timestamp, timestamp]
+        elif timestamp < window[0]:
+            window[0] = timestamp
+        elif timestamp > window[1]:
+            window[1] = timestamp
+    return windows
+
+
+def index_samples(samples):
+    """
+    Merges the cells of (unsaved or saved) TelemetrySamples into RunCell. The windows are
+    widened in the upsert itself (LEAST / GREATEST with the stored row), so concurrent uploads
+    of the same run cannot overwrite each other's first_at / last_at.
+    """
+    windows = cell_windows((s.run_id, s.timestamp, s.latitude, s.longitude) for s in samples)
+    if not windows:
+        return
+    keys = list(windows)
+    table = RunCell._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (run_id, cell, first_at, last_at) "
+            "SELECT * FROM unnest(%s::bigint[], %s::varchar[], %s::timestamptz[], %s::timestamptz[]) "
+            "ON CONFLICT (run_id, cell) DO UPDATE SET "
+            f"first_at = LEAST({table}.first_at, EXCLUDED.first_at), "
+            f"last_at = GREATEST({table}.last_at, EXCLUDED.last_at)",
+            [
+                [run for run, _ in keys],
+                [cell for _, cell in keys],
+                [windows[key][0] for key in keys],
+                [windows[key][1] for key in keys],
+            ],
+        )
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def radius_box(latitude, longitude, radius_m):
+    """(min_lat, min_lon, max_lat, max_lon) of the circle."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = math.cos(math.radians(latitude))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)))
+    return (max(-90.0, latitude - dlat), max(-180.0, longitude - dlon),
+            min(90.0, latitude + dlat), min(180.0, longitude + dlon))
+
+
+def _segments(times, gap_s=SEGMENT_GAP_S):
+    segments = []
+    for t in times:
+        if segments and (t - segments[-1]['end']).total_seconds() <= gap_s:
+            segments[-1]['end'] = t
+            segments[-1]['points'] += 1
+        else:
+            segments.append({'start': t, 'end': t, 'points': 1})
+    return segments
+
+
+def search(min_lat, min_lon, max_lat, max_lon, start=None, end=None, center=None, radius_m=None,
+           limit=100, segments=True):
+    """
+    Runs with fixes inside the box (and within `radius_m` of `center`, if given), newest first:
+    [{run_id, started_at, ended_at, bbox, segments: [{start, end, points}]}]. `start` / `end`
+    restrict the time range. Samples are only read for the `limit` runs returned; with
+    segments=False not at all, and runs are matched on their cells alone.
+    """
+    runs = FlightRun.objects.filter(
+        min_latitude__lte=max_lat, max_latitude__gte=min_lat,
+        min_longitude__lte=max_lon, max_longitude__gte=min_lon,
+    )
+    if start is not None:
+        runs = runs.filter(ended_at__gte=start)
+    if end is not None:
+        runs = runs.filter(started_at__lte=end)
+
+    _, cells = covering(min_lat, min_lon, max_lat, max_lon)
+    if cells:
+        prefixes = Q()
+        for cell in cells:
+            prefixes |= Q(cell__startswith=cell)
+        windows = {
+            row['run']: (row['lo'], row['hi'])
+            for row in RunCell.objects.filter(prefixes, run__in=runs)
+            .values('run').annotate(lo=Min('first_at'), hi=Max('last_at')).order_by()
+        }
+        runs = runs.filter(pk__in=list(windows))
+    else:
+        windows = {}
+
+    if not segments:
+        return [_run_result(run, None) for run in runs.order_by('-started_at')[:limit]]
+
+    # Cell matches are approximate (cells overhang the box): check the fixes, a batch of runs
+    # at a time, until `limit` runs really have one inside
+    results = []
+    candidates = list(runs.order_by('-started_at'))
+    while candidates and len(results) < limit:
+        batch, candidates = candidates[:limit], candidates[limit:]
+        times = _matching_times(batch, windows, min_lat, min_lon, max_lat, max_lon, start, end, center, radius_m)
+        results.extend(_run_result(run, _segments(times[run.pk])) for run in batch if run.pk in times)
+    return results[:limit]
+
+
+def _matching_times(runs, windows, min_lat, min_lon, max_lat, max_lon, start, end, center, radius_m):
+    """{run pk: [timestamps of the run's fixes inside the area]}"""
+    run_times = Q()
+    for run in runs:
+        lo, hi = windows.get(run.pk, (run.started_at, run.ended_at))
+        lo = lo if start is None or lo is None else max(lo, start)
+        hi = hi if end is None or hi is None else min(hi, end)
+        window = Q(run=run.pk)
+        if lo is not None:
+            window &= Q(timestamp__gte=lo)
+        if hi is not None:
+            window &= Q(timestamp__lte=hi)
+        run_times |= window
+    rows = list(
+        TelemetrySample.objects.filter(
+            run_times, latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon)
+        ).order_by('run', 'timestamp').values_list('run', 'timestamp', 'latitude', 'longitude')
+    )
+    if center is not None and radius_m is not None and rows:
+        distance = haversine_m(center[0], center[1], [r[2] for r in rows], [r[3] for r in rows])
+        rows = [row for row, inside in zip(rows, (distance <= radius_m).tolist()) if inside]
+    times = {}
+    for run, timestamp, _, _ in rows:
+        times.setdefault(run, []).append(timestamp)
+    return times
+
+
+def _run_result(run, segments):
+    result = {
+        'run_id': run.run_id,
+        'started_at': run.started_at,
+        'ended_at': run.ended_at,
+        'bbox': [run.min_longitude, run.min_latitude, run.max_longitude, run.max_latitude],
+    }
+    if segments is not None:
+        result['segments'] = segments
+    return result
@@ -0,0 +1,141 @@
+import gzip
+import json
+
+from django.test import TestCase
+
+from users.authentication import create_access_token
+from users.models import User
+from .models import FlightRun, RunCell, TelemetrySample
+
+CSV_HEADER = 'timestamp,run_id,phase,latitude,longitude,altitude_m,altitude_above_takeoff_m,battery_pct,battery_remaining_mah,battery_full_mah'
+
+
+def _row(second, run_id='20240501_101500', phase='in_flight', **fields):
+    return {'timestamp': f'2024-05-01 10:15:{second:02d}.250', 'run_id': run_id, 'phase': phase,
+            'latitude': 48.879, 'longitude': 2.3675, 'battery_pct': 90 - second, **fields}
+
+
+def _ndjson(rows):
+    return ''.join(json.dumps(row) + '\n' for row in rows).encode()
+
+
+class TelemetryUploadTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(email='pilot@example.com', password='Str0ng-passw0rd')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {create_access_token(user)}'}
+
+    def _upload(self, body, content_type='application/x-ndjson', **headers):
+        return self.client.post('/telemetry/upload', data=body, content_type=content_type, **self.auth, **headers)
+
+    def test_upload_is_idempotent(self):
+        body = _ndjson([_row(s) for s in range(10)])
+        first = self._upload(body).json()
+        self.assertEqual((first['inserted'], first['duplicates']), (10, 0))
+
+        again = self._upload(body).json()
+        self.assertEqual((again['inserted'], again['duplicates']), (0, 10))
+        self.assertEqual(TelemetrySample.objects.count(), 10)
+
+        run = FlightRun.objects.get(run_id='20240501_101500')
+        self.assertEqual(run.started_at.isoformat(), '2024-05-01T10:15:00.250000+00:00')
+        self.assertEqual(run.ended_at.isoformat(), '2024-05-01T10:15:09.250000+00:00')
+
+    def test_gzip_csv_upload(self):
+        lines = [CSV_HEADER, '2024-05-01 10:15:00,r_csv,connected,,,,,95,6000,6800',
+                 '2024-05-01 10:15:01,r_csv,in_flight,48.879,2.3675,35.2,1.5,95,5990,6800']
+        body = gzip.compress(('\n'.join(lines) + '\n').encode())
+        summary = self._upload(body, content_type='text/csv', HTTP_CONTENT_ENCODING='gzip').json()
+        self.assertEqual((summary['inserted'], summary['errors']), (2, []))
+
+        connected, in_flight = TelemetrySample.objects.filter(run__run_id='r_csv').order_by('timestamp')
+        self.assertIsNone(connected.latitude)
+        self.assertEqual(connected.battery_remaining_mah, 6000)
+        self.assertEqual((in_flight.altitude_m, in_flight.battery_full_mah), (35.2, 6800))
+
+    def test_bad_rows_are_reported_and_valid_rows_kept(self):
+        body = b'\n'.join([
+            _ndjson([_row(0)]).strip(),
+            b'not json',
+            json.dumps({'timestamp': '2024-05-01 10:15:01'}).encode(),
+            json.dumps(_row(2, timestamp='yesterday')).encode(),
+            json.dumps(_row(3, run_id='r' * 65)).encode(),
+            json.dumps(_row(4, phase='p' * 33)).encode(),
+            json.dumps(_row(5, battery_remaining_mah=2 ** 31)).encode(),
+            _ndjson([_row(6)]).strip(),
+            b'{"timestamp": "2024-05-01 10:15:07", "run_id": "r", "battery_full_mah": Infinity}',
+            json.dumps(_row(8, phase=['in_flight'])).encode(),
+            json.dumps(_row(9, timestamp=1e20)).encode(),
+        ]) + b'\n'
+        response = self._upload(body)
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(summary['inserted'], 2)
+        errors = {error['line']: error['error'] for error in summary['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6, 7, 9, 10, 11])
+        self.assertIn('run_id', errors[5])
+        self.assertIn('phase', errors[6])
+        self.assertIn('out of range', errors[7])
+        self.assertIn('out of range', errors[9])
+        self.assertIn('phase is not a string', errors[10])
+        self.assertIn('timestamp', errors[11])
+
+    def test_inserted_counts_only_new_rows(self):
+        self._upload(_ndjson([_row(s) for s in range(10)]))
+        # Overlapping batch of the same run, plus a row repeated within the batch
+        summary = self._upload(_ndjson([_row(s) for s in range(5, 15)] + [_row(14)])).json()
+        self.assertEqual((summary['inserted'], summary['duplicates']), (5, 6))
+        self.assertEqual(TelemetrySample.objects.count(), 15)
+
+    def test_upload_without_valid_rows_is_refused(self):
+        response = self._upload(b'not json\n' + json.dumps(_row(0, run_id='r' * 65)).encode() + b'\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['inserted'], 0)
+        self.assertEqual(TelemetrySample.objects.count(), 0)
+
+    def test_corrupt_gzip_is_refused(self):
+        response = self._upload(b'\x1f\x8b not gzip', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 400)
+
+    def test_live_publish_refuses_non_string_run_id(self):
+        for run_id in (['a', 'b'], {'run': 'a'}):
+            response = self.client.post('/telemetry/live/publish', data=_ndjson([_row(0, run_id=run_id)]),
+                                        content_type='application/x-ndjson', **self.auth)
+            self.assertEqual(response.status_code, 400, run_id)
+            self.assertEqual(response.json()['error'], 'run_id must be a string')
+
+    def test_upload_needs_authentication(self):
+        response = self.client.post('/telemetry/upload', data=_ndjson([_row(0)]), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 401)
+
+
+class SpatialIndexTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(email='pilot@example.com', password='Str0ng-passw0rd')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {create_access_token(user)}'}
+
+    def _upload(self, rows):
+        return self.client.post('/telemetry/upload', data=_ndjson(rows), content_type='application/x-ndjson', **self.auth)
+
+    def test_cell_windows_only_widen(self):
+        # The middle of the run first, then rows before and after it: the stored window grows
+        self._upload([_row(s) for s in range(20, 30)])
+        self._upload([_row(s) for s in range(0, 5)] + [_row(s) for s in range(40, 45)])
+        cell = RunCell.objects.get(run__run_id='20240501_101500')
+        self.assertEqual(cell.first_at.isoformat(), '2024-05-01T10:15:00.250000+00:00')
+        self.assertEqual(cell.last_at.isoformat(), '2024-05-01T10:15:44.250000+00:00')
+
+        self._upload([_row(s) for s in range(10, 15)])
+        cell.refresh_from_db()
+        self.assertEqual((cell.first_at.second, cell.last_at.second), (0, 44))
+
+    def test_search_finds_run_and_refuses_invalid_dates(self):
+        self._upload([_row(s) for s in range(10)])
+        params = {'bbox': '2.36,48.87,2.37,48.88'}
+        response = self.client.get('/telemetry/search', params, **self.auth)
+        self.assertEqual([run['run_id'] for run in response.json()['runs']], ['20240501_101500'])
+
+        for value in ('yesterday', '2024-13-01T00:00'):
+            response = self.client.get('/telemetry/search', {**params, 'from': value}, **self.auth)
+            self.assertEqual(response.status_code, 400, value)
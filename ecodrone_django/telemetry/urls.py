@@ -0,0 +1,15 @@
+from django.urls import path
+from .async_views import live_publish, live_stats, live_stream
+from .views import FlightRunListView, SpatialSearchView, TelemetrySeriesView, TelemetryUploadView
+
+
+urlpatterns = [
+    path('upload', TelemetryUploadView.as_view(), name='telemetry-upload'),
+    path('runs', FlightRunListView.as_view(), name='telemetry-runs'),
+    path('runs/<str:run_id>/series', TelemetrySeriesView.as_view(), name='telemetry-series'),
+    path('search', SpatialSearchView.as_view(), name='telemetry-search'),
+    path('live', live_stream, name='telemetry-live'),
+    path('live/publish', live_publish, name='telemetry-live-publish'),
+    path('live/stats', live_stats, name='telemetry-live-stats'),
+    path('live/<str:run_id>', live_stream, name='telemetry-live-run'),
+]
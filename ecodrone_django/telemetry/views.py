@@ -0,0 +1,147 @@
+# views.py
+import datetime
+
+from django.utils.dateparse import parse_datetime
+from rest_framework import status, views
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from users.authentication import JWTAuthentication
+from .downsample import DEFAULT_POINTS, MAX_POINTS, METHODS, SERIES_FIELDS
+from .ingest import ingest_rows, iter_upload_rows
+from .models import FlightRun
+from .spatial import radius_box, search
+
+
+class TelemetryUploadView(views.APIView):
+    """
+    Bulk upload of flight_log rows for one or more runs.
+
+    Body: NDJSON (one row object per line) or CSV with the flight_log.csv header
+    (Content-Type: text/csv), optionally gzip-compressed (Content-Encoding: gzip).
+    Re-uploading rows that are already stored is a no-op, so failed uploads can be retried.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        content_type = request.content_type or ''
+        gzipped = 'gzip' in request.headers.get('Content-Encoding', '') or content_type.endswith('gzip')
+        stream = request.stream
+        if stream is None:
+            return Response({"error": "Empty upload"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            summary = ingest_rows(iter_upload_rows(stream, content_type, gzipped))
+        except (OSError, UnicodeDecodeError, EOFError) as e:
+            # Corrupt gzip stream / non UTF-8 body
+            return Response({"error": f"Could not read upload: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if summary['received'] and not summary['inserted'] and not summary['duplicates']:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+
+
+class FlightRunListView(views.APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        runs = FlightRun.objects.order_by('-started_at').values('run_id', 'started_at', 'ended_at')
+        return Response(list(runs), status=status.HTTP_200_OK)
+
+
+class TelemetrySeriesView(views.APIView):
+    """
+    A run's telemetry reduced to at most `points` points per field, for charts.
+
+    Query params: fields (comma separated, default altitude_above_takeoff_m,battery_pct),
+    points (default 500, max 5000), method (bucket = min/max/avg per time bucket, or lttb).
+    Timestamps are epoch milliseconds.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, run_id):
+        try:
+            run = FlightRun.objects.get(run_id=run_id)
+        except FlightRun.DoesNotExist:
+            return Response({"error": "Run not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        fields = request.query_params.get('fields', 'altitude_above_takeoff_m,battery_pct').split(',')
+        unknown = [f for f in fields if f not in SERIES_FIELDS]
+        if unknown:
+            return Response({"error": f"Unknown fields: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        method = request.query_params.get('method', 'bucket')
+        if method not in METHODS:
+            return Response({"error": f"method must be one of: {', '.join(METHODS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            points = int(request.query_params.get('points', DEFAULT_POINTS))
+        except ValueError:
+            return Response({"error": "points must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        points = max(3, min(points, MAX_POINTS))
+
+        return Response({
+            "run_id": run.run_id,
+            "method": method,
+            "points": points,
+            "series": METHODS[method](run, fields, points),
+        }, status=status.HTTP_200_OK)
+
+
+def _floats(value, count):
+    parts = value.split(',')
+    if len(parts) != count:
+        raise ValueError
+    return [float(part) for part in parts]
+
+
+class SpatialSearchView(views.APIView):
+    """
+    Runs that passed over an area, with the stretches of track inside it (see spatial.py).
+
+    Query params: bbox=min_lon,min_lat,max_lon,max_lat, or point=lat,lon with radius_m;
+    optional from / to (ISO 8601) and limit (default 100, max 1000).
+    Segments are consecutive matching fixes at most spatial.SEGMENT_GAP_S seconds apart.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        center = radius = None
+        try:
+            if 'bbox' in params:
+                min_lon, min_lat, max_lon, max_lat = _floats(params['bbox'], 4)
+            elif 'point' in params and 'radius_m' in params:
+                center, radius = _floats(params['point'], 2), float(params['radius_m'])
+                min_lat, min_lon, max_lat, max_lon = radius_box(center[0], center[1], radius)
+            else:
+                return Response({"error": "Give bbox=min_lon,min_lat,max_lon,max_lat or point=lat,lon and radius_m"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(int(params.get('limit', 100)), 1000))
+        except ValueError:
+            return Response({"error": "bbox, point, radius_m and limit must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180) or (radius is not None and radius <= 0):
+            return Response({"error": "Invalid area"}, status=status.HTTP_400_BAD_REQUEST)
+
+        times = {}
+        for name in ('from', 'to'):
+            value = params.get(name)
+            try:
+                times[name] = parse_datetime(value) if value else None
+            except ValueError:
+                # Well-formed but out of range, e.g. month 13
+                times[name] = None
+            if value and times[name] is None:
+                return Response({"error": f"{name} must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+            if times[name] is not None and times[name].tzinfo is None:
+                times[name] = times[name].replace(tzinfo=datetime.timezone.utc)  # flight logs are UTC
+
+        runs = search(min_lat, min_lon, max_lat, max_lon, start=times['from'], end=times['to'],
+                      center=center, radius_m=radius, limit=limit)
+        return Response({"runs": runs}, status=status.HTTP_200_OK)
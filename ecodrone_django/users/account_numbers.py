@@ -0,0 +1,58 @@
+"""
+Account number allocation: 'PV' + 5 digits, unique without checking the table.
+
+Slots come from a PostgreSQL sequence, one value per account, so concurrent registrations
+(in any process) can never get the same slot and no slot is left unused: all
+ACCOUNT_NUMBER_SPACE numbers can be handed out. A bulk import draws all the slots it needs in
+one round trip. Slots are mapped to codes with a fixed keyed permutation of 0..99999, so
+consecutive accounts still get random-looking numbers.
+"""
+from django.db import connection
+
+ACCOUNT_NUMBER_PREFIX = 'PV'
+ACCOUNT_NUMBER_SPACE = 100000
+SEQUENCE_NAME = 'users_account_number_seq'
+
+# Fixed on purpose: changing these (or deriving them from SECRET_KEY) would remap
+# slots already handed out and produce duplicates.
+_FEISTEL_KEYS = (0x1B5, 0x0C7, 0x163, 0x0A9)
+_HALF_BITS = 9  # 18-bit Feistel domain (262144) >= ACCOUNT_NUMBER_SPACE
+_HALF_MASK = (1 << _HALF_BITS) - 1
+
+
+class AccountNumbersExhausted(Exception):
+    pass
+
+
+def _feistel(x):
+    left, right = x >> _HALF_BITS, x & _HALF_MASK
+    for key in _FEISTEL_KEYS:
+        left, right = right, left ^ (((right * 0x2F5 + key) ^ (right >> 4)) & _HALF_MASK)
+    return (left << _HALF_BITS) | right
+
+
+def permute(slot):
+    """Bijection on 0..ACCOUNT_NUMBER_SPACE-1 (Feistel network + cycle walking)."""
+    x = _feistel(slot)
+    while x >= ACCOUNT_NUMBER_SPACE:
+        x = _feistel(x)
+    return x
+
+
+def format_account_number(slot):
+    return f"{ACCOUNT_NUMBER_PREFIX}{permute(slot):05d}"
+
+
+def reserve_slots(count):
+    """`count` unused slots from the database sequence (atomic across processes)."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [SEQUENCE_NAME, count])
+        slots = [row[0] for row in cursor.fetchall()]
+    if slots and max(slots) >= ACCOUNT_NUMBER_SPACE:
+        raise AccountNumbersExhausted("All account numbers have been allocated.")
+    return slots
+
+
+def allocate_account_numbers(count):
+    """`count` new account numbers, one query."""
+    return [format_account_number(slot) for slot in reserve_slots(count)] if count else []
@@ -0,0 +1,97 @@
+# async_views.py – login / register with password hashing off the request thread
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .account_numbers import AccountNumbersExhausted
+from .authentication import create_access_token, set_access_cookie
+from .hashing import HashingPoolFull, hashing_pool
+from .models import User
+from .serializers import LoginCredentialsSerializer, RegisterSerializer
+
+
+def _too_busy():
+    response = JsonResponse({"error": "Too many requests, please retry shortly"}, status=429)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    """Same contract as LoginView; 429 when the hashing pool is saturated."""
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    serializer = LoginCredentialsSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    email = serializer.validated_data['email']
+    password = serializer.validated_data['password']
+
+    try:
+        user = await User.objects.aget(email=email)
+    except User.DoesNotExist:
+        user = None
+
+    try:
+        if user is None:
+            # Hash anyway so the response time doesn't reveal which emails exist
+            await hashing_pool.run(make_password, password)
+            valid = False
+        else:
+            valid = await hashing_pool.run(check_password, password, user.password)
+    except HashingPoolFull:
+        return _too_busy()
+
+    # authenticate() also rejects inactive users as incorrect credentials
+    if not valid or not user.is_active:
+        return JsonResponse({"non_field_errors": ["Incorrect credentials"]}, status=400)
+
+    token = create_access_token(user)
+    response = JsonResponse({
+        "message": "Login successful",
+        "user_id": user.id,
+        "token": token,
+    }, status=200)
+    set_access_cookie(response, token)
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def register_view(request):
+    """Same contract as RegisterView; 429 when the hashing pool is saturated."""
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    serializer = RegisterSerializer(data=data)
+    # Validation queries the DB (unique email), so it runs in Django's sync thread
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        password_hash = await hashing_pool.run(make_password, serializer.validated_data['password'])
+    except HashingPoolFull:
+        return _too_busy()
+
+    try:
+        user = await sync_to_async(serializer.save)(password_hash=password_hash)
+    except AccountNumbersExhausted as e:
+        return JsonResponse({"error": str(e)}, status=503)
+    return JsonResponse({
+        "message": "User created successfully",
+        "user_id": user.id
+    }, status=201)
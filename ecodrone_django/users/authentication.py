@@ -0,0 +1,170 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework import authentication, exceptions
+
+from .models import User
+
+
+class TokenUserCache:
+    """
+    Small in-process cache of verified token -> user, bounded in size (LRU) and age (TTL).
+
+    Entries never outlive the token's own `exp`. Signal handlers in users/signals.py drop a
+    user's entries whenever the User or its Accounts row is saved or deleted. The cache is per
+    process and those handlers only reach the process that saved, so settings turn it off
+    (ttl=0: nothing is stored) when the server runs several workers.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (user, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def set(self, token, user, token_exp=None):
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (user, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            stale = [token for token, (user, _) in self._entries.items() if user.pk == user_id]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_user_cache = TokenUserCache(
+    max_size=getattr(settings, 'JWT_AUTH_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'JWT_AUTH_CACHE_TTL', 60),
+)
+
+
+def create_access_token(user):
+    """JWT for LoginView responses (valid 60 minutes)."""
+    # Timezone-aware datetimes (utcnow is deprecated)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    payload = {
+        'user_id': str(user.id),  # Ensure UUID is a string
+        'exp': now + datetime.timedelta(minutes=60),
+        'iat': now
+    }
+    # Modern PyJWT returns a string, no need to .decode('utf-8')
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+
+def set_access_cookie(response, token):
+    """Sets the access_token cookie read by JWTAuthentication."""
+    response.set_cookie(
+        key='access_token',
+        value=token,
+        httponly=True,   # Security: Prevents JS access
+        secure=settings.DEBUG,     # Security: Only over HTTPS
+        samesite='None',  # Security: CSRF protection
+        max_age=60 * settings.JWT_EXPIRY_MINUTES,
+        path='/'        # Cookie is valid for the entire domain
+    )
+
+
+def get_header_token(request):
+    """JWT from 'Authorization: Bearer <token>', else None."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip() or None
+    return None
+
+
+def get_request_token(request):
+    """JWT from 'Authorization: Bearer <token>' or, failing that, the access_token cookie."""
+    return get_header_token(request) or request.COOKIES.get('access_token')
+
+
+def decode_access_token(token):
+    """Verified payload of a token from create_access_token(); raises AuthenticationFailed."""
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed("Token has expired")
+    except jwt.InvalidTokenError:
+        raise exceptions.AuthenticationFailed("Invalid token")
+
+
+class JWTAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticates the JWT issued by LoginView (header or cookie).
+
+    The browser sends the cookie on cross-site requests too (samesite='None'), so a request
+    authenticated by the cookie alone must pass Django's CSRF check, as with DRF's
+    SessionAuthentication (safe methods always do).
+
+    A cold request costs one query (User joined with Accounts); repeat requests with the
+    same token are served from token_user_cache without touching the database.
+    """
+
+    def authenticate(self, request):
+        token = get_header_token(request)
+        if not token:
+            token = request.COOKIES.get('access_token')
+            if not token:
+                return None
+            self.enforce_csrf(request)
+
+        user = token_user_cache.get(token)
+        if user is not None:
+            return (user, token)
+
+        payload = decode_access_token(token)
+        return (self.load_user(token, payload), token)
+
+    def load_user(self, token, payload):
+        """User for a verified token payload (one query); cached under the token."""
+        try:
+            user = User.objects.select_related('accounts').get(id=payload['user_id'])
+        except (KeyError, ValueError, ValidationError, User.DoesNotExist):
+            raise exceptions.AuthenticationFailed("Invalid token")
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("User account is disabled.")
+
+        token_user_cache.set(token, user, payload.get('exp'))
+        return user
+
+    def enforce_csrf(self, request):
+        """Raises PermissionDenied unless the request passes CsrfViewMiddleware's check."""
+        check = authentication.CSRFCheck(lambda request: None)
+        check.process_request(request)
+        reason = check.process_view(request, None, (), {})
+        if reason:
+            raise exceptions.PermissionDenied(f'CSRF Failed: {reason}')
+
+    def authenticate_header(self, request):
+        # Makes DRF answer 401 (not 403) when credentials are missing
+        return 'Bearer'
@@ -0,0 +1,127 @@
+"""
+Bulk registration of operators (partner onboarding).
+
+Rows are validated together (2 queries for existing emails / usernames instead of one per
+row), passwords are hashed (across a process pool for larger imports), and the User +
+Accounts rows are inserted with bulk_create in one transaction.
+Invalid rows are reported and skipped, including rows whose email or username was taken by
+another registration between validation and insert.
+"""
+from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .account_numbers import allocate_account_numbers
+from .models import Accounts, User
+from .password_pool import hash_passwords
+
+
+class BulkUserSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    password = serializers.CharField()
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    username = serializers.CharField(max_length=150)
+    terms_accepted = serializers.BooleanField(required=False, default=False)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value).lower()
+
+    def validate_password(self, value):
+        validate_password(value)
+        return value
+
+
+def _validate(rows):
+    """Returns (valid [(row_number, data)], errors [{row, errors}])."""
+    valid, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        serializer = BulkUserSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            errors.append({'row': number, 'errors': serializer.errors})
+    unique, taken = _check_unique(valid)
+    errors.extend(taken)
+    errors.sort(key=lambda e: e['row'])
+    return unique, errors
+
+
+def _check_unique(valid):
+    """Splits validated rows into (unique, errors) against the table and each other."""
+    emails = {data['email'] for _, data in valid}
+    usernames = {data['username'] for _, data in valid}
+    taken_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    taken_usernames = set(Accounts.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+    seen_emails, seen_usernames, unique, errors = set(), set(), [], []
+    for number, data in valid:
+        row_errors = {}
+        if data['email'] in taken_emails or data['email'] in seen_emails:
+            row_errors['email'] = ['A user with this email already exists.']
+        if data['username'] in taken_usernames or data['username'] in seen_usernames:
+            row_errors['username'] = ['This username is already taken.']
+        seen_emails.add(data['email'])
+        seen_usernames.add(data['username'])
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+        else:
+            unique.append((number, data))
+    return unique, errors
+
+
+def _insert(valid, hashes, account_ids):
+    """bulk_create of the User + Accounts rows; returns the users."""
+    now = timezone.now()
+    users, accounts = [], []
+    for (number, data), password_hash, account_id in zip(valid, hashes, account_ids):
+        user = User(email=data['email'], password=password_hash)
+        users.append(user)
+        accounts.append(Accounts(
+            user=user,
+            account_id=account_id,
+            username=data['username'],
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            terms_agreed_at=now if data['terms_accepted'] else None,
+        ))
+
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        Accounts.objects.bulk_create(accounts)
+    return users
+
+
+def import_users(rows, workers=1):
+    """
+    Registers every valid row. Returns {'created': [{row, user_id, email}], 'errors': [{row, errors}]}.
+    Row numbers are 1-based positions in `rows`. Passwords are hashed in `workers` processes.
+    """
+    valid, errors = _validate(rows)
+    passwords = hash_passwords([data['password'] for _, data in valid], workers)
+    hashes = {number: password_hash for (number, _), password_hash in zip(valid, passwords)}
+    # bulk_create skips Accounts.save(), so number the accounts here (one query for all). A
+    # retry reuses these numbers: the sequence is not rolled back, drawing again would burn them
+    account_ids = allocate_account_numbers(len(valid)) if valid else []
+
+    while valid:
+        try:
+            users = _insert(valid, [hashes[number] for number, _ in valid], account_ids)
+            break
+        except IntegrityError:
+            # Another registration took some of these emails / usernames after they were
+            # checked: report those rows and insert the rest
+            valid, taken = _check_unique(valid)
+            if not taken:
+                raise
+            errors.extend(taken)
+    errors.sort(key=lambda e: e['row'])
+    if not valid:
+        return {'created': [], 'errors': errors}
+
+    created = [
+        {'row': number, 'user_id': user.id, 'email': user.email}
+        for (number, _), user in zip(valid, users)
+    ]
+    return {'created': created, 'errors': errors}
@@ -0,0 +1,48 @@
+"""
+Bounded thread pool for password hashing in the async auth views.
+
+PBKDF2 (hashlib) releases the GIL, so hashing in threads runs in parallel without blocking
+the event loop. At most `max_pending` jobs may be running or queued; beyond that run()
+raises HashingPoolFull and the view answers 429 instead of letting the queue grow.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+class HashingPool:
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='auth-hash')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashingPoolFull()
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+hashing_pool = HashingPool(
+    workers=getattr(settings, 'AUTH_HASH_WORKERS', None) or os.cpu_count() or 1,
+    max_pending=getattr(settings, 'AUTH_HASH_MAX_PENDING', 64),
+)
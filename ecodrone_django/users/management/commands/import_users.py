@@ -0,0 +1,44 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.account_numbers import AccountNumbersExhausted
+from users.bulk_import import import_users
+from users.password_pool import default_workers
+
+
+class Command(BaseCommand):
+    help = (
+        "Register many users at once from a CSV (email,password,first_name,last_name,username"
+        "[,terms_accepted]) or a JSON list of objects with the same keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: CPU count)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                if path.endswith('.json'):
+                    rows = json.load(f)
+                else:
+                    rows = list(csv.DictReader(f))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        start = time.perf_counter()
+        try:
+            result = import_users(rows, workers=options['workers'] or default_workers())
+        except AccountNumbersExhausted as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(result['created'])} users, {len(result['errors'])} rows rejected ({elapsed:.1f}s)"
+        ))
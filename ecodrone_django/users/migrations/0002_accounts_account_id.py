@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+from users.account_numbers import format_account_number
+
+SEQUENCE_NAME = 'users_account_number_seq'
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} MINVALUE 0 START 0")
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}")
+
+
+def assign_account_numbers(apps, schema_editor):
+    Accounts = apps.get_model('users', 'Accounts')
+    with schema_editor.connection.cursor() as cursor:
+        for account in Accounts.objects.filter(account_id__isnull=True).order_by('pk'):
+            cursor.execute("SELECT nextval(%s)", [SEQUENCE_NAME])
+            account.account_id = format_account_number(cursor.fetchone()[0])
+            account.save(update_fields=['account_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+        migrations.AddField(
+            model_name='accounts',
+            name='account_id',
+            field=models.CharField(editable=False, max_length=7, null=True),
+        ),
+        migrations.RunPython(assign_account_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='accounts',
+            name='account_id',
+            field=models.CharField(editable=False, max_length=7, unique=True),
+        ),
+    ]
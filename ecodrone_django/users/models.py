@@ -2,27 +2,25 @@ import uuid
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.conf import settings
-import random
-import string
+from .account_numbers import allocate_account_numbers
 
 def generate_account_number():
-    """Generates a unique PV + 5 digit string."""
-    while True:
-        # Generate 'PV' + 5 random digits
-        code = 'PV' + ''.join(random.choices(string.digits, k=5))
-        # Check if this code already exists in the database
-        if not Accounts.objects.filter(account_id=code).exists():
-            return code
+    """Generates a unique PV + 5 digit string (no lookups, see account_numbers.py)."""
+    return allocate_account_numbers(1)[0]
 
 
 
 class UserManager(BaseUserManager):
-    def create_user(self, email, password=None, **extra_fields):
+    def create_user(self, email, password=None, password_hash=None, **extra_fields):
         if not email:
             raise ValueError("The Email field must be set")
         email = self.normalize_email(email).lower()
         user = self.model(email=email, **extra_fields)
-        user.set_password(password) # Handles secure hashing
+        if password_hash is not None:
+            # Already hashed elsewhere (e.g. off the request thread by the async views)
+            user.password = password_hash
+        else:
+            user.set_password(password) # Handles secure hashing
         user.save(using=self._db)
         return user
 
@@ -49,6 +47,7 @@ class Accounts(models.Model):
  
     # Link to our Custom User Model
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='accounts')
+    account_id = models.CharField(max_length=7, unique=True, editable=False)
     
     terms_agreed_at = models.DateTimeField(null=True, blank=True)
     username = models.CharField(max_length=150, unique=True, null=True, blank=True)
@@ -58,5 +57,11 @@ class Accounts(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+    def save(self, *args, **kwargs):
+        # Assigned here rather than as a field default so migrations never allocate numbers
+        if not self.account_id:
+            self.account_id = generate_account_number()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.user.email}"
\ No newline at end of file
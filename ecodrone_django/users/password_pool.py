@@ -0,0 +1,45 @@
+"""
+Password hashing across worker processes.
+
+Kept free of model imports: spawned workers import this module before Django is set up.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+# Below this many passwords, starting worker processes costs more than it saves
+MIN_PARALLEL_PASSWORDS = 16
+
+
+def _init_worker(settings_module):
+    # Spawned workers start from a fresh interpreter; the hashers need settings loaded
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def default_workers():
+    """BULK_IMPORT_WORKERS, or the CPU count."""
+    return getattr(settings, 'BULK_IMPORT_WORKERS', None) or os.cpu_count() or 1
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    make_password() for every password, spread over `workers` processes.
+
+    Used with workers by the import_users command and the bulk register view (whose requests
+    are capped at BULK_REGISTER_MAX_ROWS); the pool only starts for MIN_PARALLEL_PASSWORDS or more.
+    """
+    if workers <= 1 or len(passwords) < MIN_PARALLEL_PASSWORDS:
+        return [make_password(p) for p in passwords]
+    # spawn, not fork: forked children would share the parent's open DB connections
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'ecodrone_django.settings'),),
+    ) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
@@ -0,0 +1,52 @@
+"""
+Cached get-user payload, keyed by user id.
+
+Each entry holds the four profile fields and their ETag. Entries live in Django's cache (the
+USER_PROFILE_CACHE alias: local memory with one worker, nothing unless a shared cache is
+configured with several). users/signals.py drops a user's entry whenever the User or its
+Accounts row is saved or deleted.
+
+Only the payload is cached: request.user stays the real User from JWTAuthentication (whose
+token cache already spares repeat requests the user query), so is_active and the other
+checks see the current row.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+PROFILE_CACHE_TIMEOUT = getattr(settings, 'USER_PROFILE_CACHE_TIMEOUT', 300)
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_PROFILE_CACHE', 'default')]
+
+
+def _key(user_id):
+    return f'user-profile:{user_id}'
+
+
+def get_profile(user_id):
+    """{"data": {...}, "etag": '"..."'} for the user, or None if not cached."""
+    if not user_id:
+        return None
+    return _cache().get(_key(user_id))
+
+
+def cache_profile(user):
+    """Builds the user's profile entry (reads user.accounts) and caches it."""
+    data = {
+        "user_id": str(user.id),
+        "email": user.email,
+        "first_name": user.accounts.first_name,
+        "last_name": user.accounts.last_name,
+    }
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+    entry = {"data": data, "etag": f'"{digest}"'}
+    _cache().set(_key(user.id), entry, PROFILE_CACHE_TIMEOUT)
+    return entry
+
+
+def invalidate_profile(user_id):
+    _cache().delete(_key(user_id))
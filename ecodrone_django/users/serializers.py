@@ -61,12 +61,15 @@ class RegisterSerializer(serializers.ModelSerializer):
         username = validated_data.pop('username')
         validated_data.pop('password_confirm')
         validated_data.pop('terms_accepted')
+        # Set when the caller already hashed the password: serializer.save(password_hash=...)
+        password_hash = validated_data.pop('password_hash', None)
     # Start the atomic block
         with transaction.atomic():
         # 2. Create the User (the 'Account Holder')
             user = User.objects.create_user(
                 email=validated_data['email'],
                 password=validated_data['password'],
+                password_hash=password_hash,
             )
 
             # 3. Create the Profile (the 'Account Details') linked to that user
@@ -79,10 +82,14 @@ class RegisterSerializer(serializers.ModelSerializer):
             )
         return user
 
-class LoginSerializer(serializers.Serializer):
+class LoginCredentialsSerializer(serializers.Serializer):
+    """Field validation only; the async login view checks the password itself."""
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
+
+class LoginSerializer(LoginCredentialsSerializer):
+
     def validate(self, data):
         email = data.get('email')
         password = data.get('password')
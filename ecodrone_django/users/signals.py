@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import token_user_cache
+from .models import Accounts, User
+from .profile_cache import invalidate_profile
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.pk)
+    invalidate_profile(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Accounts)
+def invalidate_accounts_cache(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.user_id)
+    invalidate_profile(instance.user_id)
@@ -1,3 +1,142 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from . import bulk_import
+from .account_numbers import (
+    ACCOUNT_NUMBER_SPACE,
+    SEQUENCE_NAME,
+    AccountNumbersExhausted,
+    allocate_account_numbers,
+    permute,
+)
+from .authentication import TokenUserCache, create_access_token, token_user_cache
+from .models import Accounts, User, generate_account_number
+from .profile_cache import invalidate_profile
+
+
+def _set_sequence(value):
+    # setval is not rolled back with the test transaction, so callers restore it
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT last_value, is_called FROM " + SEQUENCE_NAME)
+        previous = cursor.fetchone()
+        cursor.execute("SELECT setval(%s, %s, false)", [SEQUENCE_NAME, value])
+    return previous
+
+
+class AccountNumberTests(TestCase):
+
+    def setUp(self):
+        last_value, is_called = _set_sequence(0)
+        self.addCleanup(self._restore_sequence, last_value, is_called)
+
+    def _restore_sequence(self, last_value, is_called):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT setval(%s, %s, %s)", [SEQUENCE_NAME, last_value, is_called])
+
+    def _time_allocations(self, count):
+        start = time.perf_counter()
+        codes = allocate_account_numbers(count)
+        return (time.perf_counter() - start) / count, codes
+
+    def test_permutation_covers_every_code_once(self):
+        self.assertEqual(len({permute(slot) for slot in range(ACCOUNT_NUMBER_SPACE)}), ACCOUNT_NUMBER_SPACE)
+
+    def test_account_number_format(self):
+        code = generate_account_number()
+        self.assertRegex(code, r'^PV\d{5}$')
+
+    def test_registration_assigns_account_number(self):
+        user = User.objects.create_user(email='pilot@example.com', password='Str0ng-passw0rd')
+        account = Accounts.objects.create(user=user, username='pilot')
+        self.assertRegex(account.account_id, r'^PV\d{5}$')
+
+    def test_flat_cost_at_90_percent_occupancy(self):
+        # One query per allocation, whatever the occupancy
+        with self.assertNumQueries(1):
+            empty_time, empty_codes = self._time_allocations(100)
+
+        _set_sequence(int(ACCOUNT_NUMBER_SPACE * 0.9))
+        with self.assertNumQueries(1):
+            full_time, full_codes = self._time_allocations(100)
+        with self.assertNumQueries(1):
+            generate_account_number()
+
+        self.assertEqual(len(set(empty_codes) | set(full_codes)), 200)
+        # Generous bound: retry-based allocation is ~10x slower here, this one is flat
+        self.assertLess(full_time, empty_time * 3 + 0.001)
+
+    def test_every_number_can_be_allocated(self):
+        _set_sequence(ACCOUNT_NUMBER_SPACE - 1)
+        self.assertEqual(generate_account_number(), f'PV{permute(ACCOUNT_NUMBER_SPACE - 1):05d}')
+        with self.assertRaises(AccountNumbersExhausted):
+            generate_account_number()
+
+
+def _bulk_row(name):
+    return {'email': f'{name}@example.com', 'password': 'Str0ng-passw0rd', 'first_name': name.title(),
+            'last_name': 'Pilot', 'username': name}
+
+
+class BulkImportTests(TestCase):
+
+    def test_rows_taken_after_validation_are_reported(self):
+        hash_passwords = bulk_import.hash_passwords
+
+        def register_concurrently(passwords, workers):
+            # Another registration takes 'bravo' between validation and insert
+            User.objects.create_user(email='bravo@example.com', password='Str0ng-passw0rd')
+            return hash_passwords(passwords, workers)
+
+        allocate = mock.Mock(wraps=bulk_import.allocate_account_numbers)
+        with mock.patch.object(bulk_import, 'hash_passwords', register_concurrently), \
+                mock.patch.object(bulk_import, 'allocate_account_numbers', allocate):
+            result = bulk_import.import_users([_bulk_row('alpha'), _bulk_row('bravo'), _bulk_row('charlie')])
+
+        self.assertEqual([c['row'] for c in result['created']], [1, 3])
+        self.assertEqual([(e['row'], list(e['errors'])) for e in result['errors']], [(2, ['email'])])
+        self.assertEqual(Accounts.objects.filter(username__in=['alpha', 'bravo', 'charlie']).count(), 2)
+        # The retry reused the numbers drawn for the first attempt
+        allocate.assert_called_once_with(3)
+
+    @override_settings(BULK_REGISTER_MAX_ROWS=2)
+    def test_bulk_register_is_capped(self):
+        staff = User.objects.create_user(email='admin@example.com', password='Str0ng-passw0rd', is_staff=True)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {create_access_token(staff)}'}
+        self.addCleanup(token_user_cache.clear)
+        rows = [_bulk_row(name) for name in ('alpha', 'bravo', 'charlie')]
+        response = self.client.post('/user/register/bulk', rows, content_type='application/json', **auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('import_users', response.json()['error'])
+        self.assertFalse(User.objects.filter(email='alpha@example.com').exists())
+
+
+class ProfileCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='pilot@example.com', password='Str0ng-passw0rd')
+        Accounts.objects.create(user=self.user, username='pilot', first_name='Ada', last_name='Pilot')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {create_access_token(self.user)}'}
+        self.addCleanup(token_user_cache.clear)
+        self.addCleanup(invalidate_profile, self.user.pk)
+
+    def test_etag_revalidation(self):
+        first = self.client.get('/user/get-user', **self.auth)
+        self.assertEqual(first.json()['first_name'], 'Ada')
+        again = self.client.get('/user/get-user', HTTP_IF_NONE_MATCH=first['ETag'], **self.auth)
+        self.assertEqual(again.status_code, 304)
+
+    def test_cached_profile_does_not_authenticate_inactive_user(self):
+        self.client.get('/user/get-user', **self.auth)
+        # No save(), so no signal drops the cached profile
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        token_user_cache.clear()
+        self.assertEqual(self.client.get('/user/get-user', **self.auth).status_code, 401)
+
+    def test_token_cache_off_stores_nothing(self):
+        # What settings use with several workers (WEB_CONCURRENCY > 1)
+        cache = TokenUserCache(ttl=0)
+        cache.set('token', self.user)
+        self.assertIsNone(cache.get('token'))
@@ -2,12 +2,16 @@ from django.shortcuts import render
 
 # Create your views here.
 from django.urls import path
-from .views import RegisterView, LoginView, UserView, LogoutView, UserViewToo
+from .async_views import login_view, register_view
+from .views import RegisterView, BulkRegisterView, LoginView, UserView, LogoutView, UserViewToo
 
 
 urlpatterns = [
     path('register', RegisterView.as_view(), name='register'),
+    path('register/bulk', BulkRegisterView.as_view(), name='register-bulk'),
     path('login', LoginView.as_view(), name='login'),
+    path('async/register', register_view, name='register-async'),
+    path('async/login', login_view, name='login-async'),
     path('get-user', UserView.as_view(), name='user'),
     # path('get-user-too', UserViewToo.as_view(), name='user-too'),
     path('logout', LogoutView.as_view(), name='logout'),
@@ -1,10 +1,16 @@
 # views.py
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.conf import settings
 from rest_framework import status, views
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from .account_numbers import AccountNumbersExhausted
+from .authentication import JWTAuthentication, create_access_token, set_access_cookie
+from .bulk_import import import_users
+from .password_pool import default_workers
+from .profile_cache import cache_profile, get_profile
 from .serializers import RegisterSerializer, LoginSerializer
-import jwt, datetime
-from django.conf import settings
-from .models import User
 
 
 class RegisterView(views.APIView):
@@ -12,7 +18,10 @@ class RegisterView(views.APIView):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             # .save() calls the UserManager.create_user method
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except AccountNumbersExhausted as e:
+                return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
             # Convention: Do not log the user in immediately if 
             # you require email verification first.
@@ -25,6 +34,35 @@ class RegisterView(views.APIView):
     
 
 
+class BulkRegisterView(views.APIView):
+    """
+    Staff only: register a list of users (see users/bulk_import.py). Invalid rows are reported, not created.
+
+    Passwords are hashed across BULK_IMPORT_WORKERS processes. A request carries at most
+    BULK_REGISTER_MAX_ROWS users; larger imports go through `manage.py import_users`.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        rows = request.data.get('users') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({"error": "Expected a list of users"}, status=status.HTTP_400_BAD_REQUEST)
+        max_rows = getattr(settings, 'BULK_REGISTER_MAX_ROWS', 200)
+        if len(rows) > max_rows:
+            return Response(
+                {"error": f"At most {max_rows} users per request; use `manage.py import_users` for larger imports"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            result = import_users(rows, workers=default_workers())
+        except AccountNumbersExhausted as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        code = status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=code)
+
+
 class LoginView(views.APIView):
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -32,61 +70,25 @@ class LoginView(views.APIView):
         if serializer.is_valid():
             user = serializer.validated_data['user']
 
-            # 1. Use timezone-aware datetimes (utcnow is deprecated)
-            now = datetime.datetime.now(datetime.timezone.utc)
-            payload = {
-                'user_id': str(user.id), # Ensure UUID is a string
-                'exp': now + datetime.timedelta(minutes=60),
-                'iat': now
-            }
-            
-            # 2. Modern PyJWT returns a string, no need to .decode('utf-8')
-            token = jwt.encode(payload, settings.SECRET_KEY, algorithm =   settings.JWT_ALGORITHM)
-              # Debugging line
-            # 3. Create the response object first
+            token = create_access_token(user)
             response = Response({
                 "message": "Login successful",
                 "user_id": user.id,
                 "token": token,
             }, status=status.HTTP_200_OK)
-
-            # 4. Set the cookie on the response object
-            response.set_cookie(
-                key='access_token',
-                value=token,
-                httponly=True,   # Security: Prevents JS access
-                secure = settings.DEBUG,     # Security: Only over HTTPS
-                samesite='None',  # Security: CSRF protection
-                max_age=60  * settings.JWT_EXPIRY_MINUTES,   # 1 hour
-                path='/'        # Cookie is valid for the entire domain
-            )
+            set_access_cookie(response, token)
 
             return response
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
-class UserViewToo(views.APIView):  
-    
-    def get(self, request):
-        print("Generated JWT:", settings.DEBUG)
-        token = request.headers.get('Authorization', '').split('Bearer ')[-1] or request.COOKIES.get('access_token')
-        print("ALL COOKIES:", request.COOKIES)
-        print("Token from cookie:", token)  # Debugging line
+class UserViewToo(views.APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
-        if not token:
-            return Response({"error": "Token not found"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            user_id = payload['user_id']
-            user = User.objects.get(id=user_id)
-            
-        except jwt.ExpiredSignatureError:
-            return Response({"error": "Token has expired"}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-        
+    def get(self, request):
+        user = request.user
         return Response({
             "userId": user.id,
             "email": user.email,
@@ -95,33 +97,28 @@ class UserViewToo(views.APIView):
         }, status=status.HTTP_200_OK)
 
 
-class UserView(views.APIView):  
-    
-    def get(self, request):
-        print("Generated JWT:", settings.DEBUG)
-        token = request.headers.get('Authorization', '').split('Bearer ')[-1] or request.COOKIES.get('access_token')
-        # print("ALL COOKIES:", request.COOKIES)
-        # print("Token from cookie:", token)  # Debugging line
+class UserView(views.APIView):
+    """
+    Profile of the logged-in user, served from users/profile_cache.py with an ETag.
+    A request whose If-None-Match matches the current ETag gets an empty 304.
+    """
 
-        if not token:
-            return Response({"error": "Token not found"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-            user_id = payload['user_id']
-            user = User.objects.get(id=user_id)
-            
-        except jwt.ExpiredSignatureError:
-            return Response({"error": "Token has expired"}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        return Response({
-            "user_id": user.id,
-            "email": user.email,
-            "first_name": user.accounts.first_name,
-            "last_name": user.accounts.last_name,
-        }, status=status.HTTP_200_OK)
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        entry = get_profile(user.pk) or cache_profile(user)
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in etags or entry['etag'] in [tag.removeprefix('W/') for tag in etags]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entry['data'], status=status.HTTP_200_OK)
+        response['ETag'] = entry['etag']
+        # Browsers revalidate every time (the 304 is cheap) and never share it between users
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
 
 
 class LogoutView(views.APIView):
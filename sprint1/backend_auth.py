@@ -0,0 +1,100 @@
+# backend_auth.py – JWT for the backend's telemetry endpoints, renewed before it expires
+#
+# Access tokens from /user/login are valid for 60 minutes, shorter than a long flight or an
+# offline spool backlog. With ECODRONE_EMAIL / ECODRONE_PASSWORD set, BackendAuth logs in again
+# shortly before the token expires (and after a 401). Without them the static ECODRONE_TOKEN
+# is used as it is, and `expired` tells callers to stop instead of retrying a dead token.
+import base64
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+LOGIN_TIMEOUT = 10
+RENEW_BEFORE_S = 300  # log in again this long before the token expires
+
+
+class AuthError(RuntimeError):
+    """The backend refused the credentials (or there are none left to try)."""
+
+
+def _token_exp(token):
+    """`exp` claim of a JWT (not verified, only used to renew in time); None if unreadable."""
+    try:
+        payload = token.split(".")[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def login_url_for(url):
+    """<scheme>://<host>/user/login of the backend serving `url`."""
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/user/login"
+
+
+class BackendAuth:
+    """Bearer token for the backend, renewed by logging in again when credentials are given."""
+
+    def __init__(self, token=None, login_url=None, email=None, password=None, renew_before_s=RENEW_BEFORE_S):
+        self.token = token
+        self.login_url = login_url
+        self.email = email
+        self.password = password
+        self.renew_before_s = renew_before_s
+        self.renewals = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, url, token=None):
+        """ECODRONE_TOKEN (or `token`), renewed through <backend>/user/login with ECODRONE_EMAIL /
+        ECODRONE_PASSWORD if both are set."""
+        return cls(
+            token=token or os.environ.get("ECODRONE_TOKEN"),
+            login_url=login_url_for(url),
+            email=os.environ.get("ECODRONE_EMAIL"),
+            password=os.environ.get("ECODRONE_PASSWORD"),
+        )
+
+    @property
+    def can_renew(self):
+        return bool(self.login_url and self.email and self.password)
+
+    @property
+    def expired(self):
+        """True once a token that cannot be renewed has run out."""
+        exp = _token_exp(self.token) if self.token else None
+        return not self.can_renew and exp is not None and exp <= time.time()
+
+    def header(self):
+        """Value for the Authorization header (None without any token); renews a token that
+        expires within renew_before_s. Raises AuthError if the login fails."""
+        with self._lock:
+            exp = _token_exp(self.token) if self.token else None
+            if self.can_renew and (self.token is None or (exp is not None and exp - time.time() < self.renew_before_s)):
+                self._login()
+            return f"Bearer {self.token}" if self.token else None
+
+    def refused(self):
+        """Call on a 401/403: forces a new login next time. False if there is nothing to renew with."""
+        with self._lock:
+            if not self.can_renew:
+                return False
+            self.token = None
+            return True
+
+    def _login(self):
+        body = json.dumps({"email": self.email, "password": self.password}).encode("utf-8")
+        request = urllib.request.Request(self.login_url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=LOGIN_TIMEOUT) as response:
+                token = json.loads(response.read()).get("token")
+        except urllib.error.HTTPError as e:
+            raise AuthError(f"login at {self.login_url} refused (HTTP {e.code})") from e
+        if not token:
+            raise AuthError(f"login at {self.login_url} returned no token")
+        self.token = token
+        self.renewals += 1
@@ -0,0 +1,359 @@
+# bench_logging.py – benchmarks for the flight logging hot path, run against sim_drone (no drone needed)
+#
+#   python bench_logging.py                          # run, print, save JSON to bench_results/
+#   python bench_logging.py --compare bench_results/<previous>.json
+#
+# Measures log_flight_row (rows/s, latency percentiles), a breakdown of one row (each get_state
+# read, CSV formatting, file open/append), the extra cost of _DroneLoggerWrapper on drone(...)
+# and memory growth of FlightLogger + TelemetryCollector over a long run, and how many rows
+# adaptive sampling (flight_sampling.py) keeps on a simulated flight and how far the
+# reconstruction from them is off.
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import sim_drone
+import flight_logger
+import flight_segments
+import flight_spool
+import flight_timing
+from flight_logger import CSV_HEADERS, FlightLogger, _build_record, _read_drone_state, log_flight_row
+from flight_sampling import AdaptiveSampler, max_errors
+from mission import run_mission
+from telemetry import TELEMETRY_MESSAGES, TelemetryCollector
+
+RESULTS_DIR = os.path.join(flight_logger.LOG_DIR, "bench_results")
+
+# Metrics checked by --compare: (dotted path, True if higher is better)
+TRACKED_METRICS = [
+    ("log_flight_row.rows_per_s", True),
+    ("log_flight_row.latency_us.p50", False),
+    ("log_flight_row.latency_us.p99", False),
+    ("read_drone_state.latency_us.p50", False),
+    ("breakdown.csv_format.p50", False),
+    ("breakdown.file_append.p50", False),
+    ("wrapper.overhead_us", False),
+    ("memory.growth_kib_per_min", False),
+    ("sampling.stored_pct", False),
+]
+
+# Hello mission with the hovers and ground time a real flight has around its moves
+SAMPLING_MISSION = [
+    {"action": "hover", "seconds": 3},
+    {"action": "takeoff", "timeout": 15},
+    {"action": "hover", "seconds": 3},
+    {"action": "move", "dx": 5.0, "timeout": 25},
+    {"action": "hover", "seconds": 3},
+    {"action": "move", "dx": -5.0, "timeout": 25},
+    {"action": "land", "timeout": 15},
+    {"action": "hover", "seconds": 3},
+]
+
+
+def _percentiles(samples_s):
+    """p50/p90/p99/max/mean of a list of durations, in microseconds."""
+    us = sorted(s * 1e6 for s in samples_s)
+    if not us:
+        return {}
+
+    def pick(q):
+        return round(us[min(len(us) - 1, int(q * len(us)))], 2)
+
+    return {
+        "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+        "max": round(us[-1], 2), "mean": round(statistics.fmean(us), 2),
+    }
+
+
+def _connected_sim(config):
+    drone = sim_drone.SimDrone(config=config)
+    drone.connect()
+    return drone
+
+
+def bench_log_flight_row(drone, rows, path):
+    """log_flight_row end to end (state read + header check + open/append/close per row)."""
+    flight_logger.FLIGHT_LOG_CSV = path
+    times = []
+    start = time.perf_counter()
+    for _ in range(rows):
+        t = time.perf_counter()
+        log_flight_row(drone, "in_flight", "bench")
+        times.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    return {"rows": rows, "rows_per_s": round(rows / total, 1), "latency_us": _percentiles(times)}
+
+
+def bench_read_drone_state(drone, rows):
+    times = []
+    for _ in range(rows):
+        t = time.perf_counter()
+        _read_drone_state(drone)
+        times.append(time.perf_counter() - t)
+    return {"rows": rows, "latency_us": _percentiles(times)}
+
+
+def bench_breakdown(drone, rows, path):
+    """Time each stage of one log_flight_row call separately."""
+    stages = {f"get_state.{key}": [] for key, _, _ in TELEMETRY_MESSAGES}
+    stages["csv_format"] = []
+    stages["file_append"] = []
+    record = _build_record(drone, "in_flight", "bench")
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_HEADERS)
+    for _ in range(rows):
+        for key, message, _ in TELEMETRY_MESSAGES:
+            t = time.perf_counter()
+            try:
+                drone.get_state(message)
+            except Exception:
+                pass
+            stages[f"get_state.{key}"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(record)
+        line = buf.getvalue()
+        stages["csv_format"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            f.write(line)
+        stages["file_append"].append(time.perf_counter() - t)
+    return {stage: _percentiles(times) for stage, times in stages.items()}
+
+
+def bench_wrapper(drone, calls):
+    """Extra cost of _DroneLoggerWrapper.__call__ over calling the drone directly."""
+    from olympe.messages.ardrone3.Piloting import moveBy
+    from run_hello_with_logging import make_logged_drone
+
+    # Plain CSV log (redirected by run()), no segment compressor or spool for this wrapper
+    wrapper = make_logged_drone(None, "bench", writer=flight_logger.CsvLogWriter(), drone=drone)
+    # Rejected immediately by the landed sim, so only the call path is measured
+    command = moveBy(0.0, 0.0, 0.0, 0.0)
+    times = {"direct": [], "wrapped": []}
+    try:
+        # Interleaved so warm-up and background noise hit both paths equally
+        for _ in range(calls):
+            for name, target in (("direct", drone), ("wrapped", wrapper)):
+                t = time.perf_counter()
+                target(command)
+                times[name].append(time.perf_counter() - t)
+    finally:
+        wrapper._logger.close(timeout=5)
+        wrapper._timing.close()
+    results = {name: _percentiles(samples) for name, samples in times.items()}
+    results["overhead_us"] = round(results["wrapped"]["p50"] - results["direct"]["p50"], 2)
+    return results
+
+
+def bench_memory(duration, rate_hz, path):
+    """FlightLogger + TelemetryCollector on a fast sim for `duration` s; traced memory over time."""
+    config = sim_drone.SimConfig(rate_hz=rate_hz, time_scale=10.0)
+    drone = _connected_sim(config)
+    logger = FlightLogger(path=path)
+    collector = TelemetryCollector(drone, logger.log_record, "bench-memory", rate_hz=rate_hz)
+    tracemalloc.start()
+    collector.start()
+    samples = []
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < duration:
+            time.sleep(min(1.0, duration / 10))
+            current, _ = tracemalloc.get_traced_memory()
+            samples.append((round(time.monotonic() - start, 2), current))
+    finally:
+        collector.stop()
+        logger.close(timeout=10)
+        drone.disconnect()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    # Growth between the first and last sample, so startup allocations don't count
+    (t0, m0), (t1, m1) = samples[0], samples[-1]
+    growth = (m1 - m0) / 1024 / max(t1 - t0, 1e-9) * 60
+    return {
+        "duration_s": duration,
+        "rate_hz": rate_hz,
+        "messages_delivered": drone.delivered,
+        "rows_dropped": logger.dropped,
+        "start_kib": round(m0 / 1024, 1),
+        "end_kib": round(m1 / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+        "growth_kib_per_min": round(growth, 1),
+        "samples": [[t, round(m / 1024, 1)] for t, m in samples],
+    }
+
+
+def bench_sampling(rate_hz=10.0, time_scale=2.0):
+    """Every collector row of a simulated flight, replayed through AdaptiveSampler: rows kept
+    and the largest reconstruction error, against the sampled rows (the guaranteed bound) and
+    against all rows."""
+    drone = _connected_sim(sim_drone.SimConfig(time_scale=time_scale))
+    snapshots = []
+
+    def keep(row):
+        # With the flying state and time the sampler would have seen
+        snapshots.append((row, collector.flying_state(), time.monotonic()))
+
+    collector = TelemetryCollector(drone, keep, "bench-sampling", rate_hz=rate_hz)
+    collector.start()
+    try:
+        run_mission(drone, SAMPLING_MISSION, name="bench-sampling")
+    finally:
+        collector.stop()
+        drone.disconnect()
+    sampler = AdaptiveSampler()
+    sampled, stored = [], []
+    t = time.perf_counter()
+    for row, state, now in snapshots:
+        before = sampler.sampled
+        stored.extend(sampler.offer(row, state, now))
+        if sampler.sampled > before:
+            sampled.append(row)
+    stored.extend(sampler.flush())
+    elapsed = time.perf_counter() - t
+    rows = [row for row, _, _ in snapshots]
+    return {
+        "rows": len(rows),
+        "sampled": len(sampled),
+        "stored": len(stored),
+        "stored_pct": round(100.0 * len(stored) / max(len(rows), 1), 1),
+        "offer_us": round(elapsed / max(len(rows), 1) * 1e6, 2),
+        "max_error_sampled": {k: round(v, 3) for k, v in max_errors(sampled, stored).items()},
+        "max_error_all": {k: round(v, 3) for k, v in max_errors(rows, stored).items()},
+    }
+
+
+@contextlib.contextmanager
+def _patched(settings):
+    """Sets (module, name, value) for the duration of the block, then restores the old values."""
+    saved = [(module, name, getattr(module, name)) for module, name, _ in settings]
+    for module, name, value in settings:
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def run(rows=2000, calls=20000, memory_duration=30.0, memory_rate_hz=200.0):
+    results = {
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {"rows": rows, "calls": calls, "memory_duration_s": memory_duration, "memory_rate_hz": memory_rate_hz},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        # Never touch the real logs, segments, spool or timing files
+        redirect = [
+            (flight_logger, "LOG_DIR", tmp),
+            (flight_logger, "FLIGHT_LOG_CSV", os.path.join(tmp, "flight_log.csv")),
+            (flight_segments, "FLIGHT_LOG_SEGMENTS_DIR", os.path.join(tmp, "flight_log_segments")),
+            (flight_spool, "FLIGHT_SPOOL_DB", os.path.join(tmp, "flight_spool.sqlite3")),
+            (flight_timing, "FLIGHT_EVENTS_LOG", os.path.join(tmp, "flight_events.jsonl")),
+            (flight_timing, "LATENCY_HISTOGRAMS", os.path.join(tmp, "flight_latency.json")),
+        ]
+        with _patched(redirect):
+            drone = _connected_sim(sim_drone.SimConfig(rate_hz=50.0))
+            try:
+                results["log_flight_row"] = bench_log_flight_row(drone, rows, os.path.join(tmp, "rows.csv"))
+                results["read_drone_state"] = bench_read_drone_state(drone, rows)
+                results["breakdown"] = bench_breakdown(drone, rows, os.path.join(tmp, "breakdown.csv"))
+                results["wrapper"] = bench_wrapper(drone, calls)
+            finally:
+                drone.disconnect()
+            if memory_duration > 0:
+                results["memory"] = bench_memory(memory_duration, memory_rate_hz, os.path.join(tmp, "memory.csv"))
+            results["sampling"] = bench_sampling()
+    return results
+
+
+def _lookup(results, path):
+    value = results
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each tracked metric vs the baseline; second value True if any regressed."""
+    lines, regressed = [], False
+    for path, higher_is_better in TRACKED_METRICS:
+        new, old = _lookup(results, path), _lookup(baseline, path)
+        if new is None or old is None:
+            continue
+        if old == 0:
+            change = 0.0
+        else:
+            change = (new - old) / abs(old)
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        regressed = regressed or bool(flag)
+        lines.append(f"  {path:36} {old:>12} -> {new:>12}  ({change:+.1%}) {flag}")
+    return lines, regressed
+
+
+def _print_summary(results):
+    r = results["log_flight_row"]
+    print(f"log_flight_row:   {r['rows_per_s']} rows/s, p50 {r['latency_us']['p50']} us, p99 {r['latency_us']['p99']} us")
+    print(f"read_drone_state: p50 {results['read_drone_state']['latency_us']['p50']} us")
+    for stage, stats in results["breakdown"].items():
+        print(f"  {stage:22} p50 {stats['p50']:>9} us  p99 {stats['p99']:>9} us")
+    w = results["wrapper"]
+    print(f"wrapper:          direct p50 {w['direct']['p50']} us, wrapped p50 {w['wrapped']['p50']} us, overhead {w['overhead_us']} us")
+    if "memory" in results:
+        m = results["memory"]
+        print(f"memory:           {m['start_kib']} -> {m['end_kib']} KiB (peak {m['peak_kib']}), {m['growth_kib_per_min']} KiB/min")
+    s = results["sampling"]
+    print(f"sampling:         {s['rows']} rows -> {s['sampled']} sampled -> {s['stored']} stored ({s['stored_pct']} %), {s['offer_us']} us/row")
+    print(f"  max error (sampled rows): {s['max_error_sampled']}")
+    print(f"  max error (all rows):     {s['max_error_all']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flight logging hot path against a simulated drone.")
+    parser.add_argument("--rows", type=int, default=2000, help="rows for the log_flight_row / breakdown benchmarks")
+    parser.add_argument("--calls", type=int, default=20000, help="drone(...) calls for the wrapper benchmark")
+    parser.add_argument("--memory-duration", type=float, default=30.0, help="seconds of the memory run (0 = skip)")
+    parser.add_argument("--memory-rate", type=float, default=200.0, help="telemetry rate (Hz) of the memory run")
+    parser.add_argument("--out", help="JSON output path (default: bench_results/bench_logging_<time>.json)")
+    parser.add_argument("--compare", help="previous JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.calls, args.memory_duration, args.memory_rate)
+    _print_summary(results)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_logging_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print(f"Compared with {args.compare}:")
+        print("\n".join(lines))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+# drone_daemon.py – long-lived process that owns the drone connection; short scripts use it over a Unix socket
+#
+#   python drone_daemon.py serve [--ip 192.168.42.1] [--sim]     # connect once, keep the link up
+#   python drone_daemon.py status
+#   python drone_daemon.py mission plan.json [--name RUN_ID] [--no-wait]
+#   python drone_daemon.py telemetry [--after SEQ] [--limit N] [--follow]
+#   python drone_daemon.py stop
+#
+# The daemon connects once, keeps a TelemetryCollector subscribed for as long as it runs and
+# reconnects on its own when the link drops or no state has arrived for STALE_S seconds
+# (never while a mission is flying). Clients send one JSON request per line and get one JSON
+# line back, so starting a mission costs a socket round trip instead of connect + first
+# state. Every telemetry row goes into an in-memory history (the last HISTORY_ROWS rows,
+# numbered by `seq`) that outlives the client scripts; rows of a mission are also logged
+# like any other run (segments / CSV, spool).
+import argparse
+import itertools
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import olympe
+
+from flight_logger import FlightLogger
+from flight_timing import TimedDrone, TimingRecorder
+from logging_pipeline import log_writer
+from mission import load_mission, run_mission, validate_plan
+from telemetry import TelemetryCollector
+
+DRONE_IP = "192.168.42.1"
+DAEMON_SOCKET = os.environ.get("ECODRONE_DAEMON_SOCKET", os.path.join(tempfile.gettempdir(), "ecodrone_drone.sock"))
+CONNECT_RETRY = 5
+CONNECT_TIMEOUT = 10
+LOG_RATE_HZ = 10.0
+HISTORY_ROWS = 36000  # an hour at LOG_RATE_HZ
+HEALTH_INTERVAL = 1.0
+STALE_S = 5.0  # no state message for this long: the link is treated as lost
+
+
+class DaemonError(RuntimeError):
+    """Request the daemon cannot serve (not connected, mission already running, ...)."""
+
+
+class _Mission:
+    def __init__(self, run_id, plan):
+        self.run_id = run_id
+        self.plan = plan
+        self.started_at = time.time()
+        self.state = "running"
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            "run_id": self.run_id,
+            "started_at": datetime.utcfromtimestamp(self.started_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "state": self.state,
+            "result": self.result.to_dict() if self.result is not None else None,
+            "error": self.error,
+        }
+
+
+class DroneDaemon:
+    """Owns one drone connection: health checks, telemetry history and one mission at a time."""
+
+    def __init__(self, ip=DRONE_IP, logger=None, history_rows=HISTORY_ROWS):
+        self.ip = ip
+        self.connected = False
+        self.connects = 0  # successful connects, reconnects included
+        self.last_error = None
+        self.started_at = time.time()
+        self._logger = logger or FlightLogger(writer=log_writer())
+        self._timing = TimingRecorder()
+        self._drone = None
+        self._collector = None
+        self._run_id = None  # run being logged (only while a mission flies)
+        self._history = deque(maxlen=history_rows)
+        self._seq = itertools.count(1)
+        self._history_lock = threading.Lock()
+        self._link_lock = threading.Lock()
+        self._mission_lock = threading.Lock()
+        self._mission = None
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    # --- connection ----------------------------------------------------------------------
+
+    def start(self):
+        """Connect (retried by the health check if it fails) and start watching the link."""
+        self.connect()
+        self._stop.clear()
+        self._health_thread = threading.Thread(target=self._health_loop, name="drone-health", daemon=True)
+        self._health_thread.start()
+        return self
+
+    def connect(self):
+        with self._link_lock:
+            self._close_link()
+            drone = None
+            with self._timing.timed("daemon", "connect", "connect", retry=CONNECT_RETRY, timeout=CONNECT_TIMEOUT) as step:
+                try:
+                    # olympe.Drone looked up now, so sim_drone.install() works after import
+                    drone = olympe.Drone(self.ip)
+                    step.success = bool(drone.connect(retry=CONNECT_RETRY, timeout=CONNECT_TIMEOUT))
+                except Exception as e:
+                    step.success = False
+                    self.last_error = f"connect: {e}"
+            if step.success:
+                self._drone = drone
+                self._collector = TelemetryCollector(drone, self._on_row, self._run_id, phase="idle", rate_hz=LOG_RATE_HZ)
+                self._collector.start()
+                self._collector.wait_ready(timeout=2.0)
+                self.connects += 1
+            self.connected = step.success
+            return self.connected
+
+    def _close_link(self):
+        if self._collector is not None:
+            self._collector.stop()
+            self._collector = None
+        if self._drone is not None:
+            try:
+                self._drone.disconnect()
+            except Exception:
+                pass
+            self._drone = None
+        self.connected = False
+
+    def healthy(self):
+        """True if the drone reports a connection and pushed state within STALE_S seconds."""
+        drone, collector = self._drone, self._collector
+        if drone is None or collector is None:
+            return False
+        try:
+            if not drone.connection_state():
+                return False
+        except Exception:
+            return False
+        arrivals = [entry[1] for entry in map(collector.latest, ("gps", "altitude", "battery")) if entry]
+        return bool(arrivals) and time.time() - max(arrivals) < STALE_S
+
+    def _health_loop(self):
+        while not self._stop.wait(HEALTH_INTERVAL):
+            if self.healthy():
+                continue
+            # A link lost under a flying mission is olympe's to recover (the mission lands or
+            # fails); holding the mission lock keeps new missions out while reconnecting
+            if not self._mission_lock.acquire(blocking=False):
+                continue
+            try:
+                self.connect()
+            finally:
+                self._mission_lock.release()
+
+    # --- telemetry -----------------------------------------------------------------------
+
+    def _on_row(self, record):
+        with self._history_lock:
+            self._history.append((next(self._seq), record))
+        if self._run_id is not None:
+            self._logger.log_record(record)
+
+    def telemetry(self, after=0, limit=1000):
+        """Rows with seq > after, oldest first: (rows, last seq). Rows already evicted are skipped."""
+        with self._history_lock:
+            if not self._history:
+                return [], after
+            # seq numbers are consecutive, so the first wanted row's position is known
+            start = max(0, after + 1 - self._history[0][0])
+            rows = [{"seq": seq, **record} for seq, record in itertools.islice(self._history, start, start + limit)]
+            last = self._history[-1][0]
+        return rows, rows[-1]["seq"] if rows else max(after, last)
+
+    def state(self):
+        if self._collector is None:
+            raise DaemonError("drone not connected")
+        return self._collector.snapshot()
+
+    # --- missions ------------------------------------------------------------------------
+
+    def start_mission(self, plan, run_id=None):
+        """Start `plan` on the connected drone in the background; returns the _Mission."""
+        validate_plan(plan)
+        if not self._mission_lock.acquire(blocking=False):
+            running = self._mission is not None and not self._mission.done.is_set()
+            raise DaemonError(f"mission {self._mission.run_id} is still running" if running else "drone is reconnecting")
+        if not self.connected:
+            self._mission_lock.release()
+            raise DaemonError("drone not connected")
+        mission = _Mission(run_id or datetime.utcnow().strftime("%Y%m%d_%H%M%S"), plan)
+        self._mission = mission
+        threading.Thread(target=self._fly, args=(mission,), name="mission", daemon=True).start()
+        return mission
+
+    def _fly(self, mission):
+        # Same run boundaries as a one-off flight script, so segments and analytics see one run per mission
+        collector = self._collector
+        try:
+            # Collector first: _on_row logs as soon as _run_id is set, and must not log a row
+            # still tagged with no run
+            collector.set_run_id(mission.run_id)
+            self._run_id = mission.run_id
+            self._logger.log_record(collector.snapshot("connected"))
+            collector.set_phase("in_flight")
+            drone = TimedDrone(self._drone, self._timing, mission.run_id)
+            mission.result = run_mission(drone, mission.plan, name=mission.run_id)
+            mission.state = "done" if mission.result.success else "failed"
+        except Exception as e:
+            mission.state = "failed"
+            mission.error = f"{type(e).__name__}: {e}"
+        finally:
+            try:
+                self._logger.log_record(collector.snapshot("disconnected"))
+            except Exception:
+                pass
+            collector.set_phase("idle")
+            self._run_id = None
+            collector.set_run_id(None)
+            self._timing.save()
+            mission.done.set()
+            self._mission_lock.release()
+
+    def mission_status(self):
+        return self._mission.to_dict() if self._mission is not None else None
+
+    # --- requests ------------------------------------------------------------------------
+
+    def status(self):
+        with self._history_lock:
+            history, last_seq = len(self._history), self._history[-1][0] if self._history else 0
+        return {
+            "ip": self.ip,
+            "connected": self.connected,
+            "healthy": self.healthy(),
+            "connects": self.connects,
+            "last_error": self.last_error,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "history_rows": history,
+            "last_seq": last_seq,
+            "dropped_rows": self._logger.dropped,
+            "mission": self.mission_status(),
+        }
+
+    def handle_request(self, request):
+        """Answer one decoded request ({"cmd": ..., ...}); raises DaemonError / MissionError."""
+        cmd = request.get("cmd")
+        if cmd == "ping":
+            return {}
+        if cmd == "status":
+            return self.status()
+        if cmd == "state":
+            return {"state": self.state()}
+        if cmd == "telemetry":
+            rows, last_seq = self.telemetry(int(request.get("after", 0)), int(request.get("limit", 1000)))
+            return {"rows": rows, "last_seq": last_seq}
+        if cmd == "mission":
+            mission = self.start_mission(request.get("plan"), request.get("run_id"))
+            if request.get("wait", True):
+                mission.done.wait()
+            return {"mission": mission.to_dict()}
+        if cmd == "mission_status":
+            return {"mission": self.mission_status()}
+        raise DaemonError(f"unknown command {cmd!r}")
+
+    def stop(self):
+        """Wait for a running mission (it always ends on the ground), then disconnect."""
+        self._stop.set()
+        if self._health_thread is not None:
+            self._health_thread.join(timeout=HEALTH_INTERVAL + CONNECT_RETRY * CONNECT_TIMEOUT)
+            self._health_thread = None
+        with self._mission_lock:
+            with self._link_lock:
+                self._close_link()
+        self._logger.close(timeout=5)
+        self._timing.close()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """One client connection: JSON request per line in, {"ok": ..., ...} per line out."""
+
+    def handle(self):
+        daemon = self.server.drone_daemon
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("cmd") == "stop":
+                    response = {"ok": True}
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                else:
+                    response = {"ok": True, **daemon.handle_request(request)}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+
+
+def _claim_socket(path):
+    """Remove a socket left behind by a dead daemon; refuse if a daemon still answers on it."""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise DaemonError(f"a daemon is already listening on {path}")
+
+
+def serve(daemon, path=DAEMON_SOCKET, on_ready=None):
+    """Serve `daemon` on the Unix socket at `path` until a "stop" request (or Ctrl+C)."""
+    _claim_socket(path)
+    server = socketserver.ThreadingUnixStreamServer(path, _RequestHandler)
+    server.daemon_threads = True
+    server.drone_daemon = daemon
+    os.chmod(path, 0o600)  # whoever can write to the socket can fly the drone
+    try:
+        if on_ready is not None:
+            on_ready()
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        daemon.stop()
+
+
+class DaemonClient:
+    """Talks to a running daemon; one connection, reused for every request."""
+
+    def __init__(self, path=DAEMON_SOCKET, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+
+    def request(self, cmd, **params):
+        """Send one request and return the response; raises DaemonError if the daemon refused it."""
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(self.timeout)
+            self._sock.connect(self.path)
+            self._file = self._sock.makefile("rb")
+        self._sock.sendall((json.dumps({"cmd": cmd, **params}) + "\n").encode("utf-8"))
+        line = self._file.readline()
+        if not line:
+            self.close()
+            raise DaemonError("daemon closed the connection")
+        response = json.loads(line)
+        if not response.pop("ok"):
+            raise DaemonError(response["error"])
+        return response
+
+    def status(self):
+        return self.request("status")
+
+    def state(self):
+        return self.request("state")["state"]
+
+    def telemetry(self, after=0, limit=1000):
+        """(rows, last seq); pass last seq back as `after` to get only newer rows."""
+        response = self.request("telemetry", after=after, limit=limit)
+        return response["rows"], response["last_seq"]
+
+    def mission(self, plan, run_id=None, wait=True):
+        return self.request("mission", plan=plan, run_id=run_id, wait=wait)["mission"]
+
+    def mission_status(self):
+        return self.request("mission_status")["mission"]
+
+    def stop(self):
+        self.request("stop")
+        self.close()
+
+    def close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drone connection daemon and its client commands.")
+    parser.add_argument("--socket", default=DAEMON_SOCKET)
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = sub.add_parser("serve")
+    serve_cmd.add_argument("--ip", default=DRONE_IP)
+    serve_cmd.add_argument("--sim", action="store_true", help="fly a simulated drone (sim_drone.py)")
+    sub.add_parser("status")
+    sub.add_parser("state")
+    mission_cmd = sub.add_parser("mission")
+    mission_cmd.add_argument("plan", help="JSON mission plan (see mission.py)")
+    mission_cmd.add_argument("--name", help="run_id (default: UTC start time)")
+    mission_cmd.add_argument("--no-wait", action="store_true", help="return once the mission has started")
+    telemetry_cmd = sub.add_parser("telemetry")
+    telemetry_cmd.add_argument("--after", type=int, default=0, help="only rows with a larger seq")
+    telemetry_cmd.add_argument("--limit", type=int, default=1000)
+    telemetry_cmd.add_argument("--follow", action="store_true", help="keep printing new rows")
+    sub.add_parser("stop")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if args.sim:
+            import sim_drone
+
+            sim_drone.install()
+        daemon = DroneDaemon(args.ip).start()
+        print(f"--- Drone {args.ip}: {'connected' if daemon.connected else 'not connected, retrying'} ---")
+        try:
+            serve(daemon, args.socket, on_ready=lambda: print(f"--- Listening on {args.socket} ---", flush=True))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    with DaemonClient(args.socket) as client:
+        if args.command == "mission":
+            start = time.monotonic()
+            mission = client.mission(load_mission(args.plan), args.name, wait=not args.no_wait)
+            print(f"Mission {mission['run_id']} {mission['state']} ({time.monotonic() - start:.3f} s)")
+            if mission["result"] is not None:
+                print(json.dumps(mission["result"], indent=2))
+        elif args.command == "telemetry":
+            after = args.after
+            while True:
+                rows, after = client.telemetry(after, args.limit)
+                for row in rows:
+                    print(json.dumps(row), flush=True)
+                if not args.follow:
+                    break
+                if not rows:
+                    time.sleep(1.0 / LOG_RATE_HZ)
+        elif args.command == "stop":
+            client.stop()
+        else:
+            print(json.dumps(client.request(args.command), indent=2))
+
+
+if __name__ == "__main__":
+    main()
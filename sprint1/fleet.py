@@ -0,0 +1,205 @@
+# fleet.py – fly several drones at once from one ground station, all logged through one FlightLogger
+#
+#   python fleet.py fleet.json          # {"drones": [{"name": "alpha", "ip": "192.168.42.1"}, ...],
+#                                       #  "mission": [...mission.py steps...]}
+#   python fleet.py --sim 10            # ten simulated drones (sim_drone.py), default mission
+#
+# Every drone gets its own thread, run_id, TelemetryCollector and mission; connects run in
+# parallel (one slow or retrying drone does not hold up the others) and all rows go through
+# one shared FlightLogger, so no drone thread ever waits on the log file.
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import olympe
+
+from flight_logger import FlightLogger
+from flight_sampling import AdaptiveSampler
+from flight_timing import TimedDrone, TimingRecorder
+from logging_pipeline import describe, log_writer
+from mission import HELLO_MISSION, run_mission, validate_plan
+from telemetry import TelemetryCollector
+
+CONNECT_RETRY = 5
+CONNECT_TIMEOUT = 10
+COUNTDOWN_S = 5
+LOG_RATE_HZ = 10.0
+ADAPTIVE_SAMPLING = True  # fewer rows while hovering / landed, compressed (see flight_sampling.py)
+# Where rows are stored (segments / CSV, spool): LOG_SEGMENTS and SPOOL in logging_pipeline.py
+
+DEFAULT_MISSION = HELLO_MISSION
+
+
+class FleetMember:
+    """One drone of the fleet: connection, telemetry into the shared logger, mission result."""
+
+    def __init__(self, name, ip, run_id, mission, logger, timing):
+        self.name = name
+        self.ip = ip
+        self.run_id = run_id
+        self.mission = validate_plan(mission)
+        self.connected = False
+        self.connect_s = None
+        self.result = None
+        self.error = None
+        self._logger = logger
+        self._timing = timing
+        self._drone = None
+        self._collector = None
+
+    def connect(self, retry=CONNECT_RETRY, timeout=CONNECT_TIMEOUT):
+        # olympe.Drone looked up now, so sim_drone.install() works after import
+        start = time.monotonic()
+        with self._timing.timed(self.run_id, "connect", "connect", retry=retry, timeout=timeout) as step:
+            try:
+                self._drone = olympe.Drone(self.ip)
+                self.connected = bool(self._drone.connect(retry=retry, timeout=timeout))
+            except Exception as e:
+                self.error = f"connect: {e}"
+            step.success = self.connected
+        self.connect_s = round(time.monotonic() - start, 3)
+        if self.connected:
+            self._collector = TelemetryCollector(
+                self._drone, self._logger.log_record, self.run_id, rate_hz=LOG_RATE_HZ,
+                sampler=AdaptiveSampler() if ADAPTIVE_SAMPLING else None,
+            )
+            self._collector.start()
+            with self._timing.timed(self.run_id, "connect", "first_state") as step:
+                step.success = self._collector.wait_ready(timeout=2.0)
+            self._logger.log_record(self._collector.snapshot("connected"))
+        return self.connected
+
+    def fly(self):
+        if not self.connected:
+            return None
+        try:
+            drone = TimedDrone(self._drone, self._timing, self.run_id)
+            self.result = run_mission(drone, self.mission, name=self.run_id)
+        except Exception as e:
+            self.error = f"mission: {e}"
+        return self.result
+
+    def disconnect(self):
+        if self._collector is not None:
+            self._collector.stop()
+            try:
+                self._logger.log_record(self._collector.snapshot("disconnected"))
+            except Exception:
+                pass
+            self._collector = None
+        if self._drone is not None and self.connected:
+            with self._timing.timed(self.run_id, "connect", "disconnect"):
+                try:
+                    self._drone.disconnect()
+                except Exception:
+                    pass
+        self.connected = False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "ip": self.ip,
+            "run_id": self.run_id,
+            "connect_s": self.connect_s,
+            "mission": self.result.to_dict() if self.result is not None else None,
+            "error": self.error,
+        }
+
+
+def _fleet_run_id(base, name):
+    return f"{base}_{name}"
+
+
+def run_fleet(drones, mission=None, countdown=COUNTDOWN_S, logger=None, on_event=print):
+    """Connect, fly and disconnect every drone concurrently. Returns one dict per drone.
+
+    `drones` is a list of {"name", "ip", optional "mission"}; drones without their own mission
+    fly `mission` (default DEFAULT_MISSION). All missions start together after one shared
+    countdown, once every drone has finished connecting.
+    """
+    mission = mission or DEFAULT_MISSION
+    base = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    owns_logger = logger is None
+    if logger is None:
+        logger = FlightLogger(max_queue=10000 * max(1, len(drones)), writer=log_writer())
+    timing = TimingRecorder()
+    members = [
+        FleetMember(d["name"], d["ip"], _fleet_run_id(base, d["name"]), d.get("mission", mission), logger, timing)
+        for d in drones
+    ]
+    lock = threading.Lock()
+
+    def report(message):
+        if on_event is not None:
+            with lock:
+                on_event(message)
+
+    def connect(member):
+        ok = member.connect()
+        report(f"[{member.name}] {'connected' if ok else 'FAILED to connect'} in {member.connect_s:.2f} s")
+
+    def fly(member):
+        result = member.fly()
+        if result is not None:
+            report(f"[{member.name}] mission {'OK' if result.success else 'FAILED'} in {result.duration_s:.2f} s")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(members)), thread_name_prefix="fleet") as pool:
+            list(pool.map(connect, members))
+            flying = [m for m in members if m.connected]
+            if flying:
+                report(f"{len(flying)}/{len(members)} drones connected. Taking off in {countdown} s")
+                for i in range(int(countdown), 0, -1):
+                    report(str(i))
+                    time.sleep(1)
+                list(pool.map(fly, flying))
+            list(pool.map(lambda m: m.disconnect(), members))
+    finally:
+        timing.close()
+        if owns_logger:
+            logger.close(timeout=10)
+        else:
+            logger.flush(timeout=10)
+    if logger.dropped:
+        report(f"WARNING: {logger.dropped} log rows dropped (queue full)")
+    return [m.to_dict() for m in members]
+
+
+def _sim_fleet(count):
+    import sim_drone
+
+    # A realistic connect delay, so parallel vs sequential connects is visible; one seed per
+    # drone, or every member would fly exactly the same noisy track
+    sim_drone.install(sim_drone.SimConfig(time_scale=10.0, connect_latency_s=1.0), seed_per_drone=True)
+    return [{"name": f"sim{i:02d}", "ip": f"sim-{i}"} for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fly a fleet of drones concurrently.")
+    parser.add_argument("config", nargs="?", help='JSON file: {"drones": [{"name", "ip", "mission"?}], "mission": [...]}')
+    parser.add_argument("--sim", type=int, metavar="N", help="use N simulated drones instead of a config file")
+    parser.add_argument("--countdown", type=int, default=COUNTDOWN_S)
+    args = parser.parse_args()
+
+    if args.sim:
+        drones, mission = _sim_fleet(args.sim), None
+    elif args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+        drones, mission = config["drones"], config.get("mission")
+    else:
+        parser.error("give a fleet config file or --sim N")
+
+    start = time.monotonic()
+    results = run_fleet(drones, mission, countdown=args.countdown)
+    print(json.dumps(results, indent=2))
+    print(f"--- Fleet of {len(drones)} done in {time.monotonic() - start:.2f} s ---")
+    for line in describe():
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+# flight_analytics.py – per-run flight metrics (distance, vertical travel, battery drain) with NumPy
+#
+#   python flight_analytics.py                      # all runs of flight_log_segments/ (flight_segments.py)
+#   python flight_analytics.py --source csv         # flight_log.csv (LOG_SEGMENTS = False)
+#   python flight_analytics.py --source columnar    # flight_log_columns/ (flight_columnar.py)
+#   python flight_analytics.py --run 20260202_185514 --json
+#
+# Metrics are computed for all requested runs at once (rows sorted by run and time, then
+# np.bincount / reduceat per run), and cached per run_id in flight_analytics_cache.json
+# together with the run's version (row count + last timestamp). A run is only recomputed
+# when it got new rows.
+import argparse
+import json
+import os
+import warnings
+
+import numpy as np
+
+from flight_columnar import FLIGHT_LOG_COLUMNS_DIR, ColumnarLog
+from flight_index import open_index
+from flight_logger import FLIGHT_LOG_CSV, LOG_DIR
+
+ANALYTICS_CACHE = os.path.join(LOG_DIR, "flight_analytics_cache.json")
+EARTH_RADIUS_M = 6371008.8
+METRIC_COLUMNS = ("timestamp", "latitude", "longitude", "altitude_above_takeoff_m", "battery_pct", "battery_remaining_mah")
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres between arrays of points (degrees)."""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _first_last(codes, n):
+    """Index of the first and last row of each run code in a run-sorted code array (-1 = none)."""
+    first = np.full(n, -1, dtype=np.int64)
+    last = np.full(n, -1, dtype=np.int64)
+    if len(codes):
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:] - 1, len(codes) - 1]
+        first[codes[starts]] = starts
+        last[codes[starts]] = ends
+    return first, last
+
+
+def _path_sums(codes, values, n, fn):
+    """Per-run sum of fn(previous, current) over consecutive valid samples of the same run."""
+    if len(codes) < 2:
+        return np.zeros(n)
+    same = codes[1:] == codes[:-1]
+    steps = np.where(same, fn(values[:-1], values[1:]), 0.0)
+    return np.bincount(codes[1:], weights=steps, minlength=n)
+
+
+def compute_metrics(codes, columns, n):
+    """Metrics for run codes 0..n-1 from flat arrays (any order). Returns a list of dicts."""
+    t = np.asarray(columns["timestamp"], dtype=np.float64)
+    keep = ~np.isnan(t)
+    codes, t = codes[keep], t[keep]
+    order = np.lexsort((t, codes))
+    codes, t = codes[order], t[order]
+    col = {name: np.asarray(columns[name], dtype=np.float64)[keep][order] for name in METRIC_COLUMNS[1:]}
+    # battery_remaining_mah uses -1 for "missing" in the columnar format
+    col["battery_remaining_mah"][col["battery_remaining_mah"] < 0] = np.nan
+
+    rows = np.bincount(codes, minlength=n)
+    first, last = _first_last(codes, n)
+    has = first >= 0
+    start = np.where(has, t[np.maximum(first, 0)], np.nan)
+    end = np.where(has, t[np.maximum(last, 0)], np.nan)
+    duration = end - start
+
+    # Ground distance over consecutive GPS fixes
+    fix = ~(np.isnan(col["latitude"]) | np.isnan(col["longitude"]))
+    fcodes = codes[fix]
+    latlon = np.column_stack((col["latitude"][fix], col["longitude"][fix]))
+    distance = _path_sums(
+        fcodes, latlon, n, lambda a, b: haversine_m(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+    )
+
+    # Vertical travel from altitude above takeoff
+    valid = ~np.isnan(col["altitude_above_takeoff_m"])
+    acodes, alt = codes[valid], col["altitude_above_takeoff_m"][valid]
+    climb = _path_sums(acodes, alt, n, lambda a, b: np.maximum(b - a, 0.0))
+    descent = _path_sums(acodes, alt, n, lambda a, b: np.maximum(a - b, 0.0))
+    max_alt = np.full(n, np.nan)
+    if len(acodes):
+        a_first, _ = _first_last(acodes, n)
+        present = a_first >= 0
+        max_alt[present] = np.maximum.reduceat(alt, a_first[present])
+
+    def drain(name):
+        valid = ~np.isnan(col[name])
+        vcodes, values, vt = codes[valid], col[name][valid], t[valid]
+        f, l = _first_last(vcodes, n)
+        ok = f >= 0
+        used = np.full(n, np.nan)
+        span = np.full(n, np.nan)
+        used[ok] = values[f[ok]] - values[l[ok]]
+        span[ok] = vt[l[ok]] - vt[f[ok]]
+        return used, span
+
+    pct_used, pct_span = drain("battery_pct")
+    mah_used, mah_span = drain("battery_remaining_mah")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_per_min = np.where(pct_span > 0, pct_used / (pct_span / 60.0), np.nan)
+        mah_per_min = np.where(mah_span > 0, mah_used / (mah_span / 60.0), np.nan)
+        pct_per_m = np.where(distance > 0, pct_used / distance, np.nan)
+        mah_per_m = np.where(distance > 0, mah_used / distance, np.nan)
+
+    def value(a, i, digits):
+        v = a[i]
+        return None if np.isnan(v) else round(float(v), digits)
+
+    return [
+        {
+            "rows": int(rows[i]),
+            "duration_s": value(duration, i, 3),
+            "distance_m": round(float(distance[i]), 2),
+            "vertical_travel_m": round(float(climb[i] + descent[i]), 2),
+            "climb_m": round(float(climb[i]), 2),
+            "descent_m": round(float(descent[i]), 2),
+            "max_altitude_m": value(max_alt, i, 2),
+            "battery_used_pct": value(pct_used, i, 2),
+            "battery_pct_per_min": value(pct_per_min, i, 4),
+            "battery_pct_per_m": value(pct_per_m, i, 6),
+            "battery_used_mah": value(mah_used, i, 1),
+            "battery_mah_per_min": value(mah_per_min, i, 3),
+            "battery_mah_per_m": value(mah_per_m, i, 4),
+        }
+        for i in range(n)
+    ]
+
+
+def _timestamps(values):
+    """Log timestamp strings -> epoch seconds (NaN if empty), parsed by NumPy in one call."""
+    parsed = np.asarray(values, dtype="datetime64[ms]")
+    seconds = parsed.astype(np.int64) / 1000.0
+    seconds[np.isnat(parsed)] = np.nan
+    return seconds
+
+
+def _float(cell):
+    try:
+        return float(cell)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _floats(cells):
+    """Text cells -> float array; empty or non-numeric cells become NaN."""
+    if not cells:
+        return np.empty(0)
+    # One C-level parse of the whole column; a cell it cannot read (or that contains a comma)
+    # makes it stop early, and then the column is parsed cell by cell
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            values = np.fromstring(",".join([cell or "nan" for cell in cells]), dtype=np.float64, sep=",")
+        except ValueError:
+            values = None
+    if values is None or len(values) != len(cells):
+        values = np.array([_float(cell) for cell in cells], dtype=np.float64)
+    return values
+
+
+def columns_from_values(header, runs):
+    """[(run_id, [row values in header order])] -> (run_ids, codes, {column: array}).
+
+    Each column is gathered once and parsed by NumPy, so numbers are not converted one by one."""
+    run_ids, codes, all_rows = [], [], []
+    for run_id, rows in runs:
+        codes.append(np.full(len(rows), len(run_ids), dtype=np.int64))
+        run_ids.append(run_id)
+        all_rows.extend(rows)
+    positions = {name: header.index(name) for name in METRIC_COLUMNS}
+    ts = positions["timestamp"]
+    columns = {"timestamp": _timestamps([row[ts] for row in all_rows])}
+    for name in METRIC_COLUMNS[1:]:
+        p = positions[name]
+        columns[name] = _floats([row[p] for row in all_rows])
+    codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int64)
+    return run_ids, codes, columns
+
+
+def columns_from_rows(rows):
+    """CSV rows (dicts, any run order) -> (run_ids, codes, {column: array})."""
+    by_run = {}
+    for row in rows:
+        by_run.setdefault(row["run_id"], []).append([row.get(name, "") for name in METRIC_COLUMNS])
+    return columns_from_values(list(METRIC_COLUMNS), by_run.items())
+
+
+class CsvSource:
+    """Runs of flight_log.csv; versions come from the run_id index, so only stale runs are read."""
+
+    def __init__(self, csv_path=None):
+        self.index = open_index(csv_path or FLIGHT_LOG_CSV)
+
+    def versions(self):
+        return {r["run_id"]: [r["rows"], r["last_timestamp"]] for r in self.index.runs()}
+
+    def load(self, run_ids):
+        runs = ((run_id, list(self.index.read_run_values(run_id))) for run_id in run_ids)
+        return columns_from_values(self.index.header, runs)
+
+
+class SegmentSource:
+    """Runs of a segmented log (flight_segments.py); versions from the manifest."""
+
+    def __init__(self, directory=None):
+        from flight_segments import FLIGHT_LOG_SEGMENTS_DIR, SegmentManifest
+
+        self.directory = directory or FLIGHT_LOG_SEGMENTS_DIR
+        self.segments = SegmentManifest(self.directory).snapshot()
+
+    def versions(self):
+        versions = {}
+        for entry in self.segments:
+            for run_id in entry["run_ids"]:
+                versions.setdefault(run_id, []).append([entry["name"], entry["rows"], entry["last_timestamp"]])
+        return versions
+
+    def load(self, run_ids):
+        from flight_segments import iter_rows
+
+        # Only the segments the manifest lists the runs in are decompressed
+        return columns_from_rows(iter_rows(self.directory, run_ids=run_ids))
+
+
+class ColumnarSource:
+    """Runs of a columnar log (flight_columnar.py): already NumPy, versions computed from it."""
+
+    def __init__(self, directory=None):
+        self.log = ColumnarLog(directory or FLIGHT_LOG_COLUMNS_DIR)
+        self.columns = self.log.columns(("run_id",) + METRIC_COLUMNS)
+        self.run_ids = self.log.dictionary["run_id"]
+
+    def versions(self):
+        codes = np.asarray(self.columns["run_id"])
+        n = len(self.run_ids)
+        rows = np.bincount(codes, minlength=n)
+        last = np.full(n, -np.inf)
+        np.maximum.at(last, codes, np.nan_to_num(self.columns["timestamp"], nan=-np.inf))
+        return {self.run_ids[i]: [int(rows[i]), float(last[i])] for i in range(n) if rows[i]}
+
+    def load(self, run_ids):
+        wanted = np.asarray([self.log.code("run_id", r) for r in run_ids], dtype=np.int64)
+        codes = np.asarray(self.columns["run_id"], dtype=np.int64)
+        mask = np.isin(codes, wanted)
+        # Re-code to 0..len(run_ids)-1 in the order of run_ids
+        remap = np.full(max(len(self.run_ids), 1), -1, dtype=np.int64)
+        remap[wanted] = np.arange(len(wanted))
+        columns = {name: np.asarray(self.columns[name])[mask] for name in METRIC_COLUMNS}
+        return list(run_ids), remap[codes[mask]], columns
+
+
+SOURCES = {"csv": CsvSource, "segments": SegmentSource, "columnar": ColumnarSource}
+
+
+class FlightAnalytics:
+    """Per-run metrics with a per-run_id cache that is invalidated when the run's version changes."""
+
+    def __init__(self, source=None, cache_path=ANALYTICS_CACHE):
+        self.source = source or SegmentSource()
+        self.cache_path = cache_path
+        self._cache = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    self._cache = json.load(f)
+            except ValueError:
+                self._cache = {}
+        self.computed = 0  # runs (re)computed by the last summaries() call
+
+    def summaries(self, run_ids=None):
+        """{run_id: metrics} for the given runs (all by default); computes only stale runs."""
+        versions = self.source.versions()
+        run_ids = list(versions) if run_ids is None else [r for r in run_ids if r in versions]
+        stale = [r for r in run_ids if self._cache.get(r, {}).get("version") != versions[r]]
+        self.computed = len(stale)
+        if stale:
+            loaded_ids, codes, columns = self.source.load(stale)
+            for run_id, metrics in zip(loaded_ids, compute_metrics(codes, columns, len(loaded_ids))):
+                self._cache[run_id] = {"version": versions[run_id], "metrics": metrics}
+            self._save()
+        return {r: self._cache[r]["metrics"] for r in run_ids}
+
+    def run(self, run_id):
+        return self.summaries([run_id]).get(run_id)
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp, self.cache_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-run flight metrics from the flight log.")
+    # Segments: where the flight scripts log by default (LOG_SEGMENTS)
+    parser.add_argument("--source", choices=sorted(SOURCES), default="segments")
+    parser.add_argument("--path", help="log file / directory (default: the source's standard location)")
+    parser.add_argument("--run", action="append", help="only this run_id (repeatable)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    analytics = FlightAnalytics(SOURCES[args.source](args.path))
+    summaries = analytics.summaries(args.run)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    print(f"{'run_id':<28} {'rows':>6} {'dur s':>8} {'dist m':>9} {'vert m':>8} {'max alt':>8} {'%/min':>7} {'mAh/m':>7}")
+    for run_id, m in summaries.items():
+        cells = [m["duration_s"], m["distance_m"], m["vertical_travel_m"], m["max_altitude_m"],
+                 m["battery_pct_per_min"], m["battery_mah_per_m"]]
+        text = [f"{c:>{w}.{d}f}" if c is not None else f"{'-':>{w}}" for c, w, d in zip(cells, (8, 9, 8, 8, 7, 7), (1, 1, 1, 1, 2, 2))]
+        print(f"{run_id:<28} {m['rows']:>6} " + " ".join(text))
+    print(f"({len(summaries)} runs, {analytics.computed} recomputed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# flight_columnar.py – columnar binary flight log (one .npy file per column, chunked, memory-mappable)
+#
+# Layout of a columnar log directory:
+#   dictionary.json          run_id / phase strings, column value = index into these lists
+#   chunk_000000/<col>.npy   one fixed-width array per CSV column (see COLUMN_DTYPES)
+#   chunk_000001/...
+#   chunk_000001_c/...       compacted chunk (replaces chunk_000000..chunk_000001)
+#
+# compact() writes the merged chunk under a new name with a replaces.json listing the chunks
+# it supersedes, then renames it into place: readers see either the old chunks or the merged
+# one, never both or neither, even if compact() is interrupted. The merged chunk is named
+# after the last chunk it replaces plus "_c", a name a writer never picks, so a
+# ColumnarLogWriter can keep flushing while compact() runs.
+# Missing values (empty CSV cells) are NaN in float columns and -1 in int columns.
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import time
+from calendar import timegm
+from functools import lru_cache
+
+import numpy as np
+
+from flight_logger import CSV_HEADERS, FLIGHT_LOG_CSV, LOG_DIR
+
+FLIGHT_LOG_COLUMNS_DIR = os.path.join(LOG_DIR, "flight_log_columns")
+
+COLUMN_DTYPES = {
+    "timestamp": np.float64,  # UTC seconds since epoch
+    "run_id": np.int32,  # index into dictionary.json "run_id"
+    "phase": np.int32,  # index into dictionary.json "phase"
+    "latitude": np.float64,
+    "longitude": np.float64,
+    "altitude_m": np.float32,
+    "altitude_above_takeoff_m": np.float32,
+    "battery_pct": np.float32,
+    "battery_remaining_mah": np.int32,
+    "battery_full_mah": np.int32,
+}
+DICTIONARY_COLUMNS = ("run_id", "phase")
+CHUNK_ROWS = 65536
+REPLACES_FILE = "replaces.json"
+
+
+@lru_cache(maxsize=4096)
+def _parse_seconds(whole):
+    # Consecutive rows share the same second, so strptime runs about once per logged second
+    return timegm(time.strptime(whole, "%Y-%m-%d %H:%M:%S"))
+
+
+def parse_timestamp(value):
+    """Log timestamp string ("YYYY-MM-DD HH:MM:SS[.mmm]", UTC) -> epoch seconds, NaN if empty."""
+    if not value:
+        return float("nan")
+    whole, _, frac = value.partition(".")
+    return _parse_seconds(whole) + (float("0." + frac) if frac else 0.0)
+
+
+def _missing(dtype):
+    return -1 if np.issubdtype(dtype, np.integer) else np.nan
+
+
+def _load_dictionary(directory):
+    path = os.path.join(directory, "dictionary.json")
+    if not os.path.exists(path):
+        return {name: [] for name in DICTIONARY_COLUMNS}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_dictionary(directory, dictionary):
+    path = os.path.join(directory, "dictionary.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dictionary, f)
+    os.replace(tmp, path)
+
+
+def _chunk_name(index):
+    return "chunk_%06d" % index
+
+
+def _chunk_index(path):
+    """6-digit number of a chunk ("chunk_000042" and "chunk_000042_c" -> 42)."""
+    return int(os.path.basename(path)[len("chunk_"):len("chunk_") + 6])
+
+
+def _replaced(directory, names):
+    """Chunks superseded by a compacted chunk (left behind if compact() was interrupted)."""
+    replaced = set()
+    for name in names:
+        marker = os.path.join(directory, name, REPLACES_FILE)
+        if os.path.exists(marker):
+            with open(marker, encoding="utf-8") as f:
+                replaced.update(json.load(f))
+    return replaced
+
+
+def _chunk_dirs(directory):
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.startswith("chunk_") and not n.endswith(".tmp"))
+    replaced = _replaced(directory, names)
+    return [os.path.join(directory, n) for n in names if n not in replaced]
+
+
+class ColumnarLogWriter:
+    """Writes CSV records (keys from CSV_HEADERS) into a columnar log directory.
+
+    Rows are buffered and written as one chunk per `chunk_rows` rows; flush() and close()
+    write the rest as a smaller chunk. Has the writerow/flush/close interface of
+    flight_logger.CsvLogWriter, so it can be passed as FlightLogger(writer=ColumnarLogWriter()).
+    A FlightLogger flushes often, so run compact() now and then to merge the small chunks.
+    """
+
+    def __init__(self, directory=None, chunk_rows=CHUNK_ROWS):
+        self.directory = directory or FLIGHT_LOG_COLUMNS_DIR
+        self.chunk_rows = chunk_rows
+        os.makedirs(self.directory, exist_ok=True)
+        self._dictionary = _load_dictionary(self.directory)
+        self._codes = {name: {v: i for i, v in enumerate(self._dictionary[name])} for name in DICTIONARY_COLUMNS}
+        self._rows = {name: [] for name in CSV_HEADERS}
+        self._count = 0
+
+    def writerow(self, record):
+        for name in CSV_HEADERS:
+            value = record.get(name, "")
+            if name == "timestamp":
+                value = parse_timestamp(value)
+            elif name in DICTIONARY_COLUMNS:
+                value = self._code(name, str(value))
+            elif value == "" or value is None:
+                value = _missing(COLUMN_DTYPES[name])
+            elif np.issubdtype(COLUMN_DTYPES[name], np.integer):
+                # CSV cells may hold floats ("5000.0"), which an int32 array refuses
+                number = float(value)
+                value = int(number) if math.isfinite(number) else _missing(COLUMN_DTYPES[name])
+            self._rows[name].append(value)
+        self._count += 1
+        if self._count >= self.chunk_rows:
+            self._write_chunk()
+
+    def flush(self):
+        if self._count:
+            self._write_chunk()
+
+    def close(self):
+        if self._count:
+            self._write_chunk()
+
+    def _code(self, name, value):
+        codes = self._codes[name]
+        if value not in codes:
+            codes[value] = len(self._dictionary[name])
+            self._dictionary[name].append(value)
+        return codes[value]
+
+    def _write_chunk(self):
+        existing = _chunk_dirs(self.directory)
+        index = _chunk_index(existing[-1]) + 1 if existing else 0
+        final = os.path.join(self.directory, _chunk_name(index))
+        tmp = final + ".tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name in CSV_HEADERS:
+            np.save(os.path.join(tmp, name + ".npy"), np.asarray(self._rows[name], dtype=COLUMN_DTYPES[name]))
+        # Dictionary first, so every code in a visible chunk can be decoded
+        _save_dictionary(self.directory, self._dictionary)
+        os.replace(tmp, final)
+        self._rows = {name: [] for name in CSV_HEADERS}
+        self._count = 0
+
+
+class ColumnarLog:
+    """Read side of a columnar log directory: NumPy arrays per column, memory-mapped."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or FLIGHT_LOG_COLUMNS_DIR
+        self.chunks = _chunk_dirs(self.directory)
+        self.dictionary = _load_dictionary(self.directory)
+
+    def __len__(self):
+        return sum(len(c["timestamp"]) for c in self.iter_chunks(["timestamp"]))
+
+    def iter_chunks(self, columns=None):
+        """Yield {column: memmapped array} per chunk (no copies)."""
+        names = columns or CSV_HEADERS
+        for chunk in self.chunks:
+            yield {name: np.load(os.path.join(chunk, name + ".npy"), mmap_mode="r") for name in names}
+
+    def column(self, name):
+        """Whole column as one array: zero-copy memmap for a single-chunk log, concatenated otherwise."""
+        parts = [c[name] for c in self.iter_chunks([name])]
+        if not parts:
+            return np.empty(0, dtype=COLUMN_DTYPES[name])
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def columns(self, names=None):
+        """{name: array} for the given columns (all by default)."""
+        return {name: self.column(name) for name in names or CSV_HEADERS}
+
+    def decode(self, name, codes):
+        """Map run_id / phase codes back to their strings."""
+        values = np.asarray(self.dictionary[name], dtype=object)
+        return values[np.asarray(codes)]
+
+    def code(self, name, value):
+        """Code of a run_id / phase string, or -1 if it never occurs in the log."""
+        try:
+            return self.dictionary[name].index(value)
+        except ValueError:
+            return -1
+
+
+def convert_csv(csv_path=None, directory=None, chunk_rows=1 << 22):
+    """One-shot conversion of a CSV_HEADERS flight log into a columnar log. Returns the row count."""
+    csv_path = csv_path or FLIGHT_LOG_CSV
+    writer = ColumnarLogWriter(directory, chunk_rows=chunk_rows)
+    rows = 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            writer.writerow(record)
+            rows += 1
+    writer.close()
+    return rows
+
+
+def _remove_replaced(directory):
+    """Deletes chunks a compacted chunk supersedes, then its replaces.json."""
+    names = sorted(n for n in os.listdir(directory) if n.startswith("chunk_") and not n.endswith(".tmp"))
+    for name in _replaced(directory, names):
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    for name in names:
+        marker = os.path.join(directory, name, REPLACES_FILE)
+        if os.path.exists(marker):
+            os.remove(marker)
+
+
+def compact(directory=None):
+    """Rewrite all chunks of a columnar log as a single chunk (so column() is zero-copy again)."""
+    log = ColumnarLog(directory)
+    if os.path.isdir(log.directory):
+        _remove_replaced(log.directory)  # an earlier compact() that did not finish
+    if len(log.chunks) <= 1:
+        return
+    old = log.chunks
+    # Never a name a writer picks (those have no suffix), even if one flushes meanwhile
+    final = os.path.join(log.directory, _chunk_name(_chunk_index(old[-1])) + "_c")
+    tmp = final + ".tmp"
+    os.makedirs(tmp, exist_ok=True)
+    for name in CSV_HEADERS:
+        np.save(os.path.join(tmp, name + ".npy"), log.column(name))
+    with open(os.path.join(tmp, REPLACES_FILE), "w", encoding="utf-8") as f:
+        json.dump([os.path.basename(path) for path in old], f)
+    # The switch: from here on readers see the merged chunk instead of the old ones
+    os.replace(tmp, final)
+    _remove_replaced(log.directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert flight_log.csv to the columnar format.")
+    parser.add_argument("csv_path", nargs="?", default=FLIGHT_LOG_CSV)
+    parser.add_argument("directory", nargs="?", default=FLIGHT_LOG_COLUMNS_DIR)
+    args = parser.parse_args()
+    n = convert_csv(args.csv_path, args.directory)
+    print(f"Converted {n} rows from {args.csv_path} to {args.directory}")
@@ -0,0 +1,254 @@
+# flight_index.py – run_id index for the append-only flight log (sidecar JSON next to the CSV)
+#
+# For every run_id the index keeps the byte ranges of its rows in the CSV, the row count,
+# first/last timestamp and the phases seen. It also records how many bytes of the CSV it
+# covers, so rows appended without the index (e.g. by log_flight_row) are picked up by
+# refresh() reading only the new tail of the file.
+#
+# While a CsvLogWriter is appending, each flush only appends what changed (one line per flush)
+# to a journal next to the index; the journal is folded into the index JSON when the writer
+# closes, or by the next open_index().
+import argparse
+import csv
+import json
+import os
+import sys
+
+
+def index_path_for(csv_path):
+    """Sidecar index path for a flight log CSV."""
+    return csv_path + ".index.json"
+
+
+def _add_row(runs, record, start, end):
+    run = runs.get(record["run_id"])
+    if run is None:
+        run = runs[record["run_id"]] = {
+            "ranges": [],
+            "rows": 0,
+            "first_timestamp": record["timestamp"],
+            "last_timestamp": record["timestamp"],
+            "phases": [],
+        }
+    ranges = run["ranges"]
+    if ranges and ranges[-1][1] == start:
+        ranges[-1][1] = end
+    else:
+        ranges.append([start, end])
+    run["rows"] += 1
+    if record["timestamp"] < run["first_timestamp"]:
+        run["first_timestamp"] = record["timestamp"]
+    if record["timestamp"] > run["last_timestamp"]:
+        run["last_timestamp"] = record["timestamp"]
+    if record["phase"] not in run["phases"]:
+        run["phases"].append(record["phase"])
+
+
+def _merge_runs(runs, delta):
+    """Fold the index entries of later rows (`delta`) into `runs`."""
+    for run_id, new in delta.items():
+        run = runs.get(run_id)
+        if run is None:
+            runs[run_id] = new
+            continue
+        ranges = new["ranges"]
+        if run["ranges"] and ranges and run["ranges"][-1][1] == ranges[0][0]:
+            run["ranges"][-1][1] = ranges[0][1]
+            ranges = ranges[1:]
+        run["ranges"].extend(ranges)
+        run["rows"] += new["rows"]
+        run["first_timestamp"] = min(run["first_timestamp"], new["first_timestamp"])
+        run["last_timestamp"] = max(run["last_timestamp"], new["last_timestamp"])
+        run["phases"].extend(phase for phase in new["phases"] if phase not in run["phases"])
+
+
+class FlightLogIndex:
+    """run_id -> {ranges, rows, first_timestamp, last_timestamp, phases} for one flight log CSV."""
+
+    def __init__(self, csv_path, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or index_path_for(csv_path)
+        self.journal_path = self.index_path + ".journal"
+        self.indexed_size = 0
+        self.header = None
+        self._runs = {}
+        self._delta = {}  # entries of rows added since the last save / checkpoint
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Load the sidecar file and its journal if they exist (empty index otherwise)."""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.indexed_size = data.get("indexed_size", 0)
+            self.header = data.get("header")
+            self._runs = data.get("runs", {})
+        self._delta = {}
+        self._dirty = False
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # cut short by a crash mid-write
+                    # Lines already folded in (a crash between save() and removing the journal)
+                    if entry["indexed_size"] > self.indexed_size:
+                        _merge_runs(self._runs, entry["runs"])
+                        self.indexed_size = entry["indexed_size"]
+                        self.header = self.header or entry.get("header")
+                        self._dirty = True
+
+    def save(self):
+        """Write the sidecar atomically (only if something changed) and drop the journal."""
+        if not self._dirty:
+            return
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"indexed_size": self.indexed_size, "header": self.header, "runs": self._runs}, f)
+        os.replace(tmp, self.index_path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._delta = {}
+        self._dirty = False
+
+    def checkpoint(self):
+        """Append the entries of rows added since the last save / checkpoint to the journal:
+        one short line per flush instead of rewriting the whole index."""
+        if not self._delta:
+            return
+        line = json.dumps({"indexed_size": self.indexed_size, "header": self.header, "runs": self._delta})
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        self._delta = {}
+
+    def add(self, record, start, end):
+        """Record one row (dict with run_id/timestamp/phase) stored at bytes [start, end)."""
+        _add_row(self._runs, record, start, end)
+        _add_row(self._delta, record, start, end)
+        self.indexed_size = max(self.indexed_size, end)
+        self._dirty = True
+
+    def refresh(self):
+        """Index rows appended to the CSV since the last update. Returns the number of new rows."""
+        if not os.path.exists(self.csv_path):
+            return 0
+        size = os.path.getsize(self.csv_path)
+        if size < self.indexed_size:
+            # Log was truncated or replaced – start over
+            self._runs = {}
+            self._delta = {}
+            self.indexed_size = 0
+            self.header = None
+            self._dirty = True
+        if size == self.indexed_size:
+            return 0
+        added = 0
+        with open(self.csv_path, "rb") as f:
+            if self.header is None:
+                first = f.readline()
+                self.header = next(csv.reader([first.decode("utf-8")]))
+                self.indexed_size = len(first)
+                self._dirty = True
+            f.seek(self.indexed_size)
+            pos = self.indexed_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # row still being written
+                start, pos = pos, pos + len(line)
+                values = next(csv.reader([line.decode("utf-8")]), None)
+                if not values:
+                    self.indexed_size = pos
+                    continue
+                self.add(dict(zip(self.header, values)), start, pos)
+                added += 1
+        return added
+
+    def runs(self):
+        """Summaries of all runs (without byte ranges), in order of first appearance in the log."""
+        return [
+            {"run_id": run_id, **{k: v for k, v in run.items() if k != "ranges"}}
+            for run_id, run in self._runs.items()
+        ]
+
+    def run(self, run_id):
+        """Index entry for one run_id (ranges included), or None."""
+        run = self._runs.get(run_id)
+        return {"run_id": run_id, **run} if run else None
+
+    def read_run(self, run_id):
+        """Yield the rows of one run as dicts, reading only its byte ranges of the CSV."""
+        for values in self.read_run_values(run_id):
+            yield dict(zip(self.header, values))
+
+    def read_run_values(self, run_id):
+        """Like read_run, but yields each row as a list of values in `header` order."""
+        run = self._runs.get(run_id)
+        if not run:
+            return
+        with open(self.csv_path, "rb") as f:
+            for start, end in run["ranges"]:
+                # Line by line: one contiguous range can be a whole multi-hour run
+                f.seek(start)
+                for values in csv.reader(_range_lines(f, end - start)):
+                    if values:
+                        yield values
+
+
+def _range_lines(f, size):
+    """Decoded lines of the next `size` bytes of f."""
+    while size > 0:
+        line = f.readline(size)
+        if not line:
+            return
+        size -= len(line)
+        yield line.decode("utf-8")
+
+
+def open_index(csv_path):
+    """Load the index for csv_path and catch up with any rows appended since it was saved.
+
+    The catch-up is saved unless a journal exists: then a CsvLogWriter may still be appending
+    to it, and folding it in here would count its next lines twice."""
+    index = FlightLogIndex(csv_path)
+    if index.refresh() and not os.path.exists(index.journal_path):
+        index.save()
+    return index
+
+
+def rebuild_index(csv_path):
+    """Rebuild the index from scratch by scanning the whole CSV (for logs older than the index)."""
+    index_path = index_path_for(csv_path)
+    for path in (index_path, index_path + ".journal"):
+        if os.path.exists(path):
+            os.remove(path)
+    index = FlightLogIndex(csv_path)
+    index.refresh()
+    index._dirty = True
+    index.save()
+    return index
+
+
+if __name__ == "__main__":
+    from flight_logger import FLIGHT_LOG_CSV
+
+    parser = argparse.ArgumentParser(description="run_id index for flight_log.csv")
+    parser.add_argument("command", choices=["rebuild", "list", "show"])
+    parser.add_argument("run_id", nargs="?")
+    parser.add_argument("--csv", default=FLIGHT_LOG_CSV)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        idx = rebuild_index(args.csv)
+        print(f"Indexed {len(idx.runs())} runs ({idx.indexed_size} bytes) -> {idx.index_path}")
+    elif args.command == "list":
+        for r in open_index(args.csv).runs():
+            print(f"{r['run_id']}\t{r['rows']} rows\t{r['first_timestamp']} .. {r['last_timestamp']}\t{','.join(r['phases'])}")
+    else:
+        writer = None
+        for row in open_index(args.csv).read_run(args.run_id):
+            if writer is None:
+                writer = csv.DictWriter(sys.stdout, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
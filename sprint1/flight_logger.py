@@ -1,6 +1,10 @@
 # flight_logger.py – shared CSV flight logging (append-only, same format for all scripts)
 import csv
+import io
 import os
+import queue
+import sys
+import threading
 import time
 from datetime import datetime
 
@@ -8,6 +12,8 @@ import olympe
 from olympe.messages.ardrone3.PilotingState import GpsLocationChanged, AltitudeChanged
 from olympe.messages.battery import capacity
 
+from flight_index import open_index
+
 # CSV log file: project directory, append across all runs
 LOG_DIR = os.path.dirname(os.path.abspath(__file__))
 FLIGHT_LOG_CSV = os.path.join(LOG_DIR, "flight_log.csv")
@@ -20,14 +26,39 @@ CSV_HEADERS = [
 ]
 
 
-def _ensure_csv_headers():
+def _ensure_csv_headers(path=None):
     """Write CSV headers only if the file is new or empty (keeps append-only)."""
-    if not os.path.exists(FLIGHT_LOG_CSV) or os.path.getsize(FLIGHT_LOG_CSV) == 0:
-        with open(FLIGHT_LOG_CSV, "w", newline="", encoding="utf-8") as f:
+    path = path or FLIGHT_LOG_CSV
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        with open(path, "w", newline="", encoding="utf-8") as f:
             writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
             writer.writeheader()
 
 
+def _drop_partial_line(path):
+    """Cut off a last line left without its newline by a crash, so the next row starts on its own
+    line (appending to it would corrupt both). Returns the number of bytes removed."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            block = f.read(end - start)
+            if end == size and block.endswith(b"\n"):
+                return 0
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        f.truncate(end)
+    print(f"flight_logger: {path}: dropped an incomplete last line ({size - end} bytes)", file=sys.stderr)
+    return size - end
+
+
 def _get_value(obj, key, default=None):
     """Get key from dict or attribute from object (get_state may return either)."""
     if obj is None:
@@ -40,9 +71,9 @@ def _get_value(obj, key, default=None):
         return default
 
 
-def _read_drone_state(drone, retries=3):
-    """Read current position and battery from drone. Retries so we don't read before states arrive."""
-    row = {
+def _empty_state():
+    """State columns of one row, all empty (= value not available)."""
+    return {
         "latitude": "",
         "longitude": "",
         "altitude_m": "",
@@ -51,49 +82,70 @@ def _read_drone_state(drone, retries=3):
         "battery_remaining_mah": "",
         "battery_full_mah": "",
     }
+
+
+def _apply_gps(row, gps):
+    """Fill latitude/longitude/altitude_m from a GpsLocationChanged state (500.0 = no fix)."""
+    if gps:
+        lat = _get_value(gps, "latitude")
+        lon = _get_value(gps, "longitude")
+        if lat not in (None, 500.0) and lon not in (None, 500.0):
+            row["latitude"] = round(float(lat), 6)
+            row["longitude"] = round(float(lon), 6)
+        alt_gps = _get_value(gps, "altitude")
+        if alt_gps is not None:
+            row["altitude_m"] = round(float(alt_gps), 2)
+
+
+def _apply_altitude(row, alt):
+    """Fill altitude_above_takeoff_m from an AltitudeChanged state."""
+    a = _get_value(alt, "altitude")
+    if alt and a is not None:
+        row["altitude_above_takeoff_m"] = round(float(a), 2)
+
+
+def _apply_battery(row, bat):
+    """Fill battery_pct from a CommonState.BatteryStateChanged state."""
+    pct = _get_value(bat, "percent")
+    if pct is not None:
+        row["battery_pct"] = round(float(pct), 1)
+
+
+def _apply_capacity(row, cap):
+    """Fill battery mAh columns from battery.capacity; battery_pct too if still empty."""
+    full = _get_value(cap, "full_charge")
+    rem = _get_value(cap, "remaining")
+    if full is not None and rem is not None and full > 0:
+        row["battery_full_mah"] = int(full)
+        row["battery_remaining_mah"] = int(rem)
+        if not row["battery_pct"]:
+            row["battery_pct"] = round(100.0 * rem / full, 1)
+
+
+def _read_drone_state(drone, retries=3):
+    """Read current position and battery from drone. Retries so we don't read before states arrive."""
+    row = _empty_state()
     # get_state() expects message *classes* (no parentheses), same as hello.py
     BatteryStateChanged = olympe.messages.common.CommonState.BatteryStateChanged
 
     for attempt in range(retries):
         # GPS / position
         try:
-            gps = drone.get_state(GpsLocationChanged)
-            if gps:
-                lat = _get_value(gps, "latitude")
-                lon = _get_value(gps, "longitude")
-                if lat not in (None, 500.0) and lon not in (None, 500.0):
-                    row["latitude"] = round(float(lat), 6)
-                    row["longitude"] = round(float(lon), 6)
-                alt_gps = _get_value(gps, "altitude")
-                if alt_gps is not None:
-                    row["altitude_m"] = round(float(alt_gps), 2)
+            _apply_gps(row, drone.get_state(GpsLocationChanged))
         except Exception:
             pass
         try:
-            alt = drone.get_state(AltitudeChanged)
-            a = _get_value(alt, "altitude")
-            if alt and a is not None:
-                row["altitude_above_takeoff_m"] = round(float(a), 2)
+            _apply_altitude(row, drone.get_state(AltitudeChanged))
         except Exception:
             pass
         # Battery: CommonState (same as hello.py – class, not instance)
         try:
-            bat = drone.get_state(BatteryStateChanged)
-            pct = _get_value(bat, "percent")
-            if pct is not None:
-                row["battery_pct"] = round(float(pct), 1)
+            _apply_battery(row, drone.get_state(BatteryStateChanged))
         except Exception:
             pass
         # Battery: capacity (Anafi AI – full_charge/remaining mAh); run after pct so we don't skip it
         try:
-            cap = drone.get_state(capacity)
-            full = _get_value(cap, "full_charge")
-            rem = _get_value(cap, "remaining")
-            if full is not None and rem is not None and full > 0:
-                row["battery_full_mah"] = int(full)
-                row["battery_remaining_mah"] = int(rem)
-                if not row["battery_pct"]:
-                    row["battery_pct"] = round(100.0 * rem / full, 1)
+            _apply_capacity(row, drone.get_state(capacity))
         except Exception:
             pass
         if row["battery_pct"]:
@@ -103,17 +155,201 @@ def _read_drone_state(drone, retries=3):
     return row
 
 
-def log_flight_row(drone, phase, run_id=None):
-    """Append one row to the flight CSV. Use same run_id for one flight."""
-    _ensure_csv_headers()
+def _build_record(drone, phase, run_id=None):
+    """Read drone state and build one CSV record (timestamp, run_id, phase + state columns)."""
     ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
     state = _read_drone_state(drone)
-    record = {
+    return {
         "timestamp": ts,
         "run_id": run_id or ts,
         "phase": phase,
         **state,
     }
+
+
+def log_flight_row(drone, phase, run_id=None):
+    """Append one row to the flight CSV. Use same run_id for one flight."""
+    _ensure_csv_headers()
+    record = _build_record(drone, phase, run_id)
     with open(FLIGHT_LOG_CSV, "a", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
         writer.writerow(record)
+
+
+_STOP = object()
+
+
+class CsvLogWriter:
+    """Storage backend for FlightLogger: appends rows to the flight CSV, file kept open.
+
+    Also keeps the run_id index (flight_index.py) next to the CSV up to date. Rows are
+    written on flush(), grouped by run, so each run gets one byte range per flush however its
+    rows were interleaved with other runs'; flush() appends those ranges to the index journal
+    and close() folds the journal into the index.
+    """
+
+    def __init__(self, path=None, index=True):
+        self.path = path or FLIGHT_LOG_CSV
+        _drop_partial_line(self.path)
+        _ensure_csv_headers(self.path)
+        self._file = open(self.path, "ab")
+        self._offset = self._file.tell()
+        self._buf = io.StringIO()
+        self._writer = csv.DictWriter(self._buf, fieldnames=CSV_HEADERS)
+        self._pending = {}  # run_id -> [(record, encoded row)] until the next flush
+        self._index = None
+        if index:
+            # Catch up first so the ranges we add line up with rows already in the file
+            # (and fold in the journal of a writer that did not close)
+            self._index = open_index(self.path)
+            self._index.save()
+
+    def writerow(self, record):
+        self._buf.seek(0)
+        self._buf.truncate()
+        self._writer.writerow(record)
+        self._pending.setdefault(record.get("run_id"), []).append((record, self._buf.getvalue().encode("utf-8")))
+
+    def flush(self):
+        for rows in self._pending.values():
+            for record, data in rows:
+                self._file.write(data)
+                start, self._offset = self._offset, self._offset + len(data)
+                if self._index is not None:
+                    self._index.add(record, start, self._offset)
+        self._pending = {}
+        self._file.flush()
+        if self._index is not None:
+            self._index.checkpoint()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        if self._index is not None:
+            self._index.save()
+
+
+class FlightLogger:
+    """Buffered logger: keeps the log open and writes rows on a dedicated thread.
+
+    log() / log_record() only put the row on a bounded queue, so the flight thread never
+    waits on disk I/O. The writer thread flushes every `flush_rows` rows, every
+    `flush_interval` seconds, whenever the phase changes, and on close(). If the queue is
+    full the row is dropped and counted in `dropped` instead of blocking the caller.
+
+    Rows go to `writer` (any object with writerow/flush/close, e.g.
+    flight_columnar.ColumnarLogWriter) or, by default, to a CsvLogWriter on `path`.
+    """
+
+    def __init__(self, path=None, max_queue=10000, flush_rows=100, flush_interval=1.0, writer=None):
+        self.path = path or FLIGHT_LOG_CSV
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._writer = writer
+        self._owns_writer = writer is None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._closing = False  # _STOP is queued; the thread may still be writing
+
+    def start(self):
+        """Open the log and start the writer thread (called automatically on first log)."""
+        if self._thread is None:
+            self._closing = False
+            self._thread = threading.Thread(target=self._write_loop, name="flight-logger", daemon=True)
+            self._thread.start()
+        return self
+
+    def log(self, drone, phase, run_id=None):
+        """Read drone state and queue one row. Returns False if the row was dropped."""
+        return self.log_record(_build_record(drone, phase, run_id))
+
+    def log_record(self, record):
+        """Queue an already-built record (keys from CSV_HEADERS). Returns False if dropped."""
+        if self._closing:
+            self.dropped += 1
+            return False
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=None):
+        """Block until every row queued so far is written and flushed to the file.
+        False if that did not happen within `timeout` (None = wait as long as it takes)."""
+        if self._thread is None or self._closing:
+            return self._thread is None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(None if deadline is None else max(deadline - time.monotonic(), 0))
+
+    def close(self, timeout=None):
+        """Write remaining rows, flush and close the file, and stop the writer thread.
+
+        Returns False if the thread is still writing after `timeout`; the logger then stays
+        closing (new rows are dropped) and close() can be called again to wait for it."""
+        if self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._closing:
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                return False
+            self._closing = True
+        self._thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if self._thread.is_alive():
+            return False
+        self._thread = None
+        self._closing = False
+        return True
+
+    def _write_loop(self):
+        # Opened here, not in start(): catching up the run_id index may read the log tail
+        if self._owns_writer:
+            self._writer = CsvLogWriter(self.path)
+        writer = self._writer
+        pending = 0
+        last_phase = None
+        last_flush = time.monotonic()
+        try:
+            while True:
+                wait = self.flush_interval - (time.monotonic() - last_flush)
+                try:
+                    item = self._queue.get(timeout=max(wait, 0.01))
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    break
+                phase_changed = False
+                if isinstance(item, threading.Event):
+                    writer.flush()
+                    pending = 0
+                    last_flush = time.monotonic()
+                    item.set()
+                    continue
+                if item is not None:
+                    writer.writerow(item)
+                    pending += 1
+                    phase_changed = item.get("phase") != last_phase
+                    last_phase = item.get("phase")
+                if pending and (
+                    phase_changed
+                    or pending >= self.flush_rows
+                    or time.monotonic() - last_flush >= self.flush_interval
+                ):
+                    writer.flush()
+                    pending = 0
+                    last_flush = time.monotonic()
+                elif not pending:
+                    last_flush = time.monotonic()
+        finally:
+            writer.close()
@@ -0,0 +1,428 @@
+# flight_replay.py – play a logged run back through a drone stand-in, at 1x, Nx or full speed
+#
+#   python flight_replay.py list [--source segments|csv]
+#   python flight_replay.py replay RUN_ID [--speed 10|max] [--log] [--live URL]   # as a new run <RUN_ID>_replay
+#   python flight_replay.py bench RUN_ID [--speeds 1,10,max] [--rows N]         # can the consumers keep up?
+#
+# Rows are read lazily from the segments (default) or flight_log.csv (run_id index), one
+# at a time, so a multi-hour run never sits in memory. FlightReplay hands each row to its
+# consumers at the row's recorded time divided by `speed` and measures how far behind schedule
+# it falls. ReplayDrone turns rows back into the state messages an olympe.Drone pushes
+# (GPS, altitude, battery, capacity and a flying state derived from altitude and speed), so
+# the normal capture path (TelemetryCollector -> FlightLogger / LivePublisher) runs against a
+# real flight profile. Commands sent to a ReplayDrone are rejected: it only plays back.
+import argparse
+import collections
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+import olympe
+from olympe.messages.ardrone3.PilotingState import AltitudeChanged, FlyingStateChanged, GpsLocationChanged
+from olympe.messages.battery import capacity
+
+from flight_index import open_index
+from flight_logger import FLIGHT_LOG_CSV, CsvLogWriter, FlightLogger
+from flight_sampling import _number, _seconds
+from flight_segments import FLIGHT_LOG_SEGMENTS_DIR, SegmentManifest, SegmentedLogWriter, iter_rows
+from flight_timing import LatencyHistogram
+from live_publisher import LivePublisher
+from sim_drone import SimEvent, SimExpectation, _message_name, _parse_expectation
+from telemetry import TelemetryCollector
+
+BatteryStateChanged = olympe.messages.common.CommonState.BatteryStateChanged
+
+LOG_RATE_HZ = 10.0  # capture rate at 1x; a replay at Nx captures at N times this rate
+MAX_RATE_HZ = 1000.0  # capture rate of a replay at full speed
+LOG_SEGMENTS = True  # --log writes into flight_log_segments/ (False: flight_log.csv)
+LAG_TOLERANCE_S = 0.1  # "kept up" = 99 % of rows delivered at most this late
+GROUND_ALTITUDE_M = 0.2  # below this above takeoff the replayed drone is "landed"
+MOVING_SPEED_MS = 0.5  # above this (over MOVING_WINDOW_S) it is "flying", otherwise "hovering"
+MOVING_WINDOW_S = 1.0  # long enough for GPS noise to average out
+_M_PER_DEG = math.pi / 180.0 * 6371008.8
+
+
+def iter_run(run_id, source="segments", path=None):
+    """Rows of one run in log order, streamed from the segment directory or flight_log.csv."""
+    if source == "csv":
+        return open_index(path or FLIGHT_LOG_CSV).read_run(run_id)
+    if source == "segments":
+        return iter_rows(path or FLIGHT_LOG_SEGMENTS_DIR, run_id=run_id)
+    raise ValueError(f"unknown source {source!r}")
+
+
+def list_runs(source="segments", path=None):
+    """[{run_id, rows, first_timestamp, last_timestamp}] of the log (rows: None for segments)."""
+    if source == "csv":
+        return [
+            {k: run[k] for k in ("run_id", "rows", "first_timestamp", "last_timestamp")}
+            for run in open_index(path or FLIGHT_LOG_CSV).runs()
+        ]
+    runs = {}
+    for entry in SegmentManifest(path or FLIGHT_LOG_SEGMENTS_DIR).snapshot():
+        for run_id in entry["run_ids"]:
+            run = runs.setdefault(run_id, {"run_id": run_id, "rows": None, "first_timestamp": entry["first_timestamp"],
+                                           "last_timestamp": entry["last_timestamp"]})
+            run["first_timestamp"] = min(run["first_timestamp"], entry["first_timestamp"])
+            run["last_timestamp"] = max(run["last_timestamp"] or "", entry["last_timestamp"] or "")
+    return list(runs.values())
+
+
+class FlightReplay:
+    """Hands rows (any iterable, consumed lazily) to consumers on their recorded timeline.
+
+    speed=1.0 replays in real time, 10 ten times faster, None as fast as the consumers
+    allow. run() calls every consumer(row) in turn for each row and returns a report: rows/s
+    reached, lag behind schedule (p50/p99/max, from a fixed-size histogram) and per consumer
+    the calls, errors, mean/max time per call and the share of wall time it took (busy_pct).
+    With `run_id` set, rows are handed over under that run_id.
+    """
+
+    def __init__(self, rows, speed=1.0, run_id=None):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be > 0 (None = as fast as possible)")
+        self.rows = rows
+        self.speed = speed
+        self.run_id = run_id
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, consumers):
+        lag = LatencyHistogram()
+        stats = {name: {"calls": 0, "errors": 0, "total": 0.0, "max": 0.0} for name in consumers}
+        rows, first, start, last = 0, None, None, None
+        for row in self.rows:
+            if self._stop.is_set():
+                break
+            t = _seconds(row["timestamp"])
+            now = time.monotonic()
+            if first is None:
+                first, start = t, now
+            if self.speed is not None:
+                due = start + (t - first) / self.speed
+                if due > now and self._stop.wait(due - now):
+                    break
+                lag.add(max(0.0, time.monotonic() - due))
+            if self.run_id is not None:
+                row = {**row, "run_id": self.run_id}
+            for name, consumer in consumers.items():
+                c = time.perf_counter()
+                try:
+                    consumer(row)
+                except Exception:
+                    stats[name]["errors"] += 1
+                elapsed = time.perf_counter() - c
+                s = stats[name]
+                s["calls"] += 1
+                s["total"] += elapsed
+                s["max"] = max(s["max"], elapsed)
+            rows += 1
+            last = t if last is None else max(last, t)
+        return self._report(rows, first, last, start, lag, stats)
+
+    def _report(self, rows, first, last, start, lag, stats):
+        wall = time.monotonic() - start if start is not None else 0.0
+        recorded = (last - first) if rows else 0.0
+        report = {
+            "speed": self.speed if self.speed is not None else "max",
+            "rows": rows,
+            "recorded_s": round(recorded, 3),
+            "wall_s": round(wall, 3),
+            "target_rows_per_s": round(rows * self.speed / recorded, 1) if self.speed and recorded else None,
+            "rows_per_s": round(rows / wall, 1) if wall else None,
+            "lag_s": None,
+            "kept_up": None,
+            "consumers": {},
+        }
+        if self.speed is not None and lag.n:
+            report["lag_s"] = {q: round(v, 4) for q, v in (
+                ("p50", lag.percentile(0.5)), ("p99", lag.percentile(0.99)), ("max", lag.max))}
+            report["kept_up"] = lag.percentile(0.99) <= LAG_TOLERANCE_S
+        for name, s in stats.items():
+            report["consumers"][name] = {
+                "calls": s["calls"],
+                "errors": s["errors"],
+                "mean_us": round(s["total"] / s["calls"] * 1e6, 2) if s["calls"] else None,
+                "max_us": round(s["max"] * 1e6, 2),
+                "busy_pct": round(100.0 * s["total"] / wall, 1) if wall else None,
+            }
+        return report
+
+
+class ReplayDrone:
+    """Stand-in for olympe.Drone that pushes the states of a logged run instead of flying.
+
+    With `rows`, connect() starts a FlightReplay of them at `speed` on a background thread
+    (`finished` is set and `report` filled when it ends). Rows can also be fed by hand with
+    push(row), e.g. as a FlightReplay consumer. get_state / subscribe / unsubscribe behave as
+    on olympe.Drone; drone(command) is always rejected.
+    """
+
+    def __init__(self, rows=None, speed=1.0, ip="replay"):
+        self.ip = ip
+        self.rows = rows
+        self.speed = speed
+        self.report = None
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self._states = {}
+        self._subscribers = {}
+        self._next_id = 0
+        self._replay = None
+        self._thread = None
+        self._trail = collections.deque()  # (t, north, east) over the last MOVING_WINDOW_S
+        self._origin = None
+        self._flying_state = None
+
+    # --- olympe.Drone surface -------------------------------------------------------------
+
+    def connect(self, retry=1, timeout=None, **kwargs):
+        if self.rows is not None and self._thread is None:
+            self.finished.clear()
+            self._replay = FlightReplay(self.rows, self.speed)
+            self._thread = threading.Thread(target=self._play, name="flight-replay", daemon=True)
+            self._thread.start()
+        return True
+
+    def disconnect(self, **kwargs):
+        if self._replay is not None:
+            self._replay.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        return True
+
+    def connection_state(self):
+        return self._thread is not None and not self.finished.is_set()
+
+    def get_state(self, message):
+        with self._lock:
+            args = self._states.get(_message_name(message))
+        if args is None:
+            raise RuntimeError(f"{_message_name(message)} state not available")
+        return dict(args)
+
+    def subscribe(self, callback, *args, **kwargs):
+        with self._lock:
+            self._next_id += 1
+            self._subscribers[self._next_id] = callback
+            return self._next_id
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    def __call__(self, expectation):
+        result = SimExpectation(_parse_expectation(expectation)[0], 0.0)
+        result._finish(False)  # a recording cannot be steered
+        return result
+
+    # --- playback ------------------------------------------------------------------------
+
+    def _play(self):
+        try:
+            self.report = self._replay.run({"drone": self.push})
+        finally:
+            self.finished.set()
+
+    def push(self, row):
+        """Deliver one logged row as the state messages the drone sent for it."""
+        events = self._events(row)
+        with self._lock:
+            for event in events:
+                self._states[_message_name(event.message)] = event.args
+            callbacks = list(self._subscribers.values())
+        for event in events:
+            for callback in callbacks:
+                try:
+                    callback(event, self)
+                except Exception:
+                    pass
+
+    def _events(self, row):
+        lat, lon, alt = _number(row.get("latitude")), _number(row.get("longitude")), _number(row.get("altitude_m"))
+        agl, pct = _number(row.get("altitude_above_takeoff_m")), _number(row.get("battery_pct"))
+        full, remaining = _number(row.get("battery_full_mah")), _number(row.get("battery_remaining_mah"))
+        events = []
+        if (lat is not None and lon is not None) or alt is not None:
+            fix = lat is not None and lon is not None
+            events.append(SimEvent(GpsLocationChanged, {
+                "latitude": lat if fix else 500.0, "longitude": lon if fix else 500.0,
+                "altitude": alt if alt is not None else 500.0,
+            }))
+        if agl is not None:
+            events.append(SimEvent(AltitudeChanged, {"altitude": agl}))
+        if pct is not None:
+            events.append(SimEvent(BatteryStateChanged, {"percent": pct}))
+        if full is not None and remaining is not None:
+            events.append(SimEvent(capacity, {"full_charge": int(full), "remaining": int(remaining)}))
+        state = self._derive_flying_state(_seconds(row["timestamp"]), lat, lon, agl)
+        if state is not None:
+            events.append(SimEvent(FlyingStateChanged, {"state": state}))
+        return events
+
+    def _derive_flying_state(self, t, lat, lon, agl):
+        """Flying state the log does not record: landed near the ground, else flying / hovering
+        by horizontal and vertical speed over the last MOVING_WINDOW_S."""
+        if agl is not None and agl < GROUND_ALTITUDE_M:
+            self._trail.clear()
+            self._flying_state = "landed"
+            return self._flying_state
+        if lat is None or lon is None or agl is None:
+            return self._flying_state
+        if self._origin is None:
+            self._origin = (lat, lon, math.cos(math.radians(lat)))
+        lat0, lon0, cos0 = self._origin
+        point = (t, (lat - lat0) * _M_PER_DEG, (lon - lon0) * _M_PER_DEG * cos0, agl)
+        self._trail.append(point)
+        while len(self._trail) > 2 and t - self._trail[1][0] >= MOVING_WINDOW_S:
+            self._trail.popleft()
+        t0, north0, east0, agl0 = self._trail[0]
+        if t - t0 >= MOVING_WINDOW_S / 2:
+            dt = t - t0
+            speed = math.hypot(math.hypot(point[1] - north0, point[2] - east0), agl - agl0) / dt
+            self._flying_state = "flying" if speed > MOVING_SPEED_MS else "hovering"
+        elif self._flying_state in (None, "landed"):
+            self._flying_state = "flying"  # just left the ground
+        return self._flying_state
+
+
+def replay(run_id, speed=1.0, source="segments", path=None, as_run_id=None, log=False, live_url=None, token=None):
+    """Fly `run_id` again through ReplayDrone -> TelemetryCollector -> FlightLogger / LivePublisher,
+    as run `as_run_id` (default <run_id>_replay). Row timestamps are replay time; the capture
+    rate scales with `speed`, so the replayed run has about as many rows as the original."""
+    as_run_id = as_run_id or f"{run_id}_replay"
+    drone = ReplayDrone(iter_run(run_id, source, path), speed)
+    logger = FlightLogger(writer=SegmentedLogWriter() if LOG_SEGMENTS else None) if log else None
+    live = LivePublisher(live_url, token) if live_url else None
+    captured = [0]
+
+    def sink(record):
+        captured[0] += 1
+        if logger is not None:
+            logger.log_record(record)
+        if live is not None:
+            live.publish(record)
+
+    rate_hz = min(LOG_RATE_HZ * speed, MAX_RATE_HZ) if speed is not None else MAX_RATE_HZ
+    collector = TelemetryCollector(drone, sink, as_run_id, rate_hz=rate_hz)
+    drone.connect()
+    collector.start()
+    collector.wait_ready(timeout=2.0)
+    sink(collector.snapshot("connected"))
+    try:
+        drone.finished.wait()
+    except KeyboardInterrupt:
+        drone.disconnect()
+        drone.finished.wait(2)
+    collector.stop()
+    sink(collector.snapshot("disconnected"))
+    drone.disconnect()
+    report = dict(drone.report or {}, run_id=as_run_id, captured_rows=captured[0])
+    if logger is not None:
+        logger.close(timeout=30)
+        report["logger_dropped"] = logger.dropped
+    if live is not None:
+        live.close(timeout=5)
+        report["live_sent"], report["live_failed"] = live.sent, live.failed
+    return report
+
+
+def bench(run_id, speeds=(1.0, 10.0, None), source="segments", path=None, rows=None, live_url=None, token=None):
+    """Replay the run's rows at each speed straight into the logging consumers; one report per speed.
+
+    Consumers: FlightLogger (CSV in a temporary directory), a ReplayDrone with a subscribed
+    TelemetryCollector, and LivePublisher if `live_url` is given. `rows` replays only the
+    first rows of the run. drain_s is how long the logger still needed after the last row.
+    """
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for speed in speeds:
+            logger = FlightLogger(writer=CsvLogWriter(os.path.join(tmp, f"replay_{speed or 'max'}.csv"), index=False))
+            drone = ReplayDrone()
+            collector = TelemetryCollector(drone, lambda record: None, f"{run_id}_bench", rate_hz=LOG_RATE_HZ).start()
+            consumers = {"logger": logger.log_record, "drone": drone.push}
+            live = None
+            if live_url:
+                live = LivePublisher(live_url, token)
+                consumers["live"] = live.publish
+            source_rows = iter_run(run_id, source, path)
+            if rows is not None:
+                source_rows = (row for _, row in zip(range(rows), source_rows))
+            report = FlightReplay(source_rows, speed, run_id=f"{run_id}_bench").run(consumers)
+            collector.stop()
+            t = time.monotonic()
+            logger.close()
+            report["drain_s"] = round(time.monotonic() - t, 3)
+            report["logger_dropped"] = logger.dropped
+            if live is not None:
+                live.close(timeout=5)
+                report["live_sent"], report["live_failed"] = live.sent, live.failed
+            reports.append(report)
+    return reports
+
+
+def _speed(text):
+    return None if text == "max" else float(text)
+
+
+def _print_report(report):
+    lag = report["lag_s"]
+    lag_text = f"lag p50 {lag['p50']} s p99 {lag['p99']} s max {lag['max']} s" if lag else "no schedule"
+    kept_up = {True: "kept up", False: "FELL BEHIND", None: ""}[report["kept_up"]]
+    target = f" / {report['target_rows_per_s']} target" if report["target_rows_per_s"] else ""
+    print(f"speed {report['speed']}: {report['rows']} rows ({report['recorded_s']} s recorded) in {report['wall_s']} s, "
+          f"{report['rows_per_s']} rows/s{target}, {lag_text} {kept_up}")
+    for name, c in report["consumers"].items():
+        print(f"  {name:8} {c['calls']:>9} calls  mean {c['mean_us']} us  max {c['max_us']} us  "
+              f"busy {c['busy_pct']} %  errors {c['errors']}")
+    extra = {k: v for k, v in report.items() if k in ("drain_s", "logger_dropped", "captured_rows", "live_sent", "live_failed")}
+    if extra:
+        print("  " + ", ".join(f"{k} {v}" for k, v in extra.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay logged runs through a drone stand-in.")
+    parser.add_argument("--source", choices=["segments", "csv"], default="segments")
+    parser.add_argument("--path", help="flight_log.csv or segment directory (default: the usual one)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    replay_cmd = sub.add_parser("replay")
+    replay_cmd.add_argument("run_id")
+    replay_cmd.add_argument("--speed", type=_speed, default=1.0, help="1 = real time, 10 = ten times faster, max")
+    replay_cmd.add_argument("--as", dest="as_run_id", help="run_id of the replayed run (default: <run_id>_replay)")
+    replay_cmd.add_argument("--log", action="store_true", help="log the replayed run like a flight")
+    replay_cmd.add_argument("--live", help="also publish to this live URL (.../telemetry/live/publish)")
+    bench_cmd = sub.add_parser("bench")
+    bench_cmd.add_argument("run_id")
+    bench_cmd.add_argument("--speeds", default="1,10,max", help="comma separated, e.g. 1,10,100,max")
+    bench_cmd.add_argument("--rows", type=int, help="only the first N rows of the run")
+    bench_cmd.add_argument("--live", help="also publish to this live URL")
+    bench_cmd.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    token = os.environ.get("ECODRONE_TOKEN")
+    if args.command == "list":
+        for run in list_runs(args.source, args.path):
+            rows = f"{run['rows']} rows" if run["rows"] is not None else ""
+            print(f"{run['run_id']}\t{rows}\t{run['first_timestamp']} .. {run['last_timestamp']}")
+    elif args.command == "replay":
+        report = replay(args.run_id, args.speed, args.source, args.path, args.as_run_id, args.log, args.live, token)
+        _print_report(report)
+    else:
+        speeds = [_speed(s) for s in args.speeds.split(",")]
+        reports = bench(args.run_id, speeds, args.source, args.path, args.rows, args.live, token)
+        if args.json:
+            print(json.dumps(reports, indent=2))
+        else:
+            for report in reports:
+                _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# flight_sampling.py – adaptive sampling and swinging-door / dead-band compression of telemetry rows
+#
+# Used through TelemetryCollector(..., sampler=AdaptiveSampler()). Two stages decide which of the
+# collector's snapshots are stored:
+#   1. Rate by flight state: every snapshot while the drone takes off, moves or lands and for
+#      TRANSITION_S after a flying-state or phase change; HOVER_HZ while hovering; IDLE_HZ on the ground.
+#   2. Compression of the sampled rows (RowCompressor): a row is only stored when a line between
+#      stored rows can no longer describe the rows in between within the tolerances (TOLERANCES).
+#
+# Worst-case error: rebuilding the sampled rows from the stored ones (linear interpolation in
+# time for "swinging_door", last stored value for "deadband", see reconstruct()) is off by at
+# most TOLERANCES[field] on every field and at most POSITION_TOLERANCE_M horizontally. Rows
+# skipped by stage 1 are not covered by this bound: while hovering / landed the log is a
+# HOVER_HZ / IDLE_HZ sampling. Flying-state and phase changes are always stored exactly, and
+# stored rows are never more than MAX_GAP_S apart.
+import bisect
+import math
+from datetime import datetime
+
+HOVER_HZ = 1.0
+IDLE_HZ = 0.2
+TRANSITION_S = 2.0  # full rate for this long after a flying-state or phase change
+MAX_GAP_S = 5.0  # store a row at least this often, even if nothing changed
+MOVING_STATES = ("takingoff", "flying", "landing", "emergency", "emergency_landing", "usertakeoff", "motor_ramping")
+
+POSITION_TOLERANCE_M = 1.0  # horizontal distance
+TOLERANCES = {
+    "altitude_m": 0.5,  # GPS altitude
+    "altitude_above_takeoff_m": 0.1,
+    "battery_pct": 1.0,
+    "battery_remaining_mah": 50.0,
+    "battery_full_mah": 0.0,
+}
+_M_PER_DEG = math.pi / 180.0 * 6371008.8
+
+
+def _seconds(timestamp):
+    """Row timestamp ("YYYY-MM-DD HH:MM:SS[.fff]", UTC) as seconds since the epoch."""
+    fmt = "%Y-%m-%d %H:%M:%S.%f" if "." in timestamp else "%Y-%m-%d %H:%M:%S"
+    return (datetime.strptime(timestamp, fmt) - datetime(1970, 1, 1)).total_seconds()
+
+
+def _number(value):
+    return None if value in ("", None) else float(value)
+
+
+class RowCompressor:
+    """Keeps the rows needed to rebuild a row stream within per-field tolerances.
+
+    mode="swinging_door": rows are rebuilt by linear interpolation between stored rows. For
+    every field the compressor keeps the range of slopes from the last stored row (the anchor)
+    that pass within the tolerance of every row since; a new row whose own slope falls outside
+    that range closes the door and the row before it is stored (so output lags by one row).
+    mode="deadband": a row is stored as soon as a field moved more than its tolerance from the
+    last stored row, which is then held until the next one.
+
+    Latitude/longitude are compared in metres (north/east of the first row), each axis with
+    POSITION_TOLERANCE_M / sqrt(2) so the horizontal error stays within POSITION_TOLERANCE_M.
+    A field appearing or disappearing always stores the row.
+    """
+
+    def __init__(self, tolerances=None, position_tolerance_m=POSITION_TOLERANCE_M, mode="swinging_door",
+                 max_gap_s=MAX_GAP_S):
+        if mode not in ("swinging_door", "deadband"):
+            raise ValueError(f"unknown compression mode {mode!r}")
+        self.mode = mode
+        self.max_gap_s = max_gap_s
+        self.tolerances = dict(TOLERANCES if tolerances is None else tolerances)
+        axis = position_tolerance_m / math.sqrt(2)
+        self.tolerances.update({"north_m": axis, "east_m": axis})
+        self._origin = None  # (lat, lon, cos lat) of the first row with a fix
+        self._anchor = None  # (t, values) of the last stored row
+        self._candidate = None  # (t, values, record) of the newest row not stored yet
+        self._slopes = {}  # field -> (lowest, highest) slope from the anchor that fits every row since
+
+    def _values(self, record):
+        values = {field: _number(record.get(field)) for field in self.tolerances if field not in ("north_m", "east_m")}
+        lat, lon = _number(record.get("latitude")), _number(record.get("longitude"))
+        if lat is None or lon is None:
+            values["north_m"] = values["east_m"] = None
+        else:
+            if self._origin is None:
+                self._origin = (lat, lon, math.cos(math.radians(lat)))
+            lat0, lon0, cos0 = self._origin
+            values["north_m"] = (lat - lat0) * _M_PER_DEG
+            values["east_m"] = (lon - lon0) * _M_PER_DEG * cos0
+        return values
+
+    def add(self, record, force=False):
+        """Feed the next row; returns the rows to store now (oldest first)."""
+        t, values = _seconds(record["timestamp"]), self._values(record)
+        if force or self._anchor is None:
+            return self._store_pending() + self._store(t, values, record)
+        t_anchor, anchor = self._anchor
+        if t <= t_anchor or (self._candidate is not None and t <= self._candidate[0]):
+            return []  # no newer state than a row we already have
+        if self.mode == "deadband":
+            if t - t_anchor >= self.max_gap_s or not self._within_band(anchor, values):
+                return self._store(t, values, record)
+            return []
+
+        stored = []
+        if self._candidate is not None and self._candidate[0] - t_anchor >= self.max_gap_s:
+            stored = self._store_pending()
+            t_anchor, anchor = self._anchor
+        slopes = self._fit(t - t_anchor, anchor, values, self._slopes)
+        if slopes is None:
+            # The door closed: the previous row is the last one the line from the anchor can reach
+            stored += self._store_pending()
+            t_anchor, anchor = self._anchor
+            slopes = self._fit(t - t_anchor, anchor, values, {})
+        if slopes is None:
+            # A field appeared or disappeared: this row starts a new line itself
+            return stored + self._store(t, values, record)
+        self._candidate, self._slopes = (t, values, record), slopes
+        return stored
+
+    def flush(self):
+        """Rows still held back (the pending candidate); call at the end of a run."""
+        return self._store_pending()
+
+    def _within_band(self, anchor, values):
+        for field, tolerance in self.tolerances.items():
+            a, v = anchor[field], values[field]
+            if (a is None) != (v is None) or (v is not None and abs(v - a) > tolerance):
+                return False
+        return True
+
+    def _fit(self, dt, anchor, values, slopes):
+        """Slope ranges including this row, or None if its own slope falls outside them."""
+        fitted = {}
+        for field, tolerance in self.tolerances.items():
+            a, v = anchor[field], values[field]
+            if (a is None) != (v is None):
+                return None
+            if v is None:
+                continue
+            low, high = slopes.get(field, (-math.inf, math.inf))
+            slope = (v - a) / dt
+            if not low <= slope <= high:
+                return None
+            fitted[field] = (max(low, (v - tolerance - a) / dt), min(high, (v + tolerance - a) / dt))
+        return fitted
+
+    def _store(self, t, values, record):
+        self._anchor, self._candidate, self._slopes = (t, values), None, {}
+        return [record]
+
+    def _store_pending(self):
+        if self._candidate is None:
+            return []
+        t, values, record = self._candidate
+        return self._store(t, values, record)
+
+
+class AdaptiveSampler:
+    """Chooses the sampling rate from the flying state and compresses what it samples.
+
+    offer(record, flying_state, now) takes every snapshot of a TelemetryCollector (`now` =
+    time.monotonic()) and returns the rows to store; flush() returns the row held back by the
+    compressor. offered / sampled / stored count snapshots seen, kept by the rate stage and
+    stored in the end.
+    """
+
+    def __init__(self, hover_hz=HOVER_HZ, idle_hz=IDLE_HZ, transition_s=TRANSITION_S, **compression):
+        self.hover_hz = hover_hz
+        self.idle_hz = idle_hz
+        self.transition_s = transition_s
+        self.compressor = RowCompressor(**compression)
+        self.offered = 0
+        self.sampled = 0
+        self.stored = 0
+        self._last_sample = None
+        self._fast_until = 0.0
+        self._state = None
+        self._phase = None
+
+    def offer(self, record, flying_state, now):
+        self.offered += 1
+        changed = self.offered > 1 and (flying_state != self._state or record.get("phase") != self._phase)
+        self._state, self._phase = flying_state, record.get("phase")
+        if changed:
+            self._fast_until = now + self.transition_s
+        elif flying_state not in MOVING_STATES and now >= self._fast_until and self._last_sample is not None:
+            rate = self.hover_hz if flying_state == "hovering" else self.idle_hz
+            if now - self._last_sample < 1.0 / rate:
+                return []
+        self._last_sample = now
+        self.sampled += 1
+        rows = self.compressor.add(record, force=changed)
+        self.stored += len(rows)
+        return rows
+
+    def flush(self):
+        rows = self.compressor.flush()
+        self.stored += len(rows)
+        return rows
+
+
+def _stored_points(stored, mode):
+    compressor = RowCompressor(mode=mode)
+    return compressor, [(_seconds(row["timestamp"]), compressor._values(row)) for row in stored]
+
+
+def _rebuild(points, times, t, mode):
+    after = min(bisect.bisect_left(times, t), len(points) - 1)
+    t1, v1 = points[after]
+    if t >= t1 or after == 0:
+        return v1
+    t0, v0 = points[after - 1]
+    if mode == "deadband":
+        return v0
+    w = (t - t0) / (t1 - t0)
+    return {f: None if v0[f] is None or v1[f] is None else v0[f] + w * (v1[f] - v0[f]) for f in v0}
+
+
+def reconstruct(stored, timestamp, mode="swinging_door"):
+    """Compressed fields at `timestamp` rebuilt from the stored rows (time order); latitude /
+    longitude as north_m / east_m of the first stored row with a fix."""
+    _, points = _stored_points(stored, mode)
+    return dict(_rebuild(points, [t for t, _ in points], _seconds(timestamp), mode))
+
+
+def max_errors(rows, stored, mode="swinging_door"):
+    """Largest difference per field between `rows` and their reconstruction from `stored`;
+    "position_m" is the horizontal distance."""
+    compressor, points = _stored_points(stored, mode)
+    times = [t for t, _ in points]
+    errors = {field: 0.0 for field in TOLERANCES}
+    errors["position_m"] = 0.0
+    for row in rows:
+        actual = compressor._values(row)
+        rebuilt = _rebuild(points, times, _seconds(row["timestamp"]), mode)
+        for field in TOLERANCES:
+            if actual[field] is not None and rebuilt[field] is not None:
+                errors[field] = max(errors[field], abs(actual[field] - rebuilt[field]))
+        if actual["north_m"] is not None and rebuilt["north_m"] is not None:
+            distance = math.hypot(actual["north_m"] - rebuilt["north_m"], actual["east_m"] - rebuilt["east_m"])
+            errors["position_m"] = max(errors["position_m"], distance)
+    return errors
@@ -0,0 +1,493 @@
+# flight_segments.py – flight log as rotated, compressed segment files with a manifest
+#
+# Layout of a segment directory:
+#   manifest.json                   one entry per segment: rows, run_ids, first/last timestamp, size
+#   manifest.lock                   flock'ed while the manifest is read, changed and saved
+#   segments.lock                   flock'ed by the SegmentedLogWriter for as long as it is open
+#   seg_000000.csv                  segment being written (plain CSV, CSV_HEADERS)
+#   seg_000001.csv.gz               closed segments, compressed in the background
+#
+# A segment is closed when every run it contains has logged "disconnected" and a new run
+# starts (so one flight = one segment), or when it reaches max_bytes. Once the directory
+# exceeds max_total_bytes, the oldest closed segments that were exported or synced are deleted;
+# a segment that is the only copy of its rows is never deleted.
+# Only one SegmentedLogWriter can use a directory at a time (a second one gets SegmentsLocked);
+# readers and export_segments can run alongside it.
+#
+#   python flight_segments.py list                  # segments in the manifest
+#   python flight_segments.py cat [--run RUN_ID]    # rows of all segments, in time order
+#   python flight_segments.py import [flight_log.csv]
+#   python flight_segments.py export DEST_DIR       # copy closed segments (e.g. to a USB drive / NAS)
+import argparse
+import csv
+import fcntl
+import gzip
+import heapq
+import io
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+
+from flight_logger import CSV_HEADERS, FLIGHT_LOG_CSV, LOG_DIR
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is always available
+    zstandard = None
+
+FLIGHT_LOG_SEGMENTS_DIR = os.path.join(LOG_DIR, "flight_log_segments")
+MANIFEST = "manifest.json"
+MANIFEST_LOCK = "manifest.lock"
+WRITER_LOCK = "segments.lock"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+SEGMENTS_MAX_TOTAL_BYTES = 1024 * 1024 * 1024
+SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+END_PHASE = "disconnected"
+
+
+class SegmentsLocked(RuntimeError):
+    """Another SegmentedLogWriter (in this or another process) is writing to the directory."""
+
+
+def _open_segment(path):
+    """Text stream over a segment, decompressing on the fly (never all in memory)."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path}: install 'zstandard' to read zstd segments")
+        raw = open(path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding="utf-8", newline="")
+    return open(path, newline="", encoding="utf-8")
+
+
+def _compress(src, compression):
+    """src -> src + suffix (written to a .tmp first). Returns the new path."""
+    dst = src + SUFFIXES[compression]
+    tmp = dst + ".tmp"
+    with open(src, "rb") as fin:
+        if compression == "zstd":
+            with open(tmp, "wb") as fout:
+                zstandard.ZstdCompressor(level=10).copy_stream(fin, fout)
+        else:
+            with gzip.open(tmp, "wb", compresslevel=6) as fout:
+                while True:
+                    block = fin.read(1 << 20)
+                    if not block:
+                        break
+                    fout.write(block)
+    os.replace(tmp, dst)
+    os.remove(src)
+    return dst
+
+
+class SegmentManifest:
+    """manifest.json of a segment directory.
+
+    Every change re-reads the file and is saved atomically under an flock on manifest.lock, so
+    the writer, export_segments and other readers never overwrite each other's changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST)
+        self._lock = threading.Lock()
+        self.segments = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f).get("segments", [])
+        except FileNotFoundError:
+            return []
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": self.segments}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def _update(self, change):
+        with self._lock, open(os.path.join(self.directory, MANIFEST_LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file is closed
+            self.segments = change(self._load())
+            self._save()
+
+    def get(self, name):
+        with self._lock:
+            self.segments = self._load()
+            for entry in self.segments:
+                if entry["name"] == name:
+                    return dict(entry)
+        return None
+
+    def put(self, entry):
+        """Adds or updates an entry; keys the caller does not set (e.g. "exported") are kept."""
+        def change(segments):
+            for i, existing in enumerate(segments):
+                if existing["name"] == entry["name"]:
+                    segments[i] = {**existing, **entry}
+                    break
+            else:
+                segments.append(entry)
+            return segments
+        self._update(change)
+
+    def remove(self, name):
+        self._update(lambda segments: [e for e in segments if e["name"] != name])
+
+    def snapshot(self):
+        with self._lock:
+            self.segments = self._load()
+            return [dict(e) for e in self.segments]
+
+
+def _scan(path):
+    """Manifest entry fields from a segment's rows (used to recover segments after a crash)."""
+    rows, runs, first, last = 0, [], None, None
+    with _open_segment(path) as f:
+        for record in csv.DictReader(f):
+            rows += 1
+            ts = record.get("timestamp") or ""
+            if ts:
+                first = ts if first is None else min(first, ts)
+                last = ts if last is None else max(last, ts)
+            if record.get("run_id") and record["run_id"] not in runs:
+                runs.append(record["run_id"])
+    return {"rows": rows, "run_ids": runs, "first_timestamp": first, "last_timestamp": last}
+
+
+def _copy_entry(entry):
+    # The writer keeps appending to its run_ids list; the manifest gets its own copy
+    return {**entry, "run_ids": list(entry["run_ids"])}
+
+
+class SegmentedLogWriter:
+    """FlightLogger storage backend (writerow/flush/close) writing rotated, compressed segments.
+
+    Use as FlightLogger(writer=SegmentedLogWriter()). Compression and retention run on a
+    background thread, so the logger's writer thread only ever appends to a plain file.
+    Retention only deletes segments that were exported (export_segments) or whose runs
+    `is_synced(run_ids)` reports as uploaded (e.g. flight_spool.runs_synced). The writer holds
+    an flock on segments.lock until close(); raises SegmentsLocked if another writer has it.
+    """
+
+    def __init__(self, directory=None, max_bytes=SEGMENT_MAX_BYTES, max_total_bytes=SEGMENTS_MAX_TOTAL_BYTES,
+                 compression="gzip", is_synced=None):
+        if compression not in SUFFIXES:
+            raise ValueError(f"Unknown compression {compression!r} (use None, 'gzip' or 'zstd')")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package")
+        self.directory = directory or FLIGHT_LOG_SEGMENTS_DIR
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.compression = compression
+        self.is_synced = is_synced
+        self.retained_bytes = 0  # over max_total_bytes but neither exported nor synced
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, WRITER_LOCK), "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise SegmentsLocked(f"{self.directory} is in use by another segment writer") from None
+        self.manifest = SegmentManifest(self.directory)
+        self._jobs = queue.Queue()
+        self._worker = threading.Thread(target=self._background_loop, name="segment-compressor", daemon=True)
+        self._worker.start()
+        self._file = None
+        self._buf = None
+        self._bytes = 0
+        self._entry = None
+        self._writer = None
+        self._open_runs = set()  # runs in the current segment that have not logged END_PHASE
+        self._recover()
+
+    # --- writing ---------------------------------------------------------------------------
+
+    def writerow(self, record):
+        run_id = record.get("run_id", "")
+        if self._file is not None and (
+            self._bytes >= self.max_bytes
+            or (run_id not in self._entry["run_ids"] and not self._open_runs)
+        ):
+            self._close_segment()
+        if self._file is None:
+            self._open_segment()
+        self._write(self._writer.writerow, record)
+        entry = self._entry
+        entry["rows"] += 1
+        ts = record.get("timestamp") or ""
+        if ts:
+            if entry["first_timestamp"] is None or ts < entry["first_timestamp"]:
+                entry["first_timestamp"] = ts
+            if entry["last_timestamp"] is None or ts > entry["last_timestamp"]:
+                entry["last_timestamp"] = ts
+        if run_id not in entry["run_ids"]:
+            entry["run_ids"].append(run_id)
+        if record.get("phase") == END_PHASE:
+            self._open_runs.discard(run_id)
+        else:
+            self._open_runs.add(run_id)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+            self._entry["bytes"] = self._bytes
+            self.manifest.put(_copy_entry(self._entry))
+
+    def close(self, timeout=60):
+        """Close the current segment and wait for pending compression (at most `timeout` s)."""
+        if self._file is not None:
+            self._close_segment()
+        self._jobs.put(None)
+        self._worker.join(timeout)
+        if not self._worker.is_alive() and not self._lock_file.closed:
+            # A compression still running keeps the directory locked until the process exits
+            self._lock_file.close()
+
+    def _open_segment(self):
+        existing = [e["name"] for e in self.manifest.snapshot()]
+        numbers = [int(name[4:10]) for name in existing if name.startswith("seg_")]
+        number = max(numbers) + 1 if numbers else 0
+        while True:
+            name = "seg_%06d.csv" % number
+            try:
+                # Binary file + StringIO formatting, like CsvLogWriter, so the size is known without tell()
+                # "xb": never truncate a segment file the manifest does not know (yet)
+                self._file = open(os.path.join(self.directory, name), "xb")
+                break
+            except FileExistsError:
+                number += 1
+        self._bytes = 0
+        self._buf = io.StringIO()
+        self._writer = csv.DictWriter(self._buf, fieldnames=CSV_HEADERS)
+        self._write(self._writer.writeheader)
+        self._entry = {
+            "name": name, "file": name, "closed": False, "compression": None,
+            "rows": 0, "run_ids": [], "first_timestamp": None, "last_timestamp": None, "bytes": 0,
+        }
+        self._open_runs = set()
+        self.manifest.put(_copy_entry(self._entry))
+
+    def _write(self, write, *args):
+        self._buf.seek(0)
+        self._buf.truncate()
+        write(*args)
+        data = self._buf.getvalue().encode("utf-8")
+        self._file.write(data)
+        self._bytes += len(data)
+
+    def _close_segment(self):
+        self._file.close()
+        entry = self._entry
+        entry["closed"] = True
+        entry["bytes"] = self._bytes
+        self.manifest.put(_copy_entry(entry))
+        self._file = self._writer = self._buf = self._entry = None
+        self._jobs.put(entry["name"])
+
+    # --- background: compression + retention ----------------------------------------------
+
+    def _background_loop(self):
+        while True:
+            name = self._jobs.get()
+            if name is None:
+                return
+            try:
+                self._compress_segment(name)
+                self._enforce_retention()
+            except Exception as e:
+                print(f"flight_segments: {name}: {e}", file=sys.stderr)
+
+    def _compress_segment(self, name):
+        entry = self.manifest.get(name)
+        if entry is None or not self.compression or entry["compression"]:
+            return
+        path = _compress(os.path.join(self.directory, entry["file"]), self.compression)
+        entry.update(file=os.path.basename(path), compression=self.compression, bytes=os.path.getsize(path))
+        self.manifest.put(entry)
+
+    def _enforce_retention(self):
+        if not self.max_total_bytes:
+            return
+        entries = self.manifest.snapshot()
+        total = sum(e["bytes"] for e in entries)
+        for entry in entries:  # oldest first
+            if total <= self.max_total_bytes:
+                break
+            if not entry["closed"] or not self._deletable(entry):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except FileNotFoundError:
+                pass
+            self.manifest.remove(entry["name"])
+            total -= entry["bytes"]
+        retained = max(0, total - self.max_total_bytes)
+        if retained and not self.retained_bytes:
+            print(f"flight_segments: {self.directory} is {retained} B over its limit with segments that were "
+                  "neither exported nor synced; keeping them (export or sync to free space)", file=sys.stderr)
+        self.retained_bytes = retained
+
+    def _deletable(self, entry):
+        if entry.get("exported"):
+            return True
+        try:
+            return self.is_synced is not None and bool(self.is_synced(entry["run_ids"]))
+        except Exception as e:
+            print(f"flight_segments: sync check for {entry['name']}: {e}", file=sys.stderr)
+            return False
+
+    def _recover(self):
+        """Close segments left open by a crash, requeue uncompressed ones, index unknown files.
+
+        Safe because the writer lock is held: no other writer has a segment open."""
+        known = {e["name"] for e in self.manifest.snapshot()}
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.startswith("seg_") and filename.endswith(".tmp"):  # interrupted compression
+                os.remove(os.path.join(self.directory, filename))
+            elif filename.startswith("seg_") and filename[:10] + ".csv" not in known:
+                entry = {"name": filename[:10] + ".csv", "file": filename, "closed": True,
+                         "compression": next((c for c, s in SUFFIXES.items() if s and filename.endswith(s)), None),
+                         "bytes": os.path.getsize(os.path.join(self.directory, filename)),
+                         **_scan(os.path.join(self.directory, filename))}
+                self.manifest.put(entry)
+        for entry in self.manifest.snapshot():
+            path = os.path.join(self.directory, entry["file"])
+            if not os.path.exists(path):
+                self.manifest.remove(entry["name"])
+                continue
+            if not entry["closed"]:
+                entry.update(closed=True, bytes=os.path.getsize(path), **_scan(path))
+                self.manifest.put(entry)
+            if not entry["compression"]:
+                self._jobs.put(entry["name"])
+
+
+# --- reading -------------------------------------------------------------------------------
+
+def _segment_rows(path):
+    with _open_segment(path) as f:
+        yield from csv.DictReader(f)
+
+
+def _overlap_groups(entries):
+    """Split segments (sorted by first timestamp) into groups whose time ranges overlap."""
+    group, group_end = [], None
+    for entry in entries:
+        if group and entry["first_timestamp"] > group_end:
+            yield group
+            group, group_end = [], None
+        group.append(entry)
+        last = entry["last_timestamp"] or entry["first_timestamp"]
+        group_end = last if group_end is None else max(group_end, last)
+    if group:
+        yield group
+
+
+def iter_rows(directory=None, run_id=None, start=None, end=None, run_ids=None):
+    """Yield rows (dicts) of every segment in timestamp order, streaming.
+
+    Segments are decompressed incrementally; only segments whose time ranges overlap are open
+    at the same time (merged by timestamp). `start` / `end` are timestamp strings
+    ("YYYY-MM-DD HH:MM:SS"), `run_id` keeps only that run and `run_ids` only those runs; all
+    of them skip whole segments using the manifest. Rows inside a segment keep their write order.
+    """
+    directory = directory or FLIGHT_LOG_SEGMENTS_DIR
+    if run_id is not None:
+        run_ids = {run_id}
+    elif run_ids is not None:
+        run_ids = set(run_ids)
+    entries = [
+        e for e in SegmentManifest(directory).snapshot()
+        if e["rows"] and e["first_timestamp"]
+        and (run_ids is None or not run_ids.isdisjoint(e["run_ids"]))
+        and (start is None or (e["last_timestamp"] or "") >= start)
+        and (end is None or e["first_timestamp"] <= end)
+    ]
+    entries.sort(key=lambda e: e["first_timestamp"])
+    for group in _overlap_groups(entries):
+        streams = [_segment_rows(os.path.join(directory, e["file"])) for e in group]
+        rows = streams[0] if len(streams) == 1 else heapq.merge(*streams, key=lambda r: r["timestamp"])
+        for row in rows:
+            if run_ids is not None and row["run_id"] not in run_ids:
+                continue
+            if start is not None and row["timestamp"] < start:
+                continue
+            if end is not None and row["timestamp"] > end:
+                continue
+            yield row
+
+
+def import_csv(csv_path=None, directory=None, **writer_kwargs):
+    """Move an existing flat CSV log into segments (one per run). Returns the row count."""
+    writer = SegmentedLogWriter(directory, **writer_kwargs)
+    rows = 0
+    try:
+        with open(csv_path or FLIGHT_LOG_CSV, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                writer.writerow(record)
+                rows += 1
+    finally:
+        writer.close()
+    return rows
+
+
+def export_segments(dest, directory=None):
+    """Copies closed segments not exported yet into `dest` and marks them exported, which lets
+    retention delete them. Returns the names copied."""
+    manifest = SegmentManifest(directory or FLIGHT_LOG_SEGMENTS_DIR)
+    os.makedirs(dest, exist_ok=True)
+    copied = []
+    for entry in manifest.snapshot():
+        if not entry["closed"] or entry.get("exported"):
+            continue
+        src = os.path.join(manifest.directory, entry["file"])
+        if not os.path.exists(src):
+            continue  # compressed or deleted meanwhile; picked up by the next export
+        tmp = os.path.join(dest, entry["file"] + ".tmp")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, os.path.join(dest, entry["file"]))
+        current = manifest.get(entry["name"])
+        if current is not None and current["file"] == entry["file"]:
+            manifest.put({**current, "exported": True})
+            copied.append(entry["name"])
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmented flight log tools.")
+    parser.add_argument("--dir", default=FLIGHT_LOG_SEGMENTS_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    cat = sub.add_parser("cat")
+    cat.add_argument("--run")
+    cat.add_argument("--start")
+    cat.add_argument("--end")
+    imp = sub.add_parser("import")
+    imp.add_argument("csv", nargs="?", default=FLIGHT_LOG_CSV)
+    exp = sub.add_parser("export")
+    exp.add_argument("dest")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for e in SegmentManifest(args.dir).snapshot():
+            print(f"{e['file']:<22} {e['rows']:>8} rows  {e['bytes']:>10} B  "
+                  f"{e['first_timestamp']} .. {e['last_timestamp']}  {','.join(e['run_ids'])}")
+    elif args.command == "cat":
+        writer = csv.DictWriter(sys.stdout, fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        for row in iter_rows(args.dir, args.run, args.start, args.end):
+            writer.writerow(row)
+    elif args.command == "import":
+        print(f"Imported {import_csv(args.csv, args.dir)} rows into {args.dir}")
+    elif args.command == "export":
+        print(f"Exported {len(export_segments(args.dest, args.dir))} segments to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# flight_spool.py – offline spool of flight rows (SQLite, WAL) and the agent that syncs it to the backend
+#
+#   python flight_spool.py status
+#   python flight_spool.py sync --url http://<backend>/telemetry/upload          # runs until Ctrl+C
+#   python flight_spool.py sync --url http://<backend>/telemetry/upload --once   # send what is there, exit
+#   python flight_spool.py rejected > rejected.ndjson                            # rows the backend refused
+#
+# The FlightLogger writes every row into flight_spool.sqlite3 (SpoolLogWriter) next to the
+# usual local log. SyncAgent uploads the rows after its cursor in gzip'ed NDJSON batches
+# to /telemetry/upload and moves the cursor only once the backend has answered, so an
+# interrupted sync resumes where it stopped. A batch that was stored but not acknowledged
+# is sent again and skipped by the backend (uploads are idempotent), so every row ends up
+# stored exactly once. Both sides have their own SQLite connection and WAL lets them work
+# at the same time: syncing never holds up the logger.
+# The token is renewed through backend_auth.BackendAuth. A 401/403 that cannot be fixed by
+# logging in again stops the agent (`auth_error`) instead of retrying forever. A 413 halves
+# the batch and sends it again. Rows the backend refuses (a 400 batch, or the row errors of
+# an accepted one) are copied into the spool_rejected table before the cursor moves past
+# them, and their runs never count as synced, so the local log of those runs is kept.
+import argparse
+import gzip
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from backend_auth import AuthError, BackendAuth
+from flight_logger import LOG_DIR
+
+FLIGHT_SPOOL_DB = os.path.join(LOG_DIR, "flight_spool.sqlite3")
+SYNC_BATCH_ROWS = 20000
+SYNC_TIMEOUT = 60
+REJECTED = 400  # the batch itself is refused: resending it cannot help
+TOO_LARGE = 413  # usually a proxy body limit: the same rows in smaller batches get through
+AUTH_ERRORS = (401, 403)  # the token is refused: retried only after logging in again
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,  -- AUTOINCREMENT: ids are never reused after a purge
+    run_id TEXT,
+    row TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_cursor (
+    target TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS spool_rejected (
+    id INTEGER NOT NULL,  -- the row's spool id
+    target TEXT NOT NULL,
+    run_id TEXT,
+    row TEXT NOT NULL,
+    error TEXT,
+    rejected_at TEXT,
+    PRIMARY KEY (id, target)
+);
+CREATE INDEX IF NOT EXISTS spool_rejected_run ON spool_rejected (run_id);
+"""
+
+
+def open_spool(path=None):
+    """Connection to the spool (created if missing), WAL mode."""
+    db = sqlite3.connect(path or FLIGHT_SPOOL_DB, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL: commits do not fsync, a power cut loses at most the last few commits
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(_SCHEMA)
+    return db
+
+
+class SpoolLogWriter:
+    """Storage backend for FlightLogger: rows go into the spool and, if given, to `archive`.
+
+    `archive` is the permanent local log (CsvLogWriter, SegmentedLogWriter, ...); the spool
+    only holds rows until they are synced. Rows are inserted in one transaction per flush.
+    """
+
+    def __init__(self, path=None, archive=None):
+        self.path = path or FLIGHT_SPOOL_DB
+        self._archive = archive
+        self._db = None  # opened on the logger's writer thread (sqlite3 connections are per thread)
+        self._pending = []
+
+    def writerow(self, record):
+        if self._archive is not None:
+            self._archive.writerow(record)
+        self._pending.append((record.get("run_id"), json.dumps(record)))
+
+    def flush(self):
+        if self._archive is not None:
+            self._archive.flush()
+        if self._pending:
+            if self._db is None:
+                self._db = open_spool(self.path)
+            with self._db:
+                self._db.executemany("INSERT INTO spool (run_id, row) VALUES (?, ?)", self._pending)
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._archive is not None:
+            self._archive.close()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def spool_status(path=None):
+    db = open_spool(path)
+    try:
+        total, first, last = db.execute("SELECT COUNT(*), MIN(id), MAX(id) FROM spool").fetchone()
+        cursors = db.execute("SELECT target, last_id, updated_at FROM sync_cursor ORDER BY target").fetchall()
+        rejected = db.execute("SELECT COUNT(*) FROM spool_rejected").fetchone()[0]
+        status = {"rows": total, "first_id": first, "last_id": last, "rejected": rejected, "targets": []}
+        for target, last_id, updated_at in cursors:
+            pending = db.execute("SELECT COUNT(*) FROM spool WHERE id > ?", (last_id,)).fetchone()[0]
+            status["targets"].append({"url": target, "cursor": last_id, "pending": pending, "updated_at": updated_at})
+        return status
+    finally:
+        db.close()
+
+
+def runs_synced(run_ids, path=None):
+    """True once every spooled row of `run_ids` was stored by every sync target (False while
+    no sync ever ran, and for runs with rows the backend refused)."""
+    db = open_spool(path)
+    try:
+        low = db.execute("SELECT MIN(last_id) FROM sync_cursor").fetchone()[0]
+        if low is None:
+            return False
+        marks = ",".join("?" * len(run_ids))
+        pending = db.execute(
+            f"SELECT 1 FROM spool WHERE id > ? AND run_id IN ({marks}) "
+            f"UNION ALL SELECT 1 FROM spool_rejected WHERE run_id IN ({marks}) LIMIT 1",
+            (low, *run_ids, *run_ids),
+        ).fetchone()
+        return pending is None
+    finally:
+        db.close()
+
+
+def rejected_rows(path=None):
+    """(id, target, run_id, row, error) of every row the backend refused, by spool id."""
+    db = open_spool(path)
+    try:
+        return db.execute("SELECT id, target, run_id, row, error FROM spool_rejected ORDER BY id, target").fetchall()
+    finally:
+        db.close()
+
+
+class SyncAgent:
+    """Uploads spooled rows to `url` on a background thread, retrying with exponential backoff.
+
+    sent / rejected count rows acknowledged by the backend (rejected = refused as invalid,
+    kept in the spool_rejected table); failures counts consecutive failed attempts, last_error
+    describes the latest one. auth_error is set (and the thread stops) once the backend
+    refuses a token that cannot be renewed. batch_rows is halved for every 413. With
+    keep_sent=False, rows every cursor has passed are deleted from the spool.
+    """
+
+    def __init__(self, url, token=None, path=None, batch_rows=SYNC_BATCH_ROWS, poll_interval=5.0,
+                 min_backoff=1.0, max_backoff=300.0, keep_sent=False, auth=None):
+        self.url = url
+        self.auth = auth or BackendAuth.from_env(url, token)
+        self.path = path or FLIGHT_SPOOL_DB
+        self.batch_rows = batch_rows
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.keep_sent = keep_sent
+        self.sent = 0
+        self.rejected = 0
+        self.failures = 0
+        self.last_error = None
+        self.auth_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="spool-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sync_once(self):
+        """Sends every pending batch; returns the rows sent. Raises on a failed attempt
+        (AuthError if the token is refused and cannot be renewed)."""
+        db = open_spool(self.path)
+        try:
+            total = 0
+            while not self._stop.is_set():
+                count = self._send_batch(db)
+                if not count:
+                    break
+                total += count
+            return total
+        finally:
+            db.close()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except AuthError as e:
+                self.auth_error = self.last_error = str(e)
+                print(f"flight_spool: {e}; sync stopped (set ECODRONE_EMAIL / ECODRONE_PASSWORD "
+                      "to renew the token)", file=sys.stderr)
+                return
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._stop.wait(self._backoff(e))
+                continue
+            self.failures = 0
+            self._stop.wait(self.poll_interval)
+
+    def _backoff(self, error):
+        retry_after = getattr(error, "headers", None) and error.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        delay = min(self.max_backoff, self.min_backoff * 2 ** (self.failures - 1))
+        return delay * random.uniform(0.5, 1.0)  # jitter: a fleet of stations does not retry in step
+
+    def _cursor(self, db):
+        row = db.execute("SELECT last_id FROM sync_cursor WHERE target = ?", (self.url,)).fetchone()
+        return row[0] if row else 0
+
+    def _send_batch(self, db):
+        cursor = self._cursor(db)
+        while True:
+            rows = db.execute(
+                "SELECT id, run_id, row FROM spool WHERE id > ? ORDER BY id LIMIT ?", (cursor, self.batch_rows)
+            ).fetchall()
+            if not rows:
+                return 0
+            try:
+                summary = self._post(rows)
+                break
+            except urllib.error.HTTPError as e:
+                if e.code in AUTH_ERRORS and not self.auth.refused():
+                    raise AuthError(f"HTTP {e.code}: token refused or expired") from e
+                if e.code == TOO_LARGE and len(rows) > 1:
+                    self.batch_rows = len(rows) // 2
+                    continue
+                if e.code not in (REJECTED, TOO_LARGE):
+                    raise
+                error = f"HTTP {e.code}: {_read_error(e)}"
+                refused = [(row, error) for row in rows]
+                self.last_error = f"HTTP {e.code}: batch {rows[0][0]}..{rows[-1][0]} rejected"
+                summary = None
+                break
+        if summary is not None:
+            # Rows the backend could not store (line numbers are 1-based positions in the batch)
+            refused = [
+                (rows[e["line"] - 1], e.get("error"))
+                for e in summary.get("errors", [])
+                if isinstance(e.get("line"), int) and 1 <= e["line"] <= len(rows)
+            ]
+            self.sent += len(rows) - len(refused)
+        self.rejected += len(refused)
+        self._advance(db, rows[-1][0], refused)
+        return len(rows)
+
+    def _post(self, rows):
+        """POSTs the rows as one gzip'ed NDJSON batch; returns the backend's summary."""
+        body = gzip.compress(("\n".join(row for _, _, row in rows) + "\n").encode("utf-8"), compresslevel=6)
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        authorization = self.auth.header()
+        if authorization:
+            headers["Authorization"] = authorization
+        request = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=SYNC_TIMEOUT) as response:
+            answer = response.read()
+        try:
+            summary = json.loads(answer)
+        except ValueError:
+            return {}
+        return summary if isinstance(summary, dict) else {}
+
+    def _advance(self, db, last_id, refused=()):
+        """Moves the cursor past last_id; `refused` [((id, run_id, row), error)] are kept in
+        spool_rejected, in the same transaction, before the purge can delete them."""
+        now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO spool_rejected (id, target, run_id, row, error, rejected_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(row_id, self.url, run_id, row, error, now) for (row_id, run_id, row), error in refused],
+            )
+            db.execute(
+                "INSERT INTO sync_cursor (target, last_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(target) DO UPDATE SET last_id = excluded.last_id, updated_at = excluded.updated_at",
+                (self.url, last_id, now),
+            )
+            if not self.keep_sent:
+                db.execute("DELETE FROM spool WHERE id <= (SELECT MIN(last_id) FROM sync_cursor)")
+
+
+def _read_error(error):
+    try:
+        return error.read().decode("utf-8", "replace")[:1000]
+    except Exception:
+        return error.reason
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flight row spool and backend sync.")
+    parser.add_argument("--db", default=FLIGHT_SPOOL_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    sub.add_parser("rejected", help="print the rows the backend refused (NDJSON)")
+    sync = sub.add_parser("sync")
+    sync.add_argument("--url", required=True, help="backend upload URL, e.g. http://<backend>/telemetry/upload")
+    sync.add_argument("--token", default=os.environ.get("ECODRONE_TOKEN"), help="JWT (default: $ECODRONE_TOKEN)")
+    sync.add_argument("--once", action="store_true", help="send what is pending and exit")
+    sync.add_argument("--keep-sent", action="store_true", help="keep synced rows in the spool")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(spool_status(args.db), indent=2))
+        return
+    if args.command == "rejected":
+        for row_id, target, run_id, row, error in rejected_rows(args.db):
+            print(json.dumps({"id": row_id, "target": target, "error": error, "row": json.loads(row)}))
+        return
+    agent = SyncAgent(args.url, args.token, args.db, keep_sent=args.keep_sent)
+    if args.once:
+        try:
+            sent = agent.sync_once()
+        except AuthError as e:
+            sys.exit(f"Sync stopped: {e}")
+        print(f"Sent {sent} rows ({agent.rejected} rejected, see: flight_spool.py rejected)")
+        return
+    agent.start()
+    try:
+        while True:
+            time.sleep(10)
+            if agent.auth_error:
+                sys.exit(f"Sync stopped: {agent.auth_error}")
+            state = f"retrying ({agent.last_error})" if agent.failures else "ok"
+            print(f"sent {agent.sent}, rejected {agent.rejected}, {state}", flush=True)
+    except KeyboardInterrupt:
+        agent.stop(timeout=SYNC_TIMEOUT)
+
+
+if __name__ == "__main__":
+    main()
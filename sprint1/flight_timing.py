@@ -0,0 +1,268 @@
+# flight_timing.py – latency of every drone command and connection step, as events + histograms
+#
+# Events (one JSON object per line, next to flight_log.csv):
+#   {"timestamp": "...", "run_id": "...", "kind": "command", "name": "moveBy", "duration_s": 4.182, "success": true}
+# Histograms (flight_latency.json) keep counts per duration bucket for each "kind:name" and are
+# merged across runs, so percentiles cover every flight so far.
+#
+#   python flight_timing.py            # print the per-command summary
+import json
+import math
+import os
+import threading
+import time
+
+from flight_logger import LOG_DIR
+from telemetry import format_timestamp
+
+FLIGHT_EVENTS_LOG = os.path.join(LOG_DIR, "flight_events.jsonl")
+LATENCY_HISTOGRAMS = os.path.join(LOG_DIR, "flight_latency.json")
+
+# Bucket upper bounds in seconds: 1 ms .. ~2 min, 2 buckets per doubling (~41 % wide)
+BUCKET_BOUNDS = [round(0.001 * 2 ** (i / 2), 6) for i in range(35)]
+
+
+class LatencyHistogram:
+    """Fixed-bucket duration histogram (mergeable, so it can accumulate across runs)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)  # last bucket = above the last bound
+        self.n = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.failures = 0
+
+    def add(self, duration, success=True):
+        index = 0
+        while index < len(BUCKET_BOUNDS) and duration > BUCKET_BOUNDS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.n += 1
+        self.total += duration
+        self.min = duration if self.min is None else min(self.min, duration)
+        self.max = duration if self.max is None else max(self.max, duration)
+        if not success:
+            self.failures += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.n += other.n
+        self.total += other.total
+        for attr, pick in (("min", min), ("max", max)):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            setattr(self, attr, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+        self.failures += other.failures
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (capped at the observed max)."""
+        if not self.n:
+            return None
+        rank = max(1, math.ceil(q * self.n))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "n": self.n,
+            "failures": self.failures,
+            "mean_s": round(self.total / self.n, 4) if self.n else None,
+            "p50_s": self.percentile(0.5),
+            "p90_s": self.percentile(0.9),
+            "p99_s": self.percentile(0.99),
+            "max_s": self.max,
+        }
+
+    def to_dict(self):
+        return {"counts": self.counts, "n": self.n, "total": self.total,
+                "min": self.min, "max": self.max, "failures": self.failures}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls()
+        counts = data.get("counts", [])
+        if len(counts) == len(hist.counts):
+            hist.counts = list(counts)
+        hist.n = data.get("n", sum(hist.counts))
+        hist.total = data.get("total", 0.0)
+        hist.min = data.get("min")
+        hist.max = data.get("max")
+        hist.failures = data.get("failures", 0)
+        return hist
+
+
+def load_histograms(path=None):
+    """{"kind:name": LatencyHistogram} from the histogram file (empty if missing)."""
+    path = path or LATENCY_HISTOGRAMS
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("bounds") != BUCKET_BOUNDS:
+        return {}  # written with other buckets, start over rather than mix them
+    return {key: LatencyHistogram.from_dict(value) for key, value in data.get("histograms", {}).items()}
+
+
+def command_name(expectation):
+    """Name of the command an olympe expectation sends (TakeOff, moveBy, ...), best effort."""
+    stack = [expectation]
+    while stack:
+        item = stack.pop(0)
+        children = getattr(item, "expectations", None)
+        if children:
+            stack[:0] = list(children)
+            continue
+        message = getattr(item, "command_message", None)
+        if message is not None:
+            name = getattr(message, "fullName", None) or getattr(message, "name", "")
+            return name.rsplit(".", 1)[-1] or "command"
+    return type(expectation).__name__
+
+
+class TimingRecorder:
+    """Writes timing events and accumulates histograms; shared by all drones of a process."""
+
+    def __init__(self, events_path=None, histograms_path=None):
+        self.events_path = events_path or FLIGHT_EVENTS_LOG
+        self.histograms_path = histograms_path or LATENCY_HISTOGRAMS
+        self._lock = threading.Lock()
+        self._file = None
+        self._histograms = {}  # this process only; merged into the file by save()
+
+    def record(self, run_id, kind, name, duration, success=True, **extra):
+        event = {
+            "timestamp": format_timestamp(time.time()),
+            "run_id": run_id,
+            "kind": kind,
+            "name": name,
+            "duration_s": round(duration, 4),
+            "success": bool(success),
+            **extra,
+        }
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.events_path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            key = f"{kind}:{name}"
+            self._histograms.setdefault(key, LatencyHistogram()).add(duration, success)
+        return event
+
+    def timed(self, run_id, kind, name, **extra):
+        """Context manager: `with recorder.timed(run_id, "connect", "connect"): ...`"""
+        return _Timed(self, run_id, kind, name, extra)
+
+    def histograms(self):
+        """Stored histograms merged with the ones recorded by this process."""
+        merged = load_histograms(self.histograms_path)
+        with self._lock:
+            for key, hist in self._histograms.items():
+                merged.setdefault(key, LatencyHistogram()).merge(hist)
+        return merged
+
+    def save(self):
+        """Merge this process's histograms into the histogram file (atomic replace)."""
+        with self._lock:
+            if not self._histograms:
+                return
+            merged = load_histograms(self.histograms_path)
+            for key, hist in self._histograms.items():
+                merged.setdefault(key, LatencyHistogram()).merge(hist)
+            data = {"bounds": BUCKET_BOUNDS, "histograms": {k: h.to_dict() for k, h in sorted(merged.items())}}
+            tmp = self.histograms_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.histograms_path)
+            self._histograms = {}
+
+    def close(self):
+        self.save()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _Timed:
+    def __init__(self, recorder, run_id, kind, name, extra):
+        self._recorder = recorder
+        self._args = (run_id, kind, name)
+        self._extra = extra
+        self.success = True
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ok = self.success and exc_type is None
+        self._recorder.record(*self._args, time.monotonic() - self._start, ok, **self._extra)
+        return False
+
+
+class TimedExpectation:
+    """Wraps what drone(...) returns; the first wait() records call-to-completion time."""
+
+    def __init__(self, expectation, recorder, run_id, name, start):
+        self._expectation = expectation
+        self._recorder = recorder
+        self._run_id = run_id
+        self._name = name
+        self._start = start
+        self._recorded = False
+
+    def wait(self, *args, **kwargs):
+        result = self._expectation.wait(*args, **kwargs)
+        if not self._recorded:
+            self._recorded = True
+            try:
+                success = bool(self._expectation.success())
+            except Exception:
+                success = False
+            self._recorder.record(self._run_id, "command", self._name, time.monotonic() - self._start, success)
+        return self if result is self._expectation else result
+
+    def __getattr__(self, name):
+        return getattr(self._expectation, name)
+
+
+def timed_call(drone, recorder, run_id, *args, **kwargs):
+    """drone(*args) with its completion time recorded when the caller wait()s on it."""
+    start = time.monotonic()
+    name = command_name(args[0]) if args else "command"
+    return TimedExpectation(drone(*args, **kwargs), recorder, run_id, name, start)
+
+
+class TimedDrone:
+    """Drone proxy that times every drone(...) command (for code that calls the drone directly)."""
+
+    def __init__(self, drone, recorder, run_id):
+        self._drone = drone
+        self._recorder = recorder
+        self._run_id = run_id
+
+    def __call__(self, *args, **kwargs):
+        return timed_call(self._drone, self._recorder, self._run_id, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._drone, name)
+
+
+def format_summary(histograms):
+    lines = [f"{'kind:name':<28} {'n':>6} {'fail':>5} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}"]
+    for key, hist in sorted(histograms.items()):
+        s = hist.summary()
+        cells = [f"{s[k]:>8.3f}" if s[k] is not None else f"{'-':>8}" for k in ("mean_s", "p50_s", "p90_s", "p99_s", "max_s")]
+        lines.append(f"{key:<28} {s['n']:>6} {s['failures']:>5} " + " ".join(cells))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_summary(load_histograms()))
@@ -0,0 +1,95 @@
+# live_publisher.py – push the latest telemetry rows to the backend's live stream while flying
+#
+# Rows are only kept in memory (latest per run) and POSTed as one batch every `interval`
+# seconds from a background thread, to <backend>/telemetry/live/publish. Nothing here can
+# block or fail the flight: a slow or unreachable backend just means fewer live updates
+# (counted in `failed`); the full log still comes from flight_log.csv / the segments.
+# The token is renewed through backend_auth.BackendAuth; once the backend refuses a token
+# that cannot be renewed, publishing stops and `auth_error` says why.
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+from backend_auth import AuthError, BackendAuth
+
+LIVE_TIMEOUT = 2.0
+
+
+class LivePublisher:
+    def __init__(self, url, token=None, interval=0.2, auth=None):
+        self.url = url
+        self.auth = auth or BackendAuth.from_env(url, token)
+        self.interval = interval
+        self.sent = 0
+        self.failed = 0
+        self.auth_error = None
+        self._latest = {}  # run_id -> newest unsent row
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="live-publisher", daemon=True)
+            self._thread.start()
+        return self
+
+    def publish(self, record):
+        """Remember the row for the next batch (replaces an unsent row of the same run)."""
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            self._latest[record.get("run_id")] = record
+
+    def close(self, timeout=None):
+        """Send what is pending and stop the thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _take(self):
+        with self._lock:
+            rows, self._latest = list(self._latest.values()), {}
+        return rows
+
+    def _send(self, rows):
+        if self.auth_error is not None:
+            self.failed += len(rows)
+            return
+        try:
+            headers = {"Content-Type": "application/json"}
+            authorization = self.auth.header()
+            if authorization:
+                headers["Authorization"] = authorization
+            request = urllib.request.Request(self.url, data=json.dumps(rows).encode("utf-8"), headers=headers, method="POST")
+            with urllib.request.urlopen(request, timeout=LIVE_TIMEOUT) as response:
+                response.read()
+            self.sent += len(rows)
+        except urllib.error.HTTPError as e:
+            self.failed += len(rows)
+            if e.code in (401, 403) and not self.auth.refused():
+                self._stop_on_auth(f"HTTP {e.code}: token refused or expired")
+        except AuthError as e:
+            self.failed += len(rows)
+            self._stop_on_auth(str(e))
+        except Exception:
+            self.failed += len(rows)
+
+    def _stop_on_auth(self, reason):
+        self.auth_error = reason
+        print(f"live_publisher: {reason}; live updates stopped (set ECODRONE_EMAIL / ECODRONE_PASSWORD "
+              "to renew the token)", file=sys.stderr)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            rows = self._take()
+            if rows:
+                self._send(rows)
+        rows = self._take()
+        if rows:
+            self._send(rows)
@@ -0,0 +1,33 @@
+# logging_pipeline.py – where the flight scripts store their rows: local log, spooled for the backend
+#
+# run_hello_with_logging.py, fleet.py and drone_daemon.py all build their FlightLogger writer
+# with log_writer(), so the flags below switch every script at once.
+from flight_logger import FLIGHT_LOG_CSV, CsvLogWriter
+from flight_segments import FLIGHT_LOG_SEGMENTS_DIR, SegmentedLogWriter
+from flight_spool import FLIGHT_SPOOL_DB, SpoolLogWriter, runs_synced
+
+LOG_SEGMENTS = True  # compressed segments in flight_log_segments/ (False: append to flight_log.csv)
+SPOOL = True  # also queue rows in flight_spool.sqlite3 for the backend (python flight_spool.py sync ...)
+
+
+def log_writer(segments=None, spool=None):
+    """Writer for a FlightLogger: local log (segments or CSV), spooled for sync.
+
+    `segments` / `spool` default to LOG_SEGMENTS / SPOOL. None means the FlightLogger's own
+    CsvLogWriter on flight_log.csv.
+    """
+    segments = LOG_SEGMENTS if segments is None else segments
+    spool = SPOOL if spool is None else spool
+    # Retention may drop a segment once the spool has synced its runs
+    archive = SegmentedLogWriter(is_synced=runs_synced if spool else None) if segments else None
+    if not spool:
+        return archive
+    return SpoolLogWriter(archive=archive or CsvLogWriter())
+
+
+def describe():
+    """Lines telling where log_writer() puts the rows (printed by the scripts after a flight)."""
+    lines = [f"--- Logged to {FLIGHT_LOG_SEGMENTS_DIR if LOG_SEGMENTS else FLIGHT_LOG_CSV} ---"]
+    if SPOOL:
+        lines.append(f"--- Spooled for upload in {FLIGHT_SPOOL_DB} (python flight_spool.py sync --url ...) ---")
+    return lines
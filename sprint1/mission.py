@@ -0,0 +1,171 @@
+# mission.py – declarative mission plans: list of steps, executed back to back with per-step timing
+#
+# A plan is a list of dicts (or a JSON file with that list):
+#   {"action": "takeoff", "timeout": 15}
+#   {"action": "move", "dx": 5.0, "dy": 0.0, "dz": 0.0, "dpsi": 0.0, "timeout": 25}
+#   {"action": "hover", "seconds": 2}            # explicit hold, only if the mission needs one
+#   {"action": "land", "timeout": 15}
+# Optional on every step: "name" (shown in timings). Each flight step is confirmed by
+# FlyingStateChanged and the next one starts right away; any failure lands the drone.
+import json
+import time
+
+from olympe.messages.ardrone3.Piloting import TakeOff, Landing, moveBy
+from olympe.messages.ardrone3.PilotingState import FlyingStateChanged
+
+DEFAULT_TIMEOUT = 15
+SAFE_LAND_TIMEOUT = 20
+MOVE_TIMEOUT = 25  # cautious: allow time for a 5 m move to complete
+
+# The hello flight: take off, 5 m forward, 5 m back, land (run_hello_with_logging.py, and every
+# drone of fleet.py without its own plan)
+HELLO_MISSION = [
+    {"action": "takeoff", "timeout": 15},
+    {"action": "move", "name": "forward 5 m", "dx": 5.0, "timeout": MOVE_TIMEOUT},
+    {"action": "move", "name": "back 5 m", "dx": -5.0, "timeout": MOVE_TIMEOUT},
+    {"action": "land", "timeout": 15},
+]
+
+# action -> (command builder, FlyingStateChanged state that confirms the step)
+ACTIONS = {
+    "takeoff": (lambda step: TakeOff(), "hovering"),
+    "move": (
+        lambda step: moveBy(
+            float(step.get("dx", 0.0)), float(step.get("dy", 0.0)),
+            float(step.get("dz", 0.0)), float(step.get("dpsi", 0.0)),
+        ),
+        "hovering",
+    ),
+    "land": (lambda step: Landing(), "landed"),
+}
+
+
+class MissionError(ValueError):
+    """Invalid mission plan (raised before the drone takes off)."""
+
+
+class MissionResult:
+    """Outcome of run_mission: per-step timings, where it failed and whether the drone landed."""
+
+    def __init__(self, name):
+        self.name = name
+        self.steps = []  # {"index", "name", "action", "ok", "duration_s"}
+        self.success = False
+        self.failed_step = None
+        self.safe_landing = None  # None = not needed, True/False = result of the automatic landing
+        self.duration_s = 0.0
+
+    def slowest(self, n=3):
+        return sorted(self.steps, key=lambda s: s["duration_s"], reverse=True)[:n]
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "success": self.success,
+            "failed_step": self.failed_step,
+            "safe_landing": self.safe_landing,
+            "duration_s": round(self.duration_s, 3),
+            "steps": self.steps,
+        }
+
+    def format_timings(self):
+        lines = [f"Mission {self.name}: {'OK' if self.success else 'FAILED'} in {self.duration_s:.2f} s"]
+        for step in self.steps:
+            status = "ok" if step["ok"] else "FAILED"
+            lines.append(f"  {step['index']:>2}. {step['name']:<24} {step['duration_s']:>8.2f} s  {status}")
+        if self.safe_landing is not None:
+            lines.append(f"  safe landing: {'ok' if self.safe_landing else 'FAILED'}")
+        return "\n".join(lines)
+
+
+def _step_name(index, step):
+    if "name" in step:
+        return step["name"]
+    if step["action"] == "move":
+        return f"move {step.get('dx', 0)},{step.get('dy', 0)},{step.get('dz', 0)}"
+    return step["action"]
+
+
+def validate_plan(plan):
+    """Check a plan before flying. Raises MissionError with the offending step."""
+    if not isinstance(plan, list) or not plan:
+        raise MissionError("Mission plan must be a non-empty list of steps.")
+    for index, step in enumerate(plan, start=1):
+        if not isinstance(step, dict) or "action" not in step:
+            raise MissionError(f"Step {index}: expected a dict with an 'action'.")
+        action = step["action"]
+        if action == "hover":
+            if float(step.get("seconds", -1)) < 0:
+                raise MissionError(f"Step {index}: hover needs 'seconds' >= 0.")
+        elif action not in ACTIONS:
+            raise MissionError(f"Step {index}: unknown action {action!r}.")
+        elif float(step.get("timeout", DEFAULT_TIMEOUT)) <= 0:
+            raise MissionError(f"Step {index}: timeout must be > 0.")
+    return plan
+
+
+def load_mission(path):
+    """Read and validate a JSON mission plan."""
+    with open(path, encoding="utf-8") as f:
+        return validate_plan(json.load(f))
+
+
+def _run_step(drone, step):
+    """Execute one step; True once FlyingStateChanged confirms it (or the hover elapsed)."""
+    action = step["action"]
+    if action == "hover":
+        time.sleep(float(step["seconds"]))
+        return True
+    build, state = ACTIONS[action]
+    timeout = float(step.get("timeout", DEFAULT_TIMEOUT))
+    return drone(build(step) >> FlyingStateChanged(state=state, _timeout=timeout)).wait().success()
+
+
+def _safe_land(drone):
+    try:
+        return drone(Landing() >> FlyingStateChanged(state="landed", _timeout=SAFE_LAND_TIMEOUT)).wait().success()
+    except Exception:
+        return False
+
+
+def run_mission(drone, plan, name="mission", on_step=None):
+    """Run `plan` on a connected drone. Returns a MissionResult; never leaves the drone flying
+    after a failed step (it is landed automatically). `on_step(step_record)` is called after
+    each step, e.g. to print progress."""
+    validate_plan(plan)
+    result = MissionResult(name)
+    mission_start = time.monotonic()
+    airborne = False
+    for index, step in enumerate(plan, start=1):
+        start = time.monotonic()
+        try:
+            ok = _run_step(drone, step)
+        except Exception:
+            ok = False
+        record = {
+            "index": index,
+            "name": _step_name(index, step),
+            "action": step["action"],
+            "ok": ok,
+            "duration_s": round(time.monotonic() - start, 3),
+        }
+        result.steps.append(record)
+        if on_step is not None:
+            on_step(record)
+        if not ok:
+            result.failed_step = index
+            # A failed takeoff may still have left the ground; a failed landing is retried
+            if airborne or step["action"] in ("takeoff", "land"):
+                result.safe_landing = _safe_land(drone)
+            break
+        if step["action"] == "takeoff":
+            airborne = True
+        elif step["action"] == "land":
+            airborne = False
+    else:
+        result.success = True
+        if airborne:
+            # Plans that forget to land still end on the ground
+            result.safe_landing = _safe_land(drone)
+    result.duration_s = time.monotonic() - mission_start
+    return result
@@ -1,84 +1,113 @@
 # run_hello_with_logging.py – run with CSV flight logging + cautious 5 m forward/back between take off and land
-import threading
+import os
 import time
 from datetime import datetime
 
 import olympe
-from olympe.messages.ardrone3.Piloting import TakeOff, Landing, moveBy
-from olympe.messages.ardrone3.PilotingState import FlyingStateChanged
 
-from flight_logger import FLIGHT_LOG_CSV, log_flight_row
+from flight_logger import FlightLogger
+from flight_sampling import AdaptiveSampler
+from flight_timing import TimingRecorder, timed_call
+from live_publisher import LivePublisher
+from logging_pipeline import describe, log_writer
+from mission import HELLO_MISSION, run_mission
+from telemetry import TelemetryCollector
 
 DRONE_IP = "192.168.42.1"
-MOVE_TIMEOUT = 25  # cautious: allow time for 5 m move to complete
-
-# Generate one run_id for this flight
-_run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-_RealDrone = olympe.Drone
+LOG_RATE_HZ = 10.0  # "in_flight" rows per second (only emitted when the drone pushed new state)
+# Full LOG_RATE_HZ only while moving, fewer rows hovering / landed, and only rows that add
+# information beyond the flight_sampling.py tolerances (False: every row at LOG_RATE_HZ)
+ADAPTIVE_SAMPLING = True
+# Where rows are stored (segments / CSV, spool): LOG_SEGMENTS and SPOOL in logging_pipeline.py
+# Also push rows to the admin dashboard while flying, e.g. "http://<backend>/telemetry/live/publish"
+# (JWT from the ECODRONE_TOKEN environment variable); None = log only
+LIVE_URL = None
 
 
 class _DroneLoggerWrapper:
     """Wraps the real Drone and logs to flight_log.csv on connect, during flight, and on disconnect."""
 
-    def __init__(self, real_drone, run_id):
+    def __init__(self, real_drone, run_id, writer=None):
         self._drone = real_drone
         self._run_id = run_id
         self._connected = False
-        self._stop_thread = False
-        self._log_thread = None
+        self._logger = FlightLogger(writer=writer)
+        self._timing = TimingRecorder()
+        self._live = LivePublisher(LIVE_URL, os.environ.get("ECODRONE_TOKEN")) if LIVE_URL else None
+        self._collector = None
+
+    def _log(self, record):
+        self._logger.log_record(record)
+        if self._live is not None:
+            self._live.publish(record)
 
     def connect(self, *args, **kwargs):
-        result = self._drone.connect(*args, **kwargs)
+        timing = self._timing.timed(
+            self._run_id, "connect", "connect", retry=kwargs.get("retry"), timeout=kwargs.get("timeout")
+        )
+        with timing as step:
+            result = self._drone.connect(*args, **kwargs)
+            step.success = bool(result)
         if result:
             self._connected = True
-            # Give the drone time to push initial states before first log
-            time.sleep(2.0)
-            log_flight_row(self._drone, "connected", self._run_id)
-            self._stop_thread = False
-            self._log_thread = threading.Thread(target=self._log_loop, daemon=True)
-            self._log_thread.start()
+            self._collector = TelemetryCollector(
+                self._drone, self._log, self._run_id, rate_hz=LOG_RATE_HZ,
+                sampler=AdaptiveSampler() if ADAPTIVE_SAMPLING else None,
+            )
+            self._collector.start()
+            # Give the drone time to push initial states before first log (returns as soon as battery is in)
+            with self._timing.timed(self._run_id, "connect", "first_state") as step:
+                step.success = self._collector.wait_ready(timeout=2.0)
+            self._log(self._collector.snapshot("connected"))
         return result
 
-    def _log_loop(self):
-        while not self._stop_thread and self._connected:
-            time.sleep(2)
-            if self._stop_thread or not self._connected:
-                break
+    def disconnect(self):
+        self._connected = False
+        if self._collector is not None:
+            self._collector.stop()
             try:
-                log_flight_row(self._drone, "in_flight", self._run_id)
+                self._log(self._collector.snapshot("disconnected"))
             except Exception:
                 pass
-
-    def disconnect(self):
-        self._connected = False
-        self._stop_thread = True
-        if self._log_thread is not None:
-            self._log_thread.join(timeout=3)
-        try:
-            log_flight_row(self._drone, "disconnected", self._run_id)
-        except Exception:
-            pass
-        self._drone.disconnect()
+            self._collector = None
+        # Write out everything still queued before the real disconnect
+        self._logger.close(timeout=5)
+        if self._live is not None:
+            self._live.close(timeout=5)
+        with self._timing.timed(self._run_id, "connect", "disconnect"):
+            self._drone.disconnect()
+        self._timing.close()
 
     def __call__(self, *args, **kwargs):
-        """Forward drone(command) to the real drone (e.g. TakeOff, Landing)."""
-        return self._drone(*args, **kwargs)
+        """Forward drone(command) to the real drone (e.g. TakeOff, Landing); timed until wait() returns."""
+        return timed_call(self._drone, self._timing, self._run_id, *args, **kwargs)
 
     def __getattr__(self, name):
         return getattr(self._drone, name)
 
 
-def _patched_drone(ip):
-    return _DroneLoggerWrapper(_RealDrone(ip), _run_id)
+def make_logged_drone(ip, run_id, writer=None, drone=None):
+    """olympe.Drone(ip), wrapped so that its connect, telemetry and disconnect are logged as `run_id`.
+
+    `writer` is the FlightLogger writer (default logging_pipeline.log_writer()); `drone` wraps an
+    existing drone instead of creating one. olympe.Drone is looked up on each call, so
+    sim_drone.install() works at any time.
+    """
+    return _DroneLoggerWrapper(
+        drone if drone is not None else olympe.Drone(ip), run_id, writer if writer is not None else log_writer()
+    )
 
 
-olympe.Drone = _patched_drone
+def _print_step(step):
+    status = "ok" if step["ok"] else "FAILED"
+    print(f"{step['name']}: {status} ({step['duration_s']:.2f} s)")
 
 
-def _run_flight():
+def _run_flight(run_id=None):
     """Connect, take off, move 5 m forward, 5 m back, land, disconnect. Very cautious."""
+    run_id = run_id or datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     print(f"--- EcoDrone LIVE with logging: Connecting to {DRONE_IP} ---")
-    drone = olympe.Drone(DRONE_IP)
+    drone = make_logged_drone(DRONE_IP, run_id)
     if not drone.connect(retry=5, timeout=10):
         print(f"ERROR: Failed to connect to {DRONE_IP}.")
         return
@@ -93,66 +122,19 @@ def _run_flight():
     for i in range(5, 0, -1):
         print(i)
         time.sleep(1)
-    print("Taking Off...")
-    takeoff_expectation = drone(TakeOff() >> FlyingStateChanged(state="hovering", _timeout=15))
-    if not takeoff_expectation.wait().success():
-        print("ERROR: TakeOff failed (timeout or connection lost). Check WiFi and drone.")
-        try:
-            drone.disconnect()
-        except Exception:
-            pass
-        return
-    print("Hovering...")
-    time.sleep(2)
-    # Cautious: 5 m forward only
-    print(">>> MOVING FORWARD (5 m) <<<")
-    move_fwd = drone(
-        moveBy(5.0, 0.0, 0.0, 0.0)
-        >> FlyingStateChanged(state="hovering", _timeout=MOVE_TIMEOUT)
-    )
-    if not move_fwd.wait().success():
-        print("ERROR: Move forward failed. Landing...")
-        try:
-            drone(Landing() >> FlyingStateChanged(state="landed", _timeout=10)).wait()
-        except Exception:
-            pass
-        try:
-            drone.disconnect()
-        except Exception:
-            pass
-        return
-    print("Holding position...")
-    time.sleep(3)
-    # 5 m back to start
-    print("<<< MOVING BACKWARD (5 m, return) <<<")
-    move_back = drone(
-        moveBy(-5.0, 0.0, 0.0, 0.0)
-        >> FlyingStateChanged(state="hovering", _timeout=MOVE_TIMEOUT)
-    )
-    if not move_back.wait().success():
-        print("ERROR: Move back failed. Landing...")
-        try:
-            drone(Landing() >> FlyingStateChanged(state="landed", _timeout=10)).wait()
-        except Exception:
-            pass
-        try:
-            drone.disconnect()
-        except Exception:
-            pass
-        return
-    time.sleep(2)
-    print("Landing...")
-    land_expectation = drone(Landing() >> FlyingStateChanged(state="landed", _timeout=15))
-    if not land_expectation.wait().success():
-        print("ERROR: Landing failed. Disconnecting.")
+    result = run_mission(drone, HELLO_MISSION, name=run_id, on_step=_print_step)
+    print(result.format_timings())
     try:
         drone.disconnect()
     except Exception:
         pass
-    print("Landed.")
+    print("Landed." if result.success or result.safe_landing else "ERROR: Drone did not confirm landing.")
 
 
 if __name__ == "__main__":
-    print(f"--- Running with flight logging (run_id={_run_id}) ---")
-    _run_flight()
-    print(f"--- Logged to {FLIGHT_LOG_CSV} ---")
+    # One run_id for this flight
+    run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    print(f"--- Running with flight logging (run_id={run_id}) ---")
+    _run_flight(run_id)
+    for line in describe():
+        print(line)
@@ -0,0 +1,341 @@
+# sim_drone.py – simulated olympe.Drone for offline runs of the logger / mission scripts (no drone needed)
+#
+# Usage (before the script creates its drone):
+#   import sim_drone
+#   sim_drone.install(sim_drone.SimConfig(time_scale=10, drop_rate=0.05))
+#   import run_hello_with_logging
+#   run_hello_with_logging._run_flight()
+import copy
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+import zlib
+
+import olympe
+from olympe.messages.ardrone3.PilotingState import AltitudeChanged, FlyingStateChanged, GpsLocationChanged
+from olympe.messages.battery import capacity
+
+BatteryStateChanged = olympe.messages.common.CommonState.BatteryStateChanged
+
+EARTH_RADIUS_M = 6371000.0
+
+
+class SimConfig:
+    """Knobs for the simulated drone. All times are seconds of simulated time unless noted."""
+
+    def __init__(
+        self,
+        seed=0,
+        rate_hz=20.0,  # state messages per second (real time)
+        time_scale=1.0,  # simulated seconds per real second (10 = missions run 10x faster)
+        home=(48.8790, 2.3675, 35.0),  # latitude, longitude, GPS altitude (m)
+        gps_drift_m=0.3,  # std dev of GPS noise around the true position
+        takeoff_altitude_m=1.0,
+        climb_rate=1.0,  # m/s up (takeoff) and down (landing)
+        speed=2.0,  # m/s horizontal for moveBy
+        battery_start_pct=100.0,
+        battery_drain_pct_per_min_flying=2.5,
+        battery_drain_pct_per_min_landed=0.1,
+        battery_full_mah=6800,
+        connect_latency_s=0.0,  # real time per connect attempt
+        connect_failures=0,  # first N connect attempts fail
+        latency_s=0.0,  # real delay before each state message is delivered
+        latency_jitter_s=0.0,
+        drop_rate=0.0,  # probability that a state message is never delivered
+        get_state_latency_s=0.0,  # real time added to every get_state() call
+        command_failures=(),  # command names that never complete, e.g. ("moveBy",)
+    ):
+        self.seed = seed
+        self.rate_hz = rate_hz
+        self.time_scale = time_scale
+        self.home = home
+        self.gps_drift_m = gps_drift_m
+        self.takeoff_altitude_m = takeoff_altitude_m
+        self.climb_rate = climb_rate
+        self.speed = speed
+        self.battery_start_pct = battery_start_pct
+        self.battery_drain_pct_per_min_flying = battery_drain_pct_per_min_flying
+        self.battery_drain_pct_per_min_landed = battery_drain_pct_per_min_landed
+        self.battery_full_mah = battery_full_mah
+        self.connect_latency_s = connect_latency_s
+        self.connect_failures = connect_failures
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.drop_rate = drop_rate
+        self.get_state_latency_s = get_state_latency_s
+        self.command_failures = tuple(command_failures)
+
+
+class SimEvent:
+    """What subscribers receive: same .message / .args attributes as an olympe message event."""
+
+    def __init__(self, message, args):
+        self.message = message
+        self.args = args
+
+    def __repr__(self):
+        return f"SimEvent({_message_name(self.message)}, {self.args})"
+
+
+def _message_name(message):
+    return getattr(message, "fullName", None) or getattr(message, "name", None) or repr(message)
+
+
+def _leaves(expectation):
+    """Flatten olympe combined expectations (a >> b, a & b) into their leaf expectations."""
+    children = getattr(expectation, "expectations", None)
+    if children:
+        for child in children:
+            yield from _leaves(child)
+    else:
+        yield expectation
+
+
+def _parse_expectation(expectation):
+    """(command name, args, kwargs, expected flying state, timeout) from drone(...) input."""
+    name, args, kwargs, state, timeout = None, [], {}, None, None
+    for leaf in _leaves(expectation):
+        message = getattr(leaf, "command_message", None)
+        if message is not None and name is None:
+            name = _message_name(message).rsplit(".", 1)[-1]
+            args = list(getattr(leaf, "command_args", None) or [])
+            kwargs = dict(getattr(leaf, "command_kwargs", None) or {})
+            continue
+        expected = getattr(leaf, "expected_message", None)
+        if expected is not None and _message_name(expected).endswith("FlyingStateChanged"):
+            state = (getattr(leaf, "expected_args", None) or {}).get("state", state)
+            timeout = getattr(leaf, "_timeout", timeout)
+    if name is None:
+        # Fallback for olympe versions with different expectation internals
+        text = repr(expectation)
+        for candidate in ("TakeOff", "Landing", "moveBy"):
+            if candidate in text:
+                name = candidate
+    state = getattr(state, "name", state)  # enum member -> "hovering"
+    return name, args, kwargs, state, timeout
+
+
+class SimExpectation:
+    """Returned by SimDrone(...): wait() blocks until the manoeuvre finished or timed out."""
+
+    def __init__(self, name, timeout_s):
+        self.name = name
+        self.timeout_s = timeout_s  # real seconds, None = no limit
+        self._done = threading.Event()
+        self._success = False
+
+    def _finish(self, success):
+        self._success = success
+        self._done.set()
+
+    def wait(self, _timeout=None):
+        timeout = _timeout if _timeout is not None else self.timeout_s
+        if not self._done.wait(timeout):
+            self._success = False
+        return self
+
+    def success(self):
+        return self._done.is_set() and self._success
+
+    def timedout(self):
+        return not self._done.is_set()
+
+
+class SimDrone:
+    """Stand-in for olympe.Drone: connect/disconnect, get_state, subscribe and drone(command)."""
+
+    def __init__(self, ip="192.168.42.1", config=None):
+        self.ip = ip
+        self.config = config or SimConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._states = {}  # message name -> latest delivered args
+        self._subscribers = {}
+        self._sub_ids = itertools.count()
+        self._pending = []  # heap of (due, seq, event)
+        self._seq = itertools.count()
+        self._thread = None
+        self._stop = threading.Event()
+        self._connect_attempts = 0
+        self.sim_time = 0.0
+        self.ticks = 0
+        self.delivered = 0
+        self.dropped = 0
+        # Physical state (metres relative to home)
+        self.north = self.east = self.altitude = 0.0
+        self.flying_state = "landed"
+        self.battery_pct = self.config.battery_start_pct
+        self._target = None
+        self._maneuver = None  # (command name, SimExpectation) in progress
+
+    # --- olympe.Drone surface -------------------------------------------------------------
+
+    def connect(self, retry=1, timeout=None, **kwargs):
+        for _ in range(max(1, retry)):
+            self._connect_attempts += 1
+            if self.config.connect_latency_s:
+                time.sleep(self.config.connect_latency_s)
+            if self._connect_attempts > self.config.connect_failures:
+                self._start()
+                return True
+        return False
+
+    def disconnect(self, **kwargs):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        return True
+
+    def connection_state(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_state(self, message):
+        if self.config.get_state_latency_s:
+            time.sleep(self.config.get_state_latency_s)
+        with self._lock:
+            args = self._states.get(_message_name(message))
+        if args is None:
+            raise RuntimeError(f"{_message_name(message)} state not available")
+        return dict(args)
+
+    def subscribe(self, callback, *args, **kwargs):
+        sub_id = next(self._sub_ids)
+        with self._lock:
+            self._subscribers[sub_id] = callback
+        return sub_id
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    def __call__(self, expectation):
+        name, args, kwargs, _, timeout = _parse_expectation(expectation)
+        real_timeout = timeout / self.config.time_scale if timeout is not None else None
+        result = SimExpectation(name, real_timeout)
+        with self._lock:
+            if self._maneuver is not None:
+                self._maneuver[1]._finish(False)  # superseded, like a new piloting command
+            self._maneuver = (name, result)
+            if name in self.config.command_failures:
+                self._target = None  # never completes -> times out
+            elif name == "TakeOff" and self.flying_state == "landed":
+                self.flying_state = "takingoff"
+                self._target = (self.north, self.east, self.config.takeoff_altitude_m)
+            elif name == "Landing":
+                self.flying_state = "landing"
+                self._target = (self.north, self.east, 0.0)
+            elif name == "moveBy" and self.flying_state in ("hovering", "flying"):
+                dx, dy, dz = (list(args) + [kwargs.get("dX", 0.0), kwargs.get("dY", 0.0), kwargs.get("dZ", 0.0)])[:3]
+                # Body frame with heading north: dX forward, dY right, dZ down
+                self.flying_state = "flying"
+                self._target = (self.north + dx, self.east + dy, max(0.0, self.altitude - dz))
+            else:
+                self._maneuver = None
+                result._finish(False)
+        return result
+
+    # --- simulation ----------------------------------------------------------------------
+
+    def _start(self):
+        self._stop.clear()
+        self._emit_all(time.monotonic())
+        self._thread = threading.Thread(target=self._run, name="sim-drone", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        period = 1.0 / self.config.rate_hz
+        dt = period * self.config.time_scale
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            next_tick += period
+            self.step(dt)
+            self._deliver_due(time.monotonic())
+            self._stop.wait(max(next_tick - time.monotonic(), 0))
+
+    def step(self, dt):
+        """Advance the physics by dt simulated seconds and queue the resulting state messages."""
+        cfg = self.config
+        with self._lock:
+            self.sim_time += dt
+            self.ticks += 1
+            if self._target is not None:
+                tn, te, ta = self._target
+                vertical = cfg.climb_rate * dt
+                self.altitude += max(-vertical, min(vertical, ta - self.altitude))
+                dn, de = tn - self.north, te - self.east
+                dist = math.hypot(dn, de)
+                move = min(dist, cfg.speed * dt)
+                if dist > 0:
+                    self.north += dn / dist * move
+                    self.east += de / dist * move
+                if abs(ta - self.altitude) < 1e-6 and math.hypot(tn - self.north, te - self.east) < 1e-6:
+                    self._target = None
+                    self.flying_state = "landed" if self.flying_state == "landing" else "hovering"
+                    if self._maneuver is not None:
+                        self._maneuver[1]._finish(True)
+                        self._maneuver = None
+            drain = cfg.battery_drain_pct_per_min_landed if self.flying_state == "landed" else cfg.battery_drain_pct_per_min_flying
+            self.battery_pct = max(0.0, self.battery_pct - drain * dt / 60.0)
+        self._emit_all(time.monotonic())
+
+    def _gps(self):
+        lat0, lon0, alt0 = self.config.home
+        noise_n = self._rng.gauss(0.0, self.config.gps_drift_m)
+        noise_e = self._rng.gauss(0.0, self.config.gps_drift_m)
+        lat = lat0 + math.degrees((self.north + noise_n) / EARTH_RADIUS_M)
+        lon = lon0 + math.degrees((self.east + noise_e) / (EARTH_RADIUS_M * math.cos(math.radians(lat0))))
+        return {"latitude": lat, "longitude": lon, "altitude": alt0 + self.altitude,
+                "latitude_accuracy": 1, "longitude_accuracy": 1, "altitude_accuracy": 1}
+
+    def _emit_all(self, now):
+        with self._lock:
+            full = self.config.battery_full_mah
+            events = [
+                SimEvent(GpsLocationChanged, self._gps()),
+                SimEvent(AltitudeChanged, {"altitude": self.altitude}),
+                SimEvent(BatteryStateChanged, {"percent": int(round(self.battery_pct))}),
+                SimEvent(capacity, {"full_charge": full, "remaining": int(full * self.battery_pct / 100.0)}),
+                SimEvent(FlyingStateChanged, {"state": self.flying_state}),
+            ]
+            for event in events:
+                if self._rng.random() < self.config.drop_rate:
+                    self.dropped += 1
+                    continue
+                due = now + self.config.latency_s + self._rng.uniform(0, self.config.latency_jitter_s)
+                heapq.heappush(self._pending, (due, next(self._seq), event))
+        self._deliver_due(now)
+
+    def _deliver_due(self, now):
+        while True:
+            with self._lock:
+                if not self._pending or self._pending[0][0] > now:
+                    return
+                _, _, event = heapq.heappop(self._pending)
+                self._states[_message_name(event.message)] = event.args
+                callbacks = list(self._subscribers.values())
+                self.delivered += 1
+            for callback in callbacks:
+                try:
+                    callback(event, self)
+                except Exception:
+                    pass
+
+
+def install(config=None, seed_per_drone=False):
+    """Replace olympe.Drone with SimDrone (call before importing scripts that wrap olympe.Drone).
+
+    With seed_per_drone each ip gets its own seed (config.seed + CRC32 of the ip), so the drones
+    of a simulated fleet do not all draw the same GPS noise and message drops."""
+    def make(ip, *args, **kwargs):
+        drone_config = config
+        if seed_per_drone:
+            drone_config = copy.copy(config or SimConfig())
+            drone_config.seed = drone_config.seed + zlib.crc32(str(ip).encode("utf-8"))
+        return SimDrone(ip, drone_config)
+
+    olympe.Drone = make
+    return olympe.Drone
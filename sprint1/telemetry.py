@@ -0,0 +1,201 @@
+# telemetry.py – event-driven telemetry capture (subscribes to drone states instead of polling get_state)
+import threading
+import time
+from datetime import datetime
+
+import olympe
+from olympe.messages.ardrone3.PilotingState import GpsLocationChanged, AltitudeChanged, FlyingStateChanged
+from olympe.messages.battery import capacity
+
+from flight_logger import (
+    _apply_altitude,
+    _apply_battery,
+    _apply_capacity,
+    _apply_gps,
+    _empty_state,
+    _get_value,
+)
+
+BatteryStateChanged = olympe.messages.common.CommonState.BatteryStateChanged
+
+# (key, message, how to copy it into a row) – applied in this order, capacity after battery pct
+TELEMETRY_MESSAGES = [
+    ("gps", GpsLocationChanged, _apply_gps),
+    ("altitude", AltitudeChanged, _apply_altitude),
+    ("battery", BatteryStateChanged, _apply_battery),
+    ("capacity", capacity, _apply_capacity),
+]
+
+
+def format_timestamp(t):
+    """UTC timestamp string for a time.time() value, millisecond precision."""
+    return datetime.utcfromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def _flying_state(args):
+    """FlyingStateChanged state as a plain string (olympe gives an enum member)."""
+    state = _get_value(args, "state")
+    return getattr(state, "name", state)
+
+
+def _same_message(a, b):
+    """True if two olympe messages are the same (identity, or same fullName across wrappers)."""
+    if a is b:
+        return True
+    name = getattr(a, "fullName", None)
+    return name is not None and name == getattr(b, "fullName", None)
+
+
+class TelemetryCollector:
+    """Keeps the latest GPS / altitude / battery state as the drone pushes it.
+
+    Subscribes to the drone's message stream (drone.subscribe) and stores the latest args of
+    each message in TELEMETRY_MESSAGES with its arrival time. snapshot() builds a CSV record
+    from that in memory, so reading telemetry costs no get_state() round trips or retries.
+
+    Rows are passed to sink(record) either every 1/rate_hz seconds (only when something new
+    arrived since the last row) or, with on_change=True, on every subscribed message. The row
+    timestamp is the arrival time of the newest state it contains, not the time it was emitted.
+    With a `sampler` (flight_sampling.AdaptiveSampler) those rows are offered to it together
+    with the flying state, and only the rows it keeps reach the sink.
+    """
+
+    def __init__(self, drone, sink, run_id, phase="in_flight", rate_hz=10.0, on_change=False, sampler=None):
+        self._drone = drone
+        self._sink = sink
+        self._run_id = run_id
+        self._phase = phase
+        self._rate_hz = rate_hz
+        self._on_change = on_change
+        self._sampler = sampler
+        self._flying_state = None
+        self._latest = {}  # key -> (args, arrival time.time())
+        self._lock = threading.Lock()
+        self._updated = False
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._subscriber = None
+        self._thread = None
+
+    def start(self):
+        """Seed from the current drone state, subscribe to updates and start emitting rows."""
+        for key, message, _ in TELEMETRY_MESSAGES:
+            try:
+                state = self._drone.get_state(message)
+            except Exception:
+                state = None
+            if state:
+                self._store(key, state, time.time())
+        try:
+            self._flying_state = _flying_state(self._drone.get_state(FlyingStateChanged))
+        except Exception:
+            pass
+        self._subscriber = self._drone.subscribe(self._on_event)
+        self._stop.clear()
+        if not self._on_change:
+            self._thread = threading.Thread(target=self._emit_loop, name="telemetry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Unsubscribe and stop emitting rows."""
+        self._stop.set()
+        if self._subscriber is not None:
+            try:
+                self._drone.unsubscribe(self._subscriber)
+            except Exception:
+                pass
+            self._subscriber = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._sampler is not None:
+            # The compressor holds back its latest row; it belongs before whatever is logged next
+            self._send(self._sampler.flush())
+
+    def set_phase(self, phase):
+        """Phase written into the following rows (e.g. "in_flight")."""
+        self._phase = phase
+
+    def set_run_id(self, run_id):
+        """run_id written into the following rows (a long-lived connection flies several runs)."""
+        self._run_id = run_id
+
+    def wait_ready(self, timeout=None):
+        """Block until a battery state has been received (or timeout). Returns True if ready."""
+        return self._ready.wait(timeout)
+
+    def flying_state(self):
+        """Latest FlyingStateChanged state ("landed", "hovering", ...), or None."""
+        return self._flying_state
+
+    def latest(self, key):
+        """Latest (args, arrival_time) for "gps", "altitude", "battery" or "capacity", or None."""
+        with self._lock:
+            return self._latest.get(key)
+
+    def snapshot(self, phase=None):
+        """Build a CSV record from the latest states (no drone I/O)."""
+        with self._lock:
+            latest = dict(self._latest)
+        row = _empty_state()
+        newest = None
+        for key, _, apply in TELEMETRY_MESSAGES:
+            if key in latest:
+                args, t = latest[key]
+                apply(row, args)
+                newest = t if newest is None else max(newest, t)
+        ts = format_timestamp(newest if newest is not None else time.time())
+        return {
+            "timestamp": ts,
+            "run_id": self._run_id or ts,
+            "phase": phase or self._phase,
+            **row,
+        }
+
+    def _store(self, key, args, t):
+        with self._lock:
+            self._latest[key] = (args, t)
+            self._updated = True
+        if key in ("battery", "capacity"):
+            self._ready.set()
+
+    def _on_event(self, event, *_):
+        """Subscriber callback (olympe thread): just store the args, never block."""
+        message = getattr(event, "message", None)
+        if _same_message(message, FlyingStateChanged):
+            self._flying_state = _flying_state(getattr(event, "args", None))
+            return
+        for key, expected, _ in TELEMETRY_MESSAGES:
+            if _same_message(message, expected):
+                self._store(key, getattr(event, "args", None), time.time())
+                if self._on_change and not self._stop.is_set():
+                    self._emit()
+                return
+
+    def _emit(self):
+        with self._lock:
+            self._updated = False
+        rows = [self.snapshot()]
+        if self._sampler is not None:
+            try:
+                rows = self._sampler.offer(rows[0], self._flying_state, time.monotonic())
+            except Exception:
+                pass  # keep the row unsampled rather than lose it
+        self._send(rows)
+
+    def _send(self, rows):
+        for row in rows:
+            try:
+                self._sink(row)
+            except Exception:
+                pass
+
+    def _emit_loop(self):
+        period = 1.0 / self._rate_hz
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            next_tick += period
+            if self._updated:
+                self._emit()
+            self._stop.wait(max(next_tick - time.monotonic(), 0))
@@ -0,0 +1,85 @@
+# test_flight_segments.py – SegmentedLogWriter locking and manifest updates
+#
+#   python -m unittest test_flight_segments
+import os
+import tempfile
+import unittest
+
+from flight_segments import SegmentManifest, SegmentedLogWriter, SegmentsLocked, export_segments, iter_rows
+
+
+def _row(run_id, second, phase="flying"):
+    return {"timestamp": f"2026-01-01 00:00:{second:02d}", "run_id": run_id, "phase": phase}
+
+
+def _fly(writer, run_id, first_second, rows=3):
+    for i in range(rows):
+        writer.writerow(_row(run_id, first_second + i))
+    writer.writerow(_row(run_id, first_second + rows, "disconnected"))
+    writer.flush()
+
+
+class SegmentedLogWriterTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, "segments")
+        self.dest = os.path.join(tmp.name, "export")
+
+    def test_second_writer_is_refused(self):
+        first = SegmentedLogWriter(self.directory)
+        _fly(first, "run-a", 0)
+        with self.assertRaises(SegmentsLocked):
+            SegmentedLogWriter(self.directory)
+        # the refused writer left the open segment alone
+        _fly(first, "run-b", 10)
+        first.close()
+
+        second = SegmentedLogWriter(self.directory)
+        _fly(second, "run-c", 20)
+        second.close()
+
+        entries = SegmentManifest(self.directory).snapshot()
+        self.assertEqual([e["name"] for e in entries], ["seg_000000.csv", "seg_000001.csv", "seg_000002.csv"])
+        self.assertEqual([e["run_ids"] for e in entries], [["run-a"], ["run-b"], ["run-c"]])
+        self.assertTrue(all(e["closed"] and e["compression"] == "gzip" for e in entries))
+        self.assertEqual(len(list(iter_rows(self.directory))), 12)
+
+    def test_new_segment_never_truncates_an_existing_file(self):
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, "seg_000000.csv"), "w") as f:
+            f.write("timestamp,run_id,phase\n2026-01-01 00:00:00,run-old,flying\n")
+        writer = SegmentedLogWriter(self.directory, compression=None)
+        writer.manifest.remove("seg_000000.csv")  # e.g. a crash before the manifest was saved
+        _fly(writer, "run-a", 0)
+        writer.close()
+
+        entries = {e["name"]: e for e in SegmentManifest(self.directory).snapshot()}
+        self.assertEqual(entries["seg_000001.csv"]["run_ids"], ["run-a"])
+        with open(os.path.join(self.directory, "seg_000000.csv")) as f:
+            self.assertIn("run-old", f.read())
+
+    def test_export_while_writing_is_kept(self):
+        writer = SegmentedLogWriter(self.directory, compression=None, max_total_bytes=1)
+        _fly(writer, "run-a", 0)
+        writer.writerow(_row("run-b", 10))  # closes run-a's segment
+        writer.flush()
+
+        self.assertEqual(export_segments(self.dest, self.directory), ["seg_000000.csv"])
+        # the writer's next manifest updates must not drop the exported flag
+        writer.writerow(_row("run-b", 11))
+        writer.flush()
+        self.assertTrue(SegmentManifest(self.directory).get("seg_000000.csv")["exported"])
+
+        _fly(writer, "run-b", 12)
+        writer.writerow(_row("run-c", 20))  # closes run-b's segment: retention runs
+        writer.close()
+
+        names = [e["name"] for e in SegmentManifest(self.directory).snapshot()]
+        self.assertNotIn("seg_000000.csv", names)  # exported, so retention could delete it
+        self.assertIn("seg_000001.csv", names)  # neither exported nor synced: kept
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "seg_000000.csv")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# test_flight_spool.py – SyncAgent against a local stand-in for /telemetry/upload
+#
+#   python -m unittest test_flight_spool
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend_auth import BackendAuth
+from flight_spool import SpoolLogWriter, SyncAgent, rejected_rows, runs_synced, spool_status
+
+
+class _Backend(ThreadingHTTPServer):
+    """Answers every batch through `answer(rows) -> (status, body)` and records the batch sizes."""
+
+    def __init__(self, answer):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.answer = answer
+        self.batches = []
+        self.stored = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/telemetry/upload"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = gzip.decompress(self.rfile.read(int(self.headers["Content-Length"])))
+        rows = [json.loads(line) for line in body.decode("utf-8").splitlines() if line]
+        self.server.batches.append(len(rows))
+        status, answer = self.server.answer(self.server, rows)
+        data = json.dumps(answer).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _limit(max_rows):
+    """Backend behind a proxy that refuses bodies of more than max_rows rows with a 413."""
+    def answer(server, rows):
+        if len(rows) > max_rows:
+            return 413, {"error": "Request Entity Too Large"}
+        server.stored.extend(rows)
+        return 200, {"received": len(rows), "inserted": len(rows), "duplicates": 0, "errors": []}
+    return answer
+
+
+class SyncAgentTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "spool.sqlite3")
+
+    def _spool(self, rows):
+        writer = SpoolLogWriter(self.path)
+        for row in rows:
+            writer.writerow(row)
+        writer.close()
+
+    def _agent(self, answer, **kwargs):
+        backend = _Backend(answer)
+        threading.Thread(target=backend.serve_forever, daemon=True).start()
+        self.addCleanup(backend.server_close)
+        self.addCleanup(backend.shutdown)
+        return backend, SyncAgent(backend.url, path=self.path, auth=BackendAuth("token"), **kwargs)
+
+    def test_too_large_batches_are_split(self):
+        self._spool({"run_id": "run-a", "seq": i} for i in range(10))
+        backend, agent = self._agent(_limit(3), batch_rows=10)
+
+        self.assertEqual(agent.sync_once(), 10)
+
+        self.assertEqual(agent.batch_rows, 2)
+        self.assertEqual(backend.batches[:3], [10, 5, 2])
+        self.assertEqual([row["seq"] for row in backend.stored], list(range(10)))
+        self.assertEqual((agent.sent, agent.rejected), (10, 0))
+        self.assertTrue(runs_synced(["run-a"], self.path))
+        self.assertEqual(spool_status(self.path)["rows"], 0)
+
+    def test_single_row_too_large_is_rejected(self):
+        self._spool([{"run_id": "run-a", "seq": 0}, {"run_id": "run-b", "seq": 1, "blob": "x" * 100}])
+
+        def answer(server, rows):
+            if any("blob" in row for row in rows):
+                return 413, {"error": "Request Entity Too Large"}
+            server.stored.extend(rows)
+            return 200, {"received": len(rows), "inserted": len(rows), "duplicates": 0, "errors": []}
+
+        backend, agent = self._agent(answer)
+        agent.sync_once()
+
+        self.assertEqual((agent.sent, agent.rejected), (1, 1))
+        self.assertTrue(runs_synced(["run-a"], self.path))
+        self.assertFalse(runs_synced(["run-b"], self.path))
+        [(_, _, run_id, row, error)] = rejected_rows(self.path)
+        self.assertEqual(run_id, "run-b")
+        self.assertIn("blob", json.loads(row))
+        self.assertTrue(error.startswith("HTTP 413"))
+
+    def test_rejected_batch_is_kept(self):
+        self._spool({"run_id": "run-a", "seq": i} for i in range(3))
+        backend, agent = self._agent(lambda server, rows: (400, {"error": "bad rows"}))
+
+        self.assertEqual(agent.sync_once(), 3)
+
+        self.assertEqual((agent.sent, agent.rejected), (0, 3))
+        # the cursor moved on and the spool was purged, but the refused rows are still there
+        self.assertEqual(spool_status(self.path)["rows"], 0)
+        self.assertEqual(spool_status(self.path)["rejected"], 3)
+        self.assertEqual([json.loads(r[3])["seq"] for r in rejected_rows(self.path)], [0, 1, 2])
+        self.assertFalse(runs_synced(["run-a"], self.path))
+
+    def test_row_errors_of_an_accepted_batch_are_kept(self):
+        self._spool([{"run_id": "run-a", "seq": 0}, {"run_id": "run-b", "seq": 1}, {"run_id": "run-a", "seq": 2}])
+
+        def answer(server, rows):
+            return 200, {"received": 3, "inserted": 2, "duplicates": 0,
+                         "errors": [{"line": 2, "error": "ValueError: bad altitude"}]}
+
+        backend, agent = self._agent(answer)
+        agent.sync_once()
+
+        self.assertEqual((agent.sent, agent.rejected), (2, 1))
+        [(_, _, run_id, row, error)] = rejected_rows(self.path)
+        self.assertEqual((run_id, json.loads(row)["seq"], error), ("run-b", 1, "ValueError: bad altitude"))
+        self.assertTrue(runs_synced(["run-a"], self.path))
+        self.assertFalse(runs_synced(["run-a", "run-b"], self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()